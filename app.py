@@ -6,21 +6,48 @@ Run: flask --app app run
 Or:  python app.py
 
 Then open http://127.0.0.1:5000 — upload a PDF, choose "All tables" or "Ask AI" with a query, get Excel.
+POST /api/bulk converts many PDFs in one request and streams back a zip (see bulk.py).
 """
 
+import atexit
+import base64
+import binascii
+import io
+import json
 import os
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for
+from flask import Flask, Request, Response, render_template, request, send_file, flash, redirect, url_for, jsonify
 from werkzeug.exceptions import RequestEntityTooLarge
 
-# Import after we're in the app directory
-from tables_to_excel import pdf_tables_to_excel
-from extract import extract_pdf_to_excel as extract_pdf_to_excel_anthropic
-from extract_gemini import extract_pdf_to_excel as extract_pdf_to_excel_gemini
+# Import after we're in the app directory. Converters are loaded on first use (see providers.py).
+import metrics
+from bulk import BulkItem, stream_zip
+from clients import close_clients
+from providers import get_converter
+from result_cache import default_cache
+from writers import FORMATS
+from doc_sessions import default_sessions
+from ingest import is_path, read_source
+from jobs import DONE, JobQueue, QueueFull, acquire_result, progress_reporter, release_result
+
+# Uploads and results stay in memory up to this size, then spill to an anonymous temp file that
+# is deleted when closed, so nothing is left behind by aborted requests (PDF_EXCEL_SPOOL_MB)
+SPOOL_MAX_BYTES = int(float(os.environ.get("PDF_EXCEL_SPOOL_MB", 8)) * 1024 * 1024)
+
+
+class SpooledRequest(Request):
+    """Buffers uploads in a SpooledTemporaryFile (Werkzeug writes any over 500 KB to a temp file)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
 
 app = Flask(__name__)
+app.request_class = SpooledRequest
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret-change-in-production")
 
 # Max upload: 32 MB for AI path; allow slightly more for tables-only (we'll check in extract)
@@ -29,14 +56,95 @@ MAX_CONTENT_LENGTH = 40 * 1024 * 1024  # 40 MB
 app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
 
 
+def _sessions():
+    """Upload reuse for follow-up "Ask AI" queries on the same PDF (PDF_EXCEL_REUSE_UPLOADS=1)."""
+    return default_sessions() if os.environ.get("PDF_EXCEL_REUSE_UPLOADS") == "1" else None
+
+
 def _get_upload_limit_mb():
     return MAX_CONTENT_LENGTH // (1024 * 1024)
 
 
+def _error_message(e: Exception) -> str:
+    """User-facing text for a failed conversion."""
+    if isinstance(e, (FileNotFoundError, ValueError)):
+        return str(e)
+    msg = str(e).lower()
+    if "401" in msg or "auth" in msg or "api key" in msg or "invalid" in msg:
+        return "Invalid or missing API key. Set GEMINI_API_KEY (free) or ANTHROPIC_API_KEY in .env for “Ask AI”."
+    if "429" in msg or "rate" in msg:
+        return "API rate limit exceeded. Try again later."
+    return f"Error: {e}"
+
+
+def _convert(mode: str, query: str, pdf, out, fmt: str = "xlsx"):
+    """Run one conversion (in a job worker). pdf and out are paths or binary buffers. Returns out."""
+    if mode == "tables":
+        result = get_converter("tables")(pdf, out, overwrite=True, fmt=fmt)
+    else:
+        # Whichever provider has a key; with both, Gemini first, hedged with Anthropic (see router.py).
+        # Streamed, so rows are counted in the job's progress as the answer arrives. The rows
+        # may be counted in the router's threads, so the reporter is bound to this job here
+        report = progress_reporter()
+        result = get_converter("auto")(
+            pdf, query, out, cache=default_cache(), sessions=_sessions(), fmt=fmt,
+            stream=True, on_rows=lambda n: report(rows=n),
+        )
+    empty = not Path(result).exists() if is_path(result) else result.seek(0, io.SEEK_END) == 0
+    if empty:
+        raise ValueError("Conversion produced no file.")
+    return result
+
+
+def _convert_to_bytes(mode: str, query: str, pdf: bytes, fmt: str = "xlsx") -> bytes:
+    """_convert for process workers, which can't share buffers with the app: PDF bytes in, output bytes out."""
+    out = io.BytesIO()
+    _convert(mode, query, pdf, out, fmt)
+    return out.getvalue()
+
+
+# Conversions run in the background; /extract only queues them. Configure with
+# PDF_EXCEL_JOB_WORKERS, PDF_EXCEL_JOB_QUEUE (max waiting jobs), PDF_EXCEL_JOB_TTL (seconds a
+# result stays downloadable) and PDF_EXCEL_JOB_PROCESSES=1 (process instead of thread workers).
+job_queue = JobQueue(
+    workers=int(os.environ.get("PDF_EXCEL_JOB_WORKERS", 2)),
+    max_queued=int(os.environ.get("PDF_EXCEL_JOB_QUEUE", 16)),
+    result_ttl=float(os.environ.get("PDF_EXCEL_JOB_TTL", 900)),
+    processes=os.environ.get("PDF_EXCEL_JOB_PROCESSES") == "1",
+    error_message=_error_message,
+)
+# /api/bulk conversions share one bounded pool: PDF_EXCEL_BULK_WORKERS (4) at a time across all
+# requests, at most PDF_EXCEL_BULK_MAX_FILES (100) files and PDF_EXCEL_BULK_MAX_MB (200) per request
+BULK_WORKERS = int(os.environ.get("PDF_EXCEL_BULK_WORKERS", 4))
+BULK_MAX_FILES = int(os.environ.get("PDF_EXCEL_BULK_MAX_FILES", 100))
+BULK_MAX_CONTENT_LENGTH = int(os.environ.get("PDF_EXCEL_BULK_MAX_MB", 200)) * 1024 * 1024
+bulk_pool = ThreadPoolExecutor(BULK_WORKERS, thread_name_prefix="bulk")
+
+# atexit runs in reverse order: stop the bulk and job workers first, then close the provider clients
+atexit.register(close_clients)
+atexit.register(job_queue.shutdown)
+atexit.register(bulk_pool.shutdown, cancel_futures=True)
+
+
+def _wants_json() -> bool:
+    if request.path.startswith("/api/"):
+        return True
+    return request.accept_mimetypes.best == "application/json" or request.headers.get("X-Requested-With") == "fetch"
+
+
+def _fail(message: str, status: int = 400):
+    """Validation error: JSON for the page's fetch() calls, flash + redirect for plain form posts."""
+    if _wants_json():
+        return jsonify({"error": message}), status
+    flash(message)
+    return redirect(url_for("index"))
+
+
 @app.errorhandler(RequestEntityTooLarge)
 def too_large(e):
-    flash(f"File too large. Maximum size is {_get_upload_limit_mb()} MB.")
-    return redirect(url_for("index"))
+    if request.path.startswith("/api/"):
+        return _fail(f"Request too large. Maximum size is {BULK_MAX_CONTENT_LENGTH // (1024 * 1024)} MB.", 413)
+    return _fail(f"File too large. Maximum size is {_get_upload_limit_mb()} MB.", 413)
 
 
 @app.route("/")
@@ -44,83 +152,230 @@ def index():
     return render_template("index.html", max_mb=_get_upload_limit_mb())
 
 
+@app.route("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and size of the "Ask AI" result cache."""
+    return jsonify(default_cache().stats())
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Per-stage timings and counters in Prometheus text format (thread workers only; see metrics.py)."""
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/extract", methods=["POST"])
 def extract():
+    """Validate the upload and queue the conversion. Returns 202 with the job id; poll /jobs/<id>."""
     if "pdf" not in request.files:
-        flash("No file selected.")
-        return redirect(url_for("index"))
+        return _fail("No file selected.")
 
     file = request.files["pdf"]
     if not file or file.filename == "":
-        flash("No file selected.")
-        return redirect(url_for("index"))
+        return _fail("No file selected.")
 
     if not file.filename.lower().endswith(".pdf"):
-        flash("Please upload a PDF file.")
-        return redirect(url_for("index"))
+        return _fail("Please upload a PDF file.")
 
     mode = request.form.get("mode", "tables")
     query = (request.form.get("query") or "").strip()
+    fmt = request.form.get("format", "xlsx")
+    if fmt not in FORMATS:
+        return _fail(f"Unknown output format: {fmt}.")
 
     if mode == "ask" and not query:
-        flash("For “Ask AI”, please enter what you want to extract (e.g. “company taxes for January 2026”).")
-        return redirect(url_for("index"))
+        return _fail("For “Ask AI”, please enter what you want to extract (e.g. “company taxes for January 2026”).")
+    if mode == "ask" and not (os.environ.get("GEMINI_API_KEY") or os.environ.get("ANTHROPIC_API_KEY")):
+        return _fail("For “Ask AI”, set GEMINI_API_KEY (free at aistudio.google.com) or ANTHROPIC_API_KEY in .env.")
 
-    tmp_dir = None
+    # Non-Excel formats are one file per table, so they download as a zip with a manifest
+    stem = Path(file.filename).stem
+    download_name = f"{stem}.xlsx" if fmt == "xlsx" else f"{stem}_{fmt}.zip"
+    # Take the spooled upload from the request (which closes its files when it ends); the job owns it now
+    upload, file.stream = file.stream, io.BytesIO()
+    files = [upload]
     try:
-        tmp_dir = tempfile.mkdtemp()
-        pdf_path = Path(tmp_dir) / "upload.pdf"
-        file.save(str(pdf_path))
+        if job_queue.processes:
+            job = job_queue.submit(_convert_to_bytes, mode, query, read_source(upload), fmt, download_name=download_name)
+            upload.close()
+        else:
+            out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+            files.append(out)
+            job = job_queue.submit(_convert, mode, query, upload, out, fmt, download_name=download_name, files=files)
+    except QueueFull as e:
+        for f in files:
+            f.close()
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except Exception:
+        for f in files:
+            f.close()
+        raise
+
+    return jsonify({
+        "job_id": job.id,
+        "status_url": url_for("job_status", job_id=job.id),
+        "result_url": url_for("job_result", job_id=job.id),
+    }), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    data = job.to_dict()
+    if job.status == DONE:
+        data["result_url"] = url_for("job_result", job_id=job.id)
+    return jsonify(data)
+
+
+def _bulk_item(filename: str, pdf, options: dict, defaults) -> BulkItem:
+    """One validated file of a bulk request; options override the request-wide defaults."""
+    mode = options.get("mode") or defaults.get("mode") or "tables"
+    query = str(options.get("query") or defaults.get("query") or "").strip()
+    fmt = options.get("format") or defaults.get("format") or "xlsx"
+    if not filename.lower().endswith(".pdf"):
+        raise ValueError(f"{filename or 'A file'} is not a PDF.")
+    if mode not in ("tables", "ask"):
+        raise ValueError(f"{filename}: unknown mode {mode} (choose tables or ask).")
+    if fmt not in FORMATS:
+        raise ValueError(f"{filename}: unknown output format {fmt}.")
+    if mode == "ask" and not query:
+        raise ValueError(f"{filename}: “ask” needs a query.")
+    if mode == "ask" and not (os.environ.get("GEMINI_API_KEY") or os.environ.get("ANTHROPIC_API_KEY")):
+        raise ValueError("For “ask”, set GEMINI_API_KEY or ANTHROPIC_API_KEY on the server.")
+    return BulkItem(filename, pdf, mode, query, fmt)
 
-        out_path = Path(tmp_dir) / "output.xlsx"
 
-        if mode == "tables":
-            result = pdf_tables_to_excel(str(pdf_path), str(out_path), overwrite=True)
+def _bulk_items() -> list[BulkItem]:
+    """
+    The files of a bulk request. Multipart: "pdf" files plus optional "mode", "query" and "format"
+    fields, and "options", a JSON list with one {"mode", "query", "format"} object per file.
+    JSON: {"mode", "query", "format", "files": [{"filename", "content" (base64), "mode", ...}]}.
+    Raises ValueError for anything invalid, before any file is converted.
+    """
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("files"), list):
+            raise ValueError("Expected a JSON object with a list of files.")
+        specs, uploads = body["files"], None
+        defaults = body
+    else:
+        uploads = request.files.getlist("pdf")
+        try:
+            specs = json.loads(request.form.get("options") or "null") or [{}] * len(uploads)
+        except json.JSONDecodeError:
+            raise ValueError("options must be a JSON list.") from None
+        if not isinstance(specs, list) or len(specs) != len(uploads):
+            raise ValueError("options must be a JSON list with one object per file.")
+        defaults = request.form
+    if not specs:
+        raise ValueError("No files given.")
+    if len(specs) > BULK_MAX_FILES:
+        raise ValueError(f"Too many files ({len(specs)}; max {BULK_MAX_FILES}).")
+    if not all(isinstance(spec, dict) for spec in specs):
+        raise ValueError("Each file's options must be a JSON object.")
+
+    items = []
+    for i, spec in enumerate(specs):
+        if uploads is None:
+            try:
+                pdf = base64.b64decode(spec.get("content") or "", validate=True)
+            except (binascii.Error, TypeError):
+                raise ValueError(f"{spec.get('filename')}: content is not valid base64.") from None
+            item = _bulk_item(str(spec.get("filename") or ""), pdf, spec, defaults)
+            empty = not pdf
         else:
-            # Prefer Gemini (free tier) if key is set; otherwise Anthropic
-            if os.environ.get("GEMINI_API_KEY"):
-                result = extract_pdf_to_excel_gemini(str(pdf_path), query, str(out_path))
-            elif os.environ.get("ANTHROPIC_API_KEY"):
-                result = extract_pdf_to_excel_anthropic(str(pdf_path), query, str(out_path))
-            else:
-                flash("For “Ask AI”, set GEMINI_API_KEY (free at aistudio.google.com) or ANTHROPIC_API_KEY in .env.")
-                return redirect(url_for("index"))
-
-        if not Path(result).exists():
-            flash("Conversion produced no file.")
-            return redirect(url_for("index"))
-
-        base_name = Path(file.filename).stem
-        download_name = f"{base_name}.xlsx"
-        return send_file(
-            result,
-            as_attachment=True,
-            download_name=download_name,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-    except FileNotFoundError as e:
-        flash(str(e))
-        return redirect(url_for("index"))
+            item = _bulk_item(uploads[i].filename or "", None, spec, defaults)
+            empty = uploads[i].stream.seek(0, io.SEEK_END) == 0
+            uploads[i].stream.seek(0)
+        if empty:
+            raise ValueError(f"{item.filename}: the file is empty.")
+        items.append(item)
+    if uploads is not None:
+        # Take the spooled uploads from the request: the response is streamed after it ends
+        for item, upload in zip(items, uploads):
+            item.pdf, upload.stream = upload.stream, io.BytesIO()
+    return items
+
+
+def _convert_item(item: BulkItem, out) -> None:
+    _convert(item.mode, item.query, item.pdf, out, item.fmt)
+
+
+@app.route("/api/bulk", methods=["POST"])
+def bulk():
+    """
+    Convert many PDFs, each with its own mode and query (see _bulk_items), BULK_WORKERS at a time.
+    The response is a zip streamed as conversions finish: one output per file and a manifest.json
+    with each file's status, error and timings. Errors in the request itself are 400 JSON.
+    """
+    request.max_content_length = BULK_MAX_CONTENT_LENGTH  # per-request limit: Flask 3.1+
+    try:
+        items = _bulk_items()
     except ValueError as e:
-        flash(str(e))
-        return redirect(url_for("index"))
-    except Exception as e:
-        msg = str(e).lower()
-        if "401" in msg or "auth" in msg or "api key" in msg or "invalid" in msg:
-            flash("Invalid or missing API key. Set GEMINI_API_KEY (free) or ANTHROPIC_API_KEY in .env for “Ask AI”.")
-        elif "429" in msg or "rate" in msg:
-            flash("API rate limit exceeded. Try again later.")
-        else:
-            flash(f"Error: {e}")
-        return redirect(url_for("index"))
-    finally:
-        if tmp_dir and Path(tmp_dir).exists():
-            try:
-                for f in Path(tmp_dir).iterdir():
-                    f.unlink(missing_ok=True)
-                Path(tmp_dir).rmdir()
-            except OSError:
-                pass
+        return jsonify({"error": str(e)}), 400
+    return Response(
+        stream_zip(items, _convert_item, bulk_pool, _error_message, SPOOL_MAX_BYTES),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=results.zip", "X-Accel-Buffering": "no"},
+    )
+
+
+_result_lock = threading.Lock()
+
+
+class _ResultReader:
+    """
+    One download's read position in a job's result buffer, which stays open for later downloads.
+    Holds the result (acquire_result) until closed, so an expiring job can't close it mid-download.
+    """
+
+    def __init__(self, job):
+        self._job = job
+        self._buffer = job.result
+        self._pos = 0
+        self._closed = False
+
+    def read(self, size: int = -1) -> bytes:
+        with _result_lock:
+            self._buffer.seek(self._pos)
+            data = self._buffer.read(size)
+        self._pos += len(data)
+        return data
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            release_result(self._job)
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    if job.status != DONE:
+        return jsonify({"error": f"Job is {job.status}.", "status": job.status}), 409
+    result, size = job.result, None
+    if isinstance(result, bytes):
+        result = io.BytesIO(result)
+    elif not is_path(result):
+        # Streamed from the job's buffer in blocks; nothing is copied or written to disk
+        if not acquire_result(job):
+            return jsonify({"error": "Unknown or expired job."}), 404
+        with _result_lock:
+            size = result.seek(0, io.SEEK_END)
+        result = _ResultReader(job)
+    response = send_file(
+        result,
+        as_attachment=True,
+        download_name=job.download_name,
+        mimetype="application/zip" if job.download_name.endswith(".zip") else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+    if size is not None:
+        response.content_length = size
+    return response
 
 
 if __name__ == "__main__":
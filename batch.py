@@ -0,0 +1,220 @@
+"""
+Concurrent batch engine for "Ask AI" runs (run.py ask with many PDFs).
+
+Runs up to `concurrency` extractions at once under a token-bucket rate limiter (requests per
+minute and tokens per minute), retries rate-limit/overload errors with exponential backoff
+(honouring Retry-After when the provider sends it), and keeps going when one file fails.
+
+Provider calls are the normal blocking functions (extract.extract_pdf_to_excel,
+extract_gemini.extract_pdf_to_excel); they run in worker threads, so both backends work
+unchanged and tests can pass any fake callable. One PDF may take several provider requests
+(chunks, re-asked queries): with per_request, the limiter is charged by acquire_request() before
+each of them instead of once per item.
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import logging
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeout, conflict, rate limit, server errors, Anthropic "overloaded"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Rough input cost of one PDF page (text + page image), used for the tokens-per-minute budget
+TOKENS_PER_PAGE = 2000
+
+
+class TokenBucket:
+    """Allows `rate` units per `per` seconds, refilled continuously; bursts up to `rate`."""
+
+    def __init__(self, rate: float, per: float = 60.0):
+        self.capacity = rate
+        self.tokens = rate
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        # A single request larger than the whole bucket would never fit; let it through at full bucket
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.fill_rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits; either may be None (unlimited)."""
+
+    def __init__(self, rpm: float | None = None, tpm: float | None = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    async def acquire(self, tokens: int = 0) -> None:
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire(tokens)
+
+
+@dataclass
+class BatchResult:
+    item: object
+    value: object = None
+    error: BaseException | None = None
+    attempts: int = 0
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def error_status(exc: BaseException) -> int | None:
+    """HTTP status of a provider error (Anthropic: status_code, Gemini: code), if any."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Seconds from the error's Retry-After header (delta or HTTP date), if present."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Connection errors and timeouts carry no status
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def estimate_pdf_tokens(pdf_path: str | Path | bytes) -> int:
+    """Approximate input tokens for a PDF (a path or its bytes), for the tokens-per-minute budget."""
+    try:
+        import pypdfium2
+
+        from ingest import PDFIUM_LOCK
+
+        with PDFIUM_LOCK:
+            pdf = pypdfium2.PdfDocument(pdf_path if isinstance(pdf_path, bytes) else str(pdf_path))
+            try:
+                pages = len(pdf)
+            finally:
+                pdf.close()
+    except Exception:
+        # Unreadable here; fall back to size (~50 KB per page is typical for text PDFs)
+        size = len(pdf_path) if isinstance(pdf_path, bytes) else Path(pdf_path).stat().st_size
+        pages = max(1, size // (50 * 1024))
+    return pages * TOKENS_PER_PAGE
+
+
+# (limiter, event loop) of the batch item running in this context; see acquire_request
+_request_limit: contextvars.ContextVar = contextvars.ContextVar("request_limit", default=None)
+
+
+def acquire_request(pdf: str | Path | bytes) -> None:
+    """
+    Wait for the batch's rate limiter before one provider request sending pdf (a path or bytes).
+    A no-op outside a per_request batch. Blocking: call it from the item's worker thread, or a
+    thread started with its context (contextvars.copy_context()).
+    """
+    limit = _request_limit.get()
+    if limit is None:
+        return
+    limiter, loop = limit
+    tokens = estimate_pdf_tokens(pdf) if limiter.tokens is not None else 0
+    asyncio.run_coroutine_threadsafe(limiter.acquire(tokens), loop).result()
+
+
+async def _run_one(item, fn, limiter, estimate_tokens, per_request, max_retries, base_delay, max_delay) -> BatchResult:
+    result = BatchResult(item)
+    start = time.monotonic()
+    tokens = estimate_tokens(item) if estimate_tokens and not per_request else 0
+    if per_request and limiter is not None:
+        _request_limit.set((limiter, asyncio.get_running_loop()))  # this item's task context only
+    while True:
+        result.attempts += 1
+        if limiter is not None and not per_request:
+            await limiter.acquire(tokens)
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                result.value = await fn(item)
+            else:
+                result.value = await asyncio.to_thread(fn, item)  # copies the context
+            result.error = None
+            break
+        except Exception as e:
+            result.error = e
+            if result.attempts > max_retries or not is_retryable(e):
+                break
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * 2 ** (result.attempts - 1)) * (0.5 + random.random() / 2)
+            log.info("Retrying %s in %.1fs (attempt %d): %s", item, delay, result.attempts, e)
+            await asyncio.sleep(delay)
+    result.duration = time.monotonic() - start
+    return result
+
+
+async def run_batch(
+    items,
+    fn,
+    concurrency: int = 4,
+    limiter: RateLimiter | None = None,
+    estimate_tokens=None,
+    per_request: bool = False,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    on_result=None,
+) -> list[BatchResult]:
+    """
+    Call fn(item) for every item with at most `concurrency` calls in flight.
+
+    A failing item never stops the batch: its exception is kept on its BatchResult.
+    on_result(result) is called as each item finishes; results are returned in input order.
+    The limiter is charged once per attempt (estimate_tokens(item) tokens), or with per_request,
+    by each acquire_request() a blocking fn makes (see extract._prepare_request).
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def guarded(item):
+        async with semaphore:
+            result = await _run_one(item, fn, limiter, estimate_tokens, per_request, max_retries, base_delay, max_delay)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return list(await asyncio.gather(*(guarded(item) for item in items)))
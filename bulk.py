@@ -0,0 +1,157 @@
+"""
+Bulk conversions for the REST API (app.py, POST /api/bulk): many PDFs in, one zip out.
+
+Each BulkItem is converted on a bounded thread pool shared by all bulk requests. stream_zip()
+yields the zip while the conversions run: an output is added as soon as its conversion
+finishes (so entries are in completion order), and the client starts receiving workbooks
+before the slowest file is done. manifest.json comes last and lists every file in request
+order with its status, error and timings.
+"""
+
+import json
+import logging
+import tempfile
+import time
+import zipfile
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+# Bytes copied into the zip (and yielded to the client) at a time
+BLOCK_SIZE = 256 * 1024
+
+
+@dataclass
+class BulkItem:
+    """One file of a bulk request. pdf is the PDF's bytes or a binary file object."""
+
+    filename: str
+    pdf: object
+    mode: str = "tables"
+    query: str = ""
+    fmt: str = "xlsx"
+
+    @property
+    def output_name(self) -> str:
+        stem = Path(self.filename).stem or "document"
+        return f"{stem}.xlsx" if self.fmt == "xlsx" else f"{stem}_{self.fmt}.zip"
+
+
+class ZipSink:
+    """Write-only target for ZipFile; take() returns what was written since the last call."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _unique_names(items: list[BulkItem]) -> list[str]:
+    """Output names per item; repeats get _2, _3, ... before the suffix."""
+    names, seen = [], set()
+    for item in items:
+        name, n = item.output_name, 1
+        while name.lower() in seen or name == MANIFEST:
+            n += 1
+            path = Path(item.output_name)
+            name = f"{path.stem}_{n}{path.suffix}"
+        seen.add(name.lower())
+        names.append(name)
+    return names
+
+
+def _close(f) -> None:
+    if hasattr(f, "close"):
+        f.close()
+
+
+def _close_output(future) -> None:
+    out = future.result()[0]
+    if out is not None:
+        out.close()
+
+
+def stream_zip(items: list[BulkItem], convert, pool, error_message=str, spool_max_bytes: int = 8 * 1024 * 1024):
+    """
+    Yield the bytes of a zip with one output per item, written as the conversions finish.
+    convert(item, out) writes an item's output into the binary file out; it runs on pool.
+    A failed item has no entry, only its error (error_message(exc)) in the manifest.
+    Closing the generator early (the client went away) cancels conversions not yet started.
+    """
+    start = time.monotonic()
+    names = _unique_names(items)
+    entries = [{"file": item.filename, "mode": item.mode, "format": item.fmt} for item in items]
+    for entry, item in zip(entries, items):
+        if item.mode == "ask":
+            entry["query"] = item.query
+
+    def run(index: int):
+        item = items[index]
+        started = time.monotonic()
+        entries[index]["wait_s"] = round(started - start, 3)
+        out = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+        try:
+            convert(item, out)
+            return out, time.monotonic() - started, None
+        except Exception as e:
+            log.info("Bulk item %s failed: %s", item.filename, e)
+            out.close()
+            return None, time.monotonic() - started, e
+        finally:
+            _close(item.pdf)
+
+    sink = ZipSink()
+    zf = zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED)
+    futures = {pool.submit(run, i): i for i in range(len(items))}
+    written = set()
+    try:
+        for future in as_completed(futures):
+            written.add(future)
+            index = futures[future]
+            out, seconds, error = future.result()
+            entry = entries[index]
+            entry["seconds"] = round(seconds, 3)
+            if error is not None:
+                entry.update(status="failed", error=error_message(error))
+                continue
+            with out, zf.open(names[index], "w") as dest:
+                out.seek(0)
+                while block := out.read(BLOCK_SIZE):
+                    dest.write(block)
+                    if data := sink.take():
+                        yield data
+            entry.update(status="done", output=names[index])
+            yield sink.take()
+
+        done = sum(entry["status"] == "done" for entry in entries)
+        manifest = {
+            "files": entries,
+            "succeeded": done,
+            "failed": len(entries) - done,
+            "seconds": round(time.monotonic() - start, 3),
+        }
+        zf.writestr(MANIFEST, json.dumps(manifest, indent=2, ensure_ascii=False) + "\n")
+        zf.close()
+        yield sink.take()
+    finally:
+        for future, index in futures.items():
+            if future in written:
+                continue
+            if future.cancel():
+                _close(items[index].pdf)
+            else:
+                future.add_done_callback(_close_output)
@@ -0,0 +1,137 @@
+"""
+Chunked ("map-reduce") Ask AI for PDFs past the provider limits (32 MB, 100 pages).
+
+plan_chunks() splits the document into page ranges of at most chunk_pages; any range whose
+sub-PDF still comes out over max_bytes is halved until it fits. Each sub-PDF stays in memory
+and is asked the same queries in parallel through the normal provider functions (they take
+bytes as well as paths), so caching, uploads and retries work unchanged. merge_csvs() then joins the answers: one
+header, rows in page order, repeated rows (rows of a table running across a chunk boundary
+that both chunks returned, or a header repeated at the top of a chunk) dropped, and "not
+found" answers from chunks without the data ignored.
+"""
+
+import contextvars
+import csv
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from ingest import PDFIUM_LOCK, source_file
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_PAGES = 50
+DEFAULT_CHUNK_WORKERS = 4
+
+
+def page_count(pdf_path) -> int:
+    import pypdfium2
+
+    with PDFIUM_LOCK:
+        pdf = pypdfium2.PdfDocument(source_file(pdf_path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def plan_chunks(pdf_path, chunk_pages: int, max_bytes: int) -> list[tuple[list[int], bytes]]:
+    """(0-based pages, sub-PDF bytes) per chunk, in page order; each at most chunk_pages and max_bytes."""
+    from page_select import subset_pdf
+
+    if chunk_pages < 1:
+        raise ValueError("Chunk size must be at least 1 page")
+    total = page_count(pdf_path)
+    todo = [list(range(start, min(start + chunk_pages, total))) for start in range(0, total, chunk_pages)]
+    chunks = []
+    while todo:
+        pages = todo.pop(0)
+        data = subset_pdf(pdf_path, pages)
+        if len(data) > max_bytes:
+            if len(pages) == 1:
+                raise ValueError(f"Page {pages[0] + 1} alone is larger than {max_bytes // (1024 * 1024)}MB")
+            half = len(pages) // 2
+            todo[:0] = [pages[:half], pages[half:]]
+            continue
+        chunks.append((pages, data))
+    return chunks
+
+
+def _rows(csv_text: str) -> list[list[str]]:
+    return [row for row in csv.reader(io.StringIO(csv_text)) if any(cell.strip() for cell in row)]
+
+
+def _is_not_found(rows: list[list[str]]) -> bool:
+    return not rows or (len(rows[0]) == 1 and rows[0][0].strip().lower() == "error")
+
+
+def merge_csvs(answers: list[str]) -> str:
+    """
+    One CSV from per-chunk answers (in page order). Columns are matched by name, so a chunk
+    whose header differs only in order or has extra columns still lines up.
+    """
+    tables = [_rows(text) for text in answers]
+    found = [rows for rows in tables if not _is_not_found(rows)]
+    if not found:
+        return next((text for text in answers if text.strip()), answers[0] if answers else "")
+    header: list[str] = []
+    keys: list[str] = []
+    for rows in found:
+        for name in rows[0]:
+            key = name.strip().lower()
+            if key not in keys:
+                keys.append(key)
+                header.append(name.strip())
+    merged = []
+    previous: list = []  # the last chunk's rows, to find repeats at the boundary
+    for rows in found:
+        current = []
+        positions = [keys.index(name.strip().lower()) for name in rows[0]]
+        own_keys = sorted(name.strip().lower() for name in rows[0])
+        for row in rows[1:]:
+            if sorted(cell.strip().lower() for cell in row) == own_keys:
+                continue  # a header repeated inside the answer, in any column order
+            out = [""] * len(keys)
+            for pos, cell in zip(positions, row):
+                out[pos] = cell
+            current.append(out)
+        # Only leading rows that repeat the previous chunk's trailing rows are dropped; equal
+        # rows elsewhere are real data
+        keys_now = [tuple(cell.strip() for cell in row) for row in current]
+        merged += current[_overlap(previous, keys_now) :]
+        previous = keys_now or previous
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(merged)
+    return buf.getvalue().rstrip("\n")
+
+
+def _overlap(previous: list, current: list) -> int:
+    """Length of the longest run of previous's last rows that current starts with."""
+    for n in range(min(len(previous), len(current)), 0, -1):
+        if previous[-n:] == current[:n]:
+            return n
+    return 0
+
+
+def ask_in_chunks(pdf_path, queries: list[str], ask, chunk_pages: int, max_bytes: int, workers: int = DEFAULT_CHUNK_WORKERS) -> list[str]:
+    """
+    Answer queries over the PDF chunk by chunk. ask(chunk, queries) returns one CSV per query
+    for a chunk's PDF bytes (e.g. extract.extract_csvs); chunks are asked up to `workers` at a
+    time. Returns one merged CSV per query.
+    """
+    with metrics.timer("split"):
+        chunks = plan_chunks(pdf_path, chunk_pages, max_bytes)
+    log.info("Asking in %d chunk(s) of up to %d pages", len(chunks), chunk_pages)
+    with ThreadPoolExecutor(max(1, min(workers, len(chunks)))) as pool:
+        # Each chunk runs in this context, so its request is charged to a batch's rate limit
+        futures = [pool.submit(contextvars.copy_context().run, ask, data, queries) for _, data in chunks]
+        try:
+            per_chunk = [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return [merge_csvs([answers[i] for answers in per_chunk]) for i in range(len(queries))]
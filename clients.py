@@ -0,0 +1,144 @@
+"""
+Long-lived AI provider clients, one per provider and API key, shared by the whole process.
+
+Building an SDK client is not free, and every new client opens new HTTPS connections, so a
+batch item or web request that builds its own pays a TLS handshake each time. get_client()
+hands out one client per (provider, API key), created on first use and kept, so requests from
+run.py batches and app.py job workers reuse warm keep-alive connections. The SDK clients are
+thread-safe and share one connection pool each.
+
+Configure with PDF_EXCEL_HTTP_MAX_CONNECTIONS (connections per client, 20),
+PDF_EXCEL_HTTP_KEEPALIVE (seconds an idle connection is kept, 30), PDF_EXCEL_HTTP_TIMEOUT
+(seconds per request, 600) and PDF_EXCEL_HTTP_CONNECT_TIMEOUT (10). close_clients() closes
+them all; app.py registers it to run at exit.
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    max_connections: int = 20
+    keepalive: float = 30.0
+    timeout: float = 600.0
+    connect_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "HttpSettings":
+        return cls(
+            max_connections=int(os.environ.get("PDF_EXCEL_HTTP_MAX_CONNECTIONS", cls.max_connections)),
+            keepalive=float(os.environ.get("PDF_EXCEL_HTTP_KEEPALIVE", cls.keepalive)),
+            timeout=float(os.environ.get("PDF_EXCEL_HTTP_TIMEOUT", cls.timeout)),
+            connect_timeout=float(os.environ.get("PDF_EXCEL_HTTP_CONNECT_TIMEOUT", cls.connect_timeout)),
+        )
+
+
+def _anthropic_client(api_key: str, settings: HttpSettings):
+    import anthropic
+    import httpx
+
+    http_client = anthropic.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_connections,
+            keepalive_expiry=settings.keepalive,
+        ),
+        # The SDK's own Timeout: newer SDKs build the client on httpx2, whose transport needs its type
+        timeout=anthropic.Timeout(settings.timeout, connect=settings.connect_timeout),
+    )
+    return anthropic.Anthropic(api_key=api_key, http_client=http_client)
+
+
+def _gemini_client(api_key: str, settings: HttpSettings):
+    try:
+        import httpx
+        from google import genai
+        from google.genai import types
+    except ImportError:
+        raise ImportError("Install the Gemini SDK: pip install google-genai") from None
+
+    limits = httpx.Limits(
+        max_connections=settings.max_connections,
+        max_keepalive_connections=settings.max_connections,
+        keepalive_expiry=settings.keepalive,
+    )
+    # Gemini applies one timeout per request (milliseconds); it has no separate connect timeout
+    http_options = types.HttpOptions(timeout=int(settings.timeout * 1000), client_args={"limits": limits})
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+FACTORIES = {"anthropic": _anthropic_client, "gemini": _gemini_client}
+
+
+class ClientPool:
+    """Provider clients keyed by (provider, API key); thread-safe. factories maps provider -> fn(api_key, settings)."""
+
+    def __init__(self, settings: HttpSettings | None = None, factories: dict | None = None):
+        self.settings = settings or HttpSettings()
+        self.factories = factories or FACTORIES
+        self._clients: dict[tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, api_key: str):
+        key = (provider, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if provider not in self.factories:
+                    raise ValueError(f"Unknown provider: {provider}")
+                client = self._clients[key] = self.factories[provider](api_key, self.settings)
+                log.debug("Created %s client", provider)
+            return client
+
+    def close(self) -> None:
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                log.warning("Closing client failed: %s", e)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> ClientPool:
+    """Process-wide pool used by extract.py and extract_gemini.py (see module docstring for settings)."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ClientPool(HttpSettings.from_env())
+        return _default_pool
+
+
+def get_client(provider: str, api_key: str):
+    return default_pool().get(provider, api_key)
+
+
+def close_clients() -> None:
+    global _default_pool
+    with _default_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.close()
+
+
+def _forget_after_fork() -> None:
+    # A forked worker must not share the parent's sockets; it builds its own clients
+    global _default_pool, _default_lock
+    _default_pool = None
+    _default_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_after_fork)
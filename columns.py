@@ -0,0 +1,267 @@
+"""
+Columnar tables with per-column type inference.
+
+Both converters produce tables as rows of strings. ColumnTable.from_rows() turns such a table
+(first row = header) into one NumPy string array per column and infers each column's type in
+whole-column passes: strip whitespace, drop thousands separators, currency symbols and percent
+signs, turn "(1,234)" into -1234, then convert the column at once. A column becomes numeric or
+a date only if every non-blank cell parses; otherwise it stays text, so a stray note never
+turns into a wrong number. Values that look numeric but are really identifiers (leading zeros,
+more than 15 digits) also stay text.
+
+Dates are recognized as YYYY-MM-DD, YYYY/MM/DD, DD.MM.YYYY, and D/M/Y or M/D/Y when some day
+in the column is above 12; columns of ambiguous slash dates stay text.
+"""
+
+import re
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.dtypes import StringDType
+
+TEXT, INT, FLOAT, PERCENT, CURRENCY, DATE = "text", "int", "float", "percent", "currency", "date"
+
+# Kinds whose values can share a column (an integer cell in an amount column, ...)
+NUMERIC = (INT, FLOAT, CURRENCY)
+
+# Cells meaning "no value" in an otherwise numeric or date column
+BLANKS = ("", "-", "–", "—", "n/a", "N/A", "NA")
+
+CURRENCY_SYMBOLS = "$€£¥₹"
+
+# Longest digit run still treated as a number (float64 is exact up to 15 significant digits)
+MAX_DIGITS = 15
+
+# Cells checked with a regex before a column gets the full vectorized passes, so text
+# columns are rejected cheaply
+SAMPLE_CELLS = 20
+
+_STR = StringDType()
+_NUMBERISH = re.compile(r"[\d\s.,()%+\-" + CURRENCY_SYMBOLS + "]+")
+_DATEISH = re.compile(r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}")
+
+
+@dataclass
+class Column:
+    """values: int64, float64, datetime64[D] or string array; missing marks blank cells."""
+
+    name: str
+    kind: str
+    values: np.ndarray
+    missing: np.ndarray
+    number_format: str | None = None
+
+    def tolist(self) -> list:
+        """Cells as Python values (int, float, datetime.date, str), None where blank."""
+        out = self.values.tolist()
+        if self.kind != TEXT:
+            for i in np.flatnonzero(self.missing).tolist():
+                out[i] = None
+        return out
+
+
+@dataclass
+class ColumnTable:
+    header: list[str]
+    columns: list[Column]
+    nrows: int
+
+    @classmethod
+    def from_rows(cls, rows, infer: bool = True) -> "ColumnTable":
+        """Table from rows of cells (None for empty); the first row is the header."""
+        rows = [["" if c is None else str(c) for c in row] for row in rows]
+        if not rows:
+            return cls([], [], 0)
+        width = max(len(r) for r in rows)
+        header = [c.strip() for c in rows[0]] + [""] * (width - len(rows[0]))
+        body = [r + [""] * (width - len(r)) for r in rows[1:]]
+        grid = np.array(body, dtype=_STR).reshape(len(body), width)
+        columns = []
+        for j, name in enumerate(header):
+            cells = np.strings.strip(grid[:, j])
+            columns.append(infer_column(name, cells) if infer else Column(name, TEXT, cells, cells == ""))
+        return cls(header, columns, len(body))
+
+    @property
+    def kinds(self) -> list[str]:
+        return [c.kind for c in self.columns]
+
+    def rows(self):
+        """Data rows as tuples of Python values (header not included)."""
+        return zip(*(c.tolist() for c in self.columns)) if self.columns else iter(())
+
+    def typed_rows(self, rows) -> list[list]:
+        """
+        Later data rows typed by this table's columns, as Python values: a cell is converted
+        when it parses as its column's kind and stays text otherwise.
+        """
+        text = ColumnTable.from_rows([self.header, *rows], infer=False)
+        out = [list(row) for row in text.rows()]
+        for j, cells in enumerate(c.values for c in text.columns):
+            kind = self.columns[j].kind if j < len(self.columns) else TEXT
+            if kind == TEXT:
+                continue
+            col = infer_column("", cells)
+            if _fits(col.kind, kind):
+                values = col.tolist()
+            else:
+                # Cell by cell, so one stray note does not turn the rest of the batch into text
+                values = [_cell_value(cells[i : i + 1], kind) for i in range(len(cells))]
+            for row, value in zip(out, values):
+                row[j] = value
+        return out
+
+
+def _blank_mask(cells: np.ndarray) -> np.ndarray:
+    return np.isin(cells, np.array(BLANKS, dtype=_STR))
+
+
+def _decimals(digits: np.ndarray) -> int:
+    """Most digits after the decimal point in a column of plain numbers."""
+    dot = np.strings.find(digits, ".")
+    has = dot >= 0
+    return int((np.strings.str_len(digits) - dot - 1)[has].max()) if has.any() else 0
+
+
+def _as_number(name: str, cells: np.ndarray, missing: np.ndarray) -> Column | None:
+    x = cells[~missing]
+    if not all(_NUMBERISH.fullmatch(c) for c in x[:SAMPLE_CELLS].tolist()):
+        return None
+    text = "".join(x.tolist())  # which decorations occur at all, so clean-up passes can be skipped
+    negative = np.zeros(len(x), dtype=bool)
+    percent = np.zeros(len(x), dtype=bool)
+    if "(" in text:
+        negative = np.strings.startswith(x, "(") & np.strings.endswith(x, ")")
+        x = np.where(negative, np.strings.slice(x, 1, -1), x)
+    parenthesized = negative.copy()
+    if "%" in text:
+        percent = np.strings.endswith(x, "%")
+    symbols = [sym for sym in CURRENCY_SYMBOLS if sym in text]
+    signs = np.zeros(len(x), dtype=np.int64)
+    if "-" in text or "+" in text:
+        negative |= np.strings.startswith(x, "-")
+        unsigned = np.strings.lstrip(x, "-+")
+        signs = np.strings.str_len(x) - np.strings.str_len(unsigned)
+        x = unsigned
+    if percent.any() or symbols or " " in text:
+        # One symbol per pass: strip() mishandles a chars argument mixing ASCII and other characters
+        for chars in ("% ", *symbols, " "):
+            x = np.strings.strip(x, chars)
+        if "-" in text:
+            negative |= np.strings.startswith(x, "-")  # "$-5"
+            unsigned = np.strings.lstrip(x, "-")
+            signs += np.strings.str_len(x) - np.strings.str_len(unsigned)
+            x = unsigned
+    if (signs > 1).any() or (signs > 0)[parenthesized].any():
+        return None  # "--5", "+-5", "-$-5", "(-5)": more than one sign
+
+    int_part, _, fraction_part = np.strings.partition(x, np.array(".", dtype=_STR))
+    commas = "," in text
+    if commas:
+        # A comma after the point is a decimal comma (1.234,56), not a separator this parses
+        if (np.strings.find(fraction_part, ",") >= 0).any():
+            return None
+        # Thousands separators must group digits in threes: 1,234,567(.89)
+        count = np.strings.count(int_part, ",")
+        length = np.strings.str_len(int_part)
+        first = length - 4 * count
+        grouped = (count == 0) | (
+            (first >= 1) & (first <= 3) & (np.strings.find(int_part, ",") == first) & (np.strings.rfind(int_part, ",") == length - 4)
+        )
+        if not grouped.all():
+            return None
+        x = np.strings.replace(x, ",", "")
+        int_part = np.strings.replace(int_part, ",", "")
+    if not np.strings.isdecimal(np.strings.replace(x, ".", "", 1)).all():
+        return None
+    if (np.strings.str_len(x) - (np.strings.find(x, ".") >= 0) > MAX_DIGITS).any():
+        return None
+    if (np.strings.startswith(int_part, "0") & (np.strings.str_len(int_part) > 1)).any():
+        return None  # 00123: an identifier, not a number
+
+    values = x.astype(np.float64)
+    values[negative] *= -1
+    decimals = _decimals(x) if "." in text else 0
+    fraction = "." + "0" * decimals if decimals else ""
+    if percent.all():
+        kind, fmt = PERCENT, "0" + fraction + "%"
+        values = np.round(values / 100, decimals + 2)  # 1.1% -> 0.011, not 0.011000000000000001
+    elif percent.any():
+        return None
+    elif symbols:
+        kind = CURRENCY
+        fmt = (f'"{symbols[0]}"' if len(symbols) == 1 else "") + "#,##0" + fraction
+    elif decimals:
+        kind, fmt = FLOAT, ("#,##0" if commas else "0") + fraction
+    else:
+        kind, fmt = INT, ("#,##0" if commas else None)
+
+    full = np.zeros(len(cells), dtype=np.int64 if kind == INT else np.float64)
+    full[~missing] = values
+    return Column(name, kind, full, missing, fmt)
+
+
+def _date_parts(x: np.ndarray, sep: str) -> tuple | None:
+    s = np.array(sep, dtype=_STR)
+    a, found1, rest = np.strings.partition(x, s)
+    b, found2, c = np.strings.partition(rest, s)
+    parts = (a, b, c)
+    ok = (found1 != "") & (found2 != "")
+    for part in parts:
+        ok &= np.strings.isdecimal(part) & (np.strings.str_len(part) >= 1)
+    return parts if ok.all() else None
+
+
+def _as_date(name: str, cells: np.ndarray, missing: np.ndarray) -> Column | None:
+    x = cells[~missing]
+    if not all(_DATEISH.fullmatch(c) for c in x[:SAMPLE_CELLS].tolist()):
+        return None
+    for sep in "-/.":
+        parts = _date_parts(x, sep)
+        if parts is not None:
+            break
+    else:
+        return None
+    a, b, c = parts
+    la, lb, lc = (np.strings.str_len(p) for p in parts)
+    if (lb > 2).any():
+        return None
+    if ((la == 4) & (lc <= 2)).all():
+        year, month, day = a, b, c
+    elif ((lc == 4) & (la <= 2)).all():
+        first, second = a.astype(np.int64), b.astype(np.int64)
+        if sep == "." or (first > 12).any():
+            year, month, day = c, b, a
+        elif (second > 12).any():
+            year, month, day = c, a, b
+        else:
+            return None  # 03/04/2026: can't tell month from day
+    else:
+        return None
+    iso = np.strings.add(np.strings.add(np.strings.add(np.strings.add(year, "-"), np.strings.zfill(month, 2)), "-"), np.strings.zfill(day, 2))
+    try:
+        values = iso.astype("datetime64[D]")
+    except ValueError:
+        return None  # month 13, Feb 30, ...
+    full = np.zeros(len(cells), dtype="datetime64[D]")
+    full[~missing] = values
+    return Column(name, DATE, full, missing, "yyyy-mm-dd")
+
+
+def _fits(got: str, kind: str) -> bool:
+    return got == kind or (got in NUMERIC and kind in NUMERIC)
+
+
+def _cell_value(cell: np.ndarray, kind: str):
+    if _blank_mask(cell)[0]:
+        return None
+    col = infer_column("", cell)
+    return col.tolist()[0] if _fits(col.kind, kind) else cell[0]
+
+
+def infer_column(name: str, cells: np.ndarray) -> Column:
+    """Type one column of stripped strings: number, percent, currency, date, or text."""
+    missing = _blank_mask(cells)
+    if missing.all():
+        return Column(name, TEXT, cells, cells == "")
+    return _as_number(name, cells, missing) or _as_date(name, cells, missing) or Column(name, TEXT, cells, cells == "")
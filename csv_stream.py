@@ -0,0 +1,87 @@
+"""
+Incremental parser for streamed model responses.
+
+feed() takes text as it arrives and returns the CSV rows of the ---BEGIN CSV--- block that
+are complete so far, so they can be written before the response ends. Text before the block
+is kept only until the block starts (for the fallback parser if it never does); inside the
+block only the unfinished line is buffered. The parser is done at ---END CSV---, or right
+after the first data row when the header is "error" (the "No matching data found" answer),
+so the caller can stop reading the stream early.
+"""
+
+import csv
+import io
+
+BEGIN, END = "---BEGIN CSV---", "---END CSV---"
+
+
+class CsvStreamParser:
+    def __init__(self):
+        self.header = None
+        self.rows = 0
+        self.done = False
+        self.in_block = False
+        self.is_error = False
+        self._buf = ""
+        self._scan = 0  # where to look for the next newline (skips newlines inside quotes)
+
+    @property
+    def text(self) -> str:
+        """Response text seen so far, if no CSV block was found (for extract_csv_from_response)."""
+        return "" if self.in_block else self._buf
+
+    def feed(self, chunk: str) -> list[list[str]]:
+        """Add streamed text; return the rows (header first) completed by it."""
+        if self.done:
+            return []
+        self._buf += chunk
+        if not self.in_block:
+            i = self._buf.find(BEGIN)
+            if i == -1:
+                return []
+            self.in_block = True
+            self._buf = self._buf[i + len(BEGIN) :]
+            self._scan = 0
+        out = []
+        while not self.done:
+            nl = self._buf.find("\n", self._scan)
+            if nl == -1:
+                break
+            record = self._buf[:nl]
+            if record.count('"') % 2:
+                # Newline inside a quoted field: the record continues on the next line
+                self._scan = nl + 1
+                continue
+            self._buf = self._buf[nl + 1 :]
+            self._scan = 0
+            out.extend(self._record(record))
+        return out
+
+    def finish(self) -> list[list[str]]:
+        """End of stream: rows from a last line without a trailing newline."""
+        if self.done or not self.in_block:
+            return []
+        record, self._buf = self._buf, ""
+        rows = self._record(record)
+        self.done = True
+        return rows
+
+    def _record(self, record: str) -> list[list[str]]:
+        line = record.strip()
+        end = line.find(END)
+        if end != -1:
+            self.done = True
+            line = line[:end].strip()
+        if not line:
+            return []
+        row = next(csv.reader(io.StringIO(line)), None)
+        if not row:
+            return []
+        if self.header is None:
+            self.header = row
+            self.is_error = [c.strip().lower() for c in row] == ["error"]
+        else:
+            self.rows += 1
+            if self.is_error:
+                self.done = True
+        return [row]
@@ -0,0 +1,109 @@
+"""
+Document sessions: upload a PDF to the provider once and reuse the reference for follow-up queries.
+
+Anthropic: the PDF goes to the Files API and later requests send only its file_id (plus
+cache_control blocks so the document prefix is served from the prompt cache).
+Gemini: the PDF goes to the Files API and later requests send only its URI.
+
+Sessions are keyed by provider, a fingerprint of the API key and the hash of the bytes sent,
+and live for a TTL. The registry can be persisted to a JSON file so separate CLI runs reuse
+uploads too; the API key itself is never stored.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SESSION_TTL = 3600  # seconds; Gemini keeps uploads for 48 h, Anthropic until deleted
+DEFAULT_SESSIONS_FILE = Path.home() / ".cache" / "pdf-excel" / "sessions.json"
+
+
+def _key_fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class DocumentSessions:
+    """Thread-safe registry of uploaded documents: (provider, key, sha256) -> provider file reference."""
+
+    def __init__(self, ttl: float = DEFAULT_SESSION_TTL, path: str | Path | None = None):
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.uploads = 0
+        self.reuses = 0
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def get_or_upload(self, provider: str, api_key: str, sha256: str, upload, delete=None) -> str:
+        """
+        Return the live reference for this document, or call upload() -> reference and remember it.
+        Expired entries of the same provider and key are dropped, calling delete(reference) if given.
+        """
+        owner = f"{provider}:{_key_fingerprint(api_key)}"
+        key = f"{owner}:{sha256}"
+        now = time.time()
+        with self._lock:
+            expired = [k for k, e in self._entries.items() if k.startswith(owner + ":") and e["expires"] <= now]
+            stale = [self._entries.pop(k)["ref"] for k in expired]
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.reuses += 1
+                ref = entry["ref"]
+            else:
+                ref = None
+            if stale:
+                self._save()
+        for old in stale:
+            if delete is not None:
+                try:
+                    delete(old)
+                except Exception as e:  # best effort; the provider expires files on its own too
+                    log.debug("Could not delete expired upload %s: %s", old, e)
+        if ref is not None:
+            log.info("Reusing uploaded document.")
+            return ref
+
+        log.info("Uploading document…")
+        ref = upload()
+        with self._lock:
+            self.uploads += 1
+            self._entries[key] = {"ref": ref, "expires": now + self.ttl}
+            self._save()
+        return ref
+
+
+_default_sessions = None
+_default_lock = threading.Lock()
+
+
+def default_sessions() -> DocumentSessions:
+    """
+    Process-wide registry used by run.py and app.py, persisted so CLI runs share uploads.
+    Configure with PDF_EXCEL_SESSIONS_FILE and PDF_EXCEL_SESSION_TTL (seconds).
+    """
+    global _default_sessions
+    with _default_lock:
+        if _default_sessions is None:
+            _default_sessions = DocumentSessions(
+                ttl=float(os.environ.get("PDF_EXCEL_SESSION_TTL", DEFAULT_SESSION_TTL)),
+                path=os.environ.get("PDF_EXCEL_SESSIONS_FILE") or DEFAULT_SESSIONS_FILE,
+            )
+        return _default_sessions
@@ -7,26 +7,48 @@ and get an Excel file with only that data.
 """
 
 import argparse
-import base64
+import contextlib
 import csv
 import io
 import logging
 import os
+import re
 import sys
+import time
 from pathlib import Path
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 log = logging.getLogger(__name__)
 
-import anthropic
 from dotenv import load_dotenv
-from openpyxl import Workbook
+
+import metrics
+from batch import acquire_request
+from chunking import DEFAULT_CHUNK_WORKERS, ask_in_chunks
+from clients import get_client
+from columns import ColumnTable
+from csv_stream import CsvStreamParser
+from doc_sessions import DocumentSessions
+from ingest import load_source, open_pdf
+from result_cache import ResultCache
+from writers import TableWriter, open_writer
 
 load_dotenv()
 
 # Max PDF size ~32MB, 100 pages per Anthropic limits
 MAX_PDF_BYTES = 32 * 1024 * 1024
 
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+
+# Anthropic beta that lets a document be uploaded once and referenced by file_id
+FILES_API_BETA = "files-api-2025-04-14"
+
+# Streamed data rows held to infer column types before the table is written (see stream_csv_to_file)
+STREAM_SAMPLE_ROWS = 100
+
+# Part of the result cache key; bump when EXTRACTION_SYSTEM_PROMPT or the user prompt changes
+PROMPT_VERSION = "1"
+
 EXTRACTION_SYSTEM_PROMPT = """You are a precise data extraction assistant. You receive a PDF and a user request describing exactly which part of the document to extract (e.g. "company taxes for January 2026", "sales table from Q3", "list of employees in the HR section").
 
 Your ONLY job is to:
@@ -50,19 +72,26 @@ Rules:
 """
 
 
-def load_pdf_base64(path: str) -> str:
-    path = Path(path)
-    if not path.exists():
-        raise FileNotFoundError(f"PDF not found: {path}")
-    if path.suffix.lower() != ".pdf":
-        raise ValueError("File must be a PDF")
-    data = path.read_bytes()
-    if len(data) > MAX_PDF_BYTES:
-        raise ValueError(f"PDF too large (max {MAX_PDF_BYTES // (1024*1024)}MB)")
-    return base64.standard_b64encode(data).decode("utf-8")
+def load_pdf_bytes(path: str, query: str | None = None, page_budget: int | None = None) -> bytes:
+    """
+    Read the PDF to send. With a query and page_budget, only the pages most relevant
+    to the query are kept (see page_select.py); otherwise the whole file.
+    """
+    with open_pdf(path, query, page_budget, MAX_PDF_BYTES) as doc:
+        return doc.read()
+
+
+def load_pdf_base64(path: str, query: str | None = None, page_budget: int | None = None) -> str:
+    with open_pdf(path, query, page_budget, MAX_PDF_BYTES) as doc:
+        return doc.base64()
 
 
 def extract_csv_from_response(text: str) -> str:
+    with metrics.timer("parse_csv"):
+        return _extract_csv(text)
+
+
+def _extract_csv(text: str) -> str:
     s = text.strip()
     # Prefer our explicit block
     begin, end = "---BEGIN CSV---", "---END CSV---"
@@ -75,6 +104,7 @@ def extract_csv_from_response(text: str) -> str:
             start = s.find(marker) + len(marker)
             rest = s[start:].strip()
             end_m = rest.find("```")
+            metrics.inc("pdf_excel_parse_fallbacks_total", kind="markdown")
             if end_m != -1:
                 return rest[:end_m].strip()
             return rest
@@ -82,73 +112,452 @@ def extract_csv_from_response(text: str) -> str:
     lines = [ln.strip() for ln in s.splitlines() if ln.strip()]
     for k, line in enumerate(lines):
         if "," in line and k + 1 <= len(lines):
+            metrics.inc("pdf_excel_parse_fallbacks_total", kind="plain")
             return "\n".join(lines[k:])
     raise ValueError("No CSV block found in model response. Response was: " + text[:500])
 
 
-def csv_to_excel(csv_content: str, out_path: str) -> None:
-    reader = csv.reader(io.StringIO(csv_content))
-    rows = list(reader)
+_LABELLED_BLOCK_RE = re.compile(r"---BEGIN CSV:\s*Q?(\d+)\s*---(.*?)---END CSV---", re.DOTALL)
+
+
+def build_user_prompt(queries: list[str]) -> str:
+    """User message for one query, or for several answered in one pass as labelled CSV blocks."""
+    if len(queries) == 1:
+        return f"Extract the following from this PDF and return only the CSV block as specified:\n\n{queries[0]}"
+    requests = "\n".join(f"Q{n}: {q}" for n, q in enumerate(queries, start=1))
+    return (
+        "Extract each of the following from this PDF. Answer every request in its own CSV block, "
+        "labelled with the request number, using the same CSV rules:\n\n"
+        "---BEGIN CSV: Q1---\nheader1,header2\nvalue1,value2\n---END CSV---\n\n"
+        f"Requests:\n{requests}"
+    )
+
+
+def extract_labelled_csv_blocks(text: str) -> dict[int, str]:
+    """
+    Labelled blocks from a multi-query response: {request number: CSV content}. Blocks that are
+    empty or don't parse as a CSV table (see _is_csv_table) are skipped.
+    """
+    blocks = {}
+    for match in _LABELLED_BLOCK_RE.finditer(text):
+        content = match.group(2).strip()
+        if _is_csv_table(content):
+            blocks.setdefault(int(match.group(1)), content)
+        elif content:
+            log.info("CSV block for request %s does not parse", match.group(1))
+    return blocks
+
+
+def _is_csv_table(content: str) -> bool:
+    """A header and at least one row, with well-formed quoting."""
+    try:
+        rows = [row for row in csv.reader(io.StringIO(content), strict=True) if row]
+    except csv.Error:
+        return False
+    return len(rows) >= 2
+
+
+def answer_queries(queries: list[str], ask_all, ask_one) -> list[str]:
+    """
+    CSV answer per query. Several queries go to the model in one request (ask_all(queries) ->
+    response text); only queries whose block is missing, empty or unparseable are re-asked alone
+    (ask_one).
+    """
+    if len(queries) == 1:
+        return [ask_one(queries[0])]
+    text = ask_all(queries)
+    with metrics.timer("parse_csv"):
+        blocks = extract_labelled_csv_blocks(text)
+    answers = []
+    for n, query in enumerate(queries, start=1):
+        if n not in blocks:
+            log.info("No usable CSV block for request %d; asking it on its own", n)
+            metrics.inc("pdf_excel_parse_fallbacks_total", kind="requery")
+            blocks[n] = ask_one(query)
+        answers.append(blocks[n])
+    return answers
+
+
+def cache_variant(page_budget: int | None, chunk_pages: int | None) -> str:
+    """Result cache variant for the request options that change what the model sees."""
+    variant = f"pages={page_budget}"
+    return f"{variant},chunks={chunk_pages}" if chunk_pages else variant
+
+
+def _is_error_answer(content: str) -> bool:
+    """The model's "No matching data found" answer: a single "error" column."""
+    header = next(csv.reader(io.StringIO(content)), None)
+    return header is not None and [c.strip().lower() for c in header] == ["error"]
+
+
+def answers_with_cache(queries: list[str], cache: ResultCache | None, key_for, compute) -> list[str]:
+    """
+    Answers from the cache where possible; compute(missing queries) -> answers for the rest.
+    Error answers are not cached, so a retry (another model, a fixed page range) asks again.
+    """
+    if cache is None:
+        return compute(queries)
+    keys = [key_for(q) for q in queries]
+    answers = [cache.get(k) for k in keys]
+    missing = [i for i, a in enumerate(answers) if a is None]
+    metrics.inc("pdf_excel_cache_total", len(queries) - len(missing), cache="result", result="hit")
+    metrics.inc("pdf_excel_cache_total", len(missing), cache="result", result="miss")
+    if len(missing) < len(queries):
+        log.info("Cache hit for %d of %d quer%s.", len(queries) - len(missing), len(queries), "y" if len(queries) == 1 else "ies")
+    if missing:
+        for i, content in zip(missing, compute([queries[i] for i in missing])):
+            if not _is_error_answer(content):
+                cache.put(keys[i], content)
+            answers[i] = content
+    return answers
+
+
+def _write_csv_sheet(writer: TableWriter, title: str, csv_content: str, infer_types: bool = True) -> int:
+    rows = list(csv.reader(io.StringIO(csv_content)))
     if not rows:
+        return 0
+    return writer.write_table(title, ColumnTable.from_rows(rows, infer=infer_types))
+
+
+def csv_to_excel(csv_content: str, out_path: str, fmt: str = "xlsx", infer_types: bool = True) -> None:
+    if not next(csv.reader(io.StringIO(csv_content)), None):
         raise ValueError("CSV has no rows")
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Extracted"
-    for r in rows:
-        ws.append(r)
-    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-    wb.save(out_path)
+    with open_writer(out_path, fmt) as writer:
+        _write_csv_sheet(writer, "Extracted", csv_content, infer_types)
 
 
-def extract_pdf_to_excel(
-    pdf_path: str,
-    user_query: str,
-    output_path: str,
-    api_key: str | None = None,
-    model: str = "claude-sonnet-4-20250514",
-) -> str:
+def answers_to_excel(queries: list[str], answers: list[str], out_path: str, fmt: str = "xlsx", infer_types: bool = True) -> None:
     """
-    Extract data from PDF per user query using Anthropic API and save as Excel.
+    One query: the usual "Extracted" sheet. Several: one sheet per query, titled by the query.
+    fmt other than "xlsx" writes the same tables as files in a directory or .zip (see writers.py).
+    Numeric and date columns are written as typed values unless infer_types is False.
+    """
+    if len(queries) == 1:
+        csv_to_excel(answers[0], out_path, fmt, infer_types)
+        return
+    with open_writer(out_path, fmt) as writer:
+        for query, content in zip(queries, answers):
+            if not _write_csv_sheet(writer, query, content, infer_types):
+                writer.write_sheet(query, [["error"], ["No rows returned"]])
 
-    Returns the path to the saved Excel file.
+
+def iter_csv_stream(chunks, parser: CsvStreamParser, on_rows=None, cancel=None):
     """
-    api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("Set ANTHROPIC_API_KEY in .env or pass api_key=...")
+    Feed a streamed response (iterable of text chunks) to parser and yield the CSV rows
+    (header first) in batches as they complete. Reading stops at the end of the block, after
+    an "error" row, or once cancel (a threading.Event) is set; the stream is closed then.
+    on_rows(n) gets the running data-row count.
+    """
+    t0 = time.perf_counter()
+    first_row_s = None
+    close = getattr(chunks, "close", None)
+    try:
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                return
+            completed = parser.feed(chunk)
+            if completed:
+                if first_row_s is None:
+                    first_row_s = time.perf_counter() - t0
+                    metrics.observe("pdf_excel_stage_seconds", first_row_s, stage="first_row")
+                yield completed
+                if on_rows is not None and parser.rows:
+                    on_rows(parser.rows)
+            if parser.done:
+                break
+    finally:
+        if close is not None:
+            close()  # ends the HTTP stream if we stop early
+    last = parser.finish()
+    if last:
+        yield last
+    if parser.header is not None:
+        log.info("Streamed %d row(s); first row after %.1f s", parser.rows, first_row_s or 0.0)
 
-    pdf_b64 = load_pdf_base64(pdf_path)
-    log.info("Calling API…")
-    client = anthropic.Anthropic(api_key=api_key)
+
+def read_csv_stream(chunks, on_rows=None, cancel=None) -> tuple[list[list[str]], CsvStreamParser]:
+    """
+    iter_csv_stream, collected: returns the rows (header first) and the parser, whose text
+    holds the raw response when it had no CSV block.
+    """
+    parser = CsvStreamParser()
+    rows = [row for batch in iter_csv_stream(chunks, parser, on_rows, cancel) for row in batch]
+    return rows, parser
+
+
+def rows_to_csv(rows: list[list[str]]) -> str:
+    content = io.StringIO()
+    csv.writer(content, lineterminator="\n").writerows(rows)
+    return content.getvalue().rstrip("\n")
+
+
+def stream_csv_to_file(chunks, out_path: str, fmt: str = "xlsx", on_rows=None, infer_types: bool = True) -> str:
+    """
+    Write the CSV block of a streamed response (see iter_csv_stream) to an "Extracted" sheet
+    like csv_to_excel. Column types are inferred on the first STREAM_SAMPLE_ROWS data rows;
+    from then on every row is written as it arrives, its cells typed like the sample (cells that
+    don't parse stay text). Shorter tables are typed over whole columns when the block ends.
+    Responses without a block fall back to extract_csv_from_response. Returns the CSV content
+    (for the result cache).
+    """
+    parser = CsvStreamParser()
+    held = []
+    content = io.StringIO()
+    content_writer = csv.writer(content, lineterminator="\n")
+    with contextlib.ExitStack() as stack:
+        sample = sheet = None
+        for rows in iter_csv_stream(chunks, parser, on_rows):
+            content_writer.writerows(rows)
+            if sheet is not None:
+                for row in sample.typed_rows(rows):
+                    sheet.append(row)
+                continue
+            held += rows
+            if len(held) > STREAM_SAMPLE_ROWS:  # header + sample
+                sample = ColumnTable.from_rows(held, infer=infer_types)
+                sheet = stack.enter_context(open_writer(out_path, fmt)).start_table("Extracted", sample)
+                held = []
+        if sheet is None and held:
+            with open_writer(out_path, fmt) as writer:
+                writer.write_table("Extracted", ColumnTable.from_rows(held, infer=infer_types))
+    if sheet is None and not held:
+        if parser.in_block:
+            raise ValueError("CSV has no rows")
+        csv_content = extract_csv_from_response(parser.text)
+        csv_to_excel(csv_content, out_path, fmt, infer_types)
+        return csv_content
+    return content.getvalue().rstrip("\n")
+
+
+def _log_usage(usage) -> None:
+    if usage is None:
+        return
+    for kind, attr in (
+        ("input", "input_tokens"),
+        ("cache_read", "cache_read_input_tokens"),
+        ("cache_write", "cache_creation_input_tokens"),
+        ("output", "output_tokens"),
+    ):
+        count = getattr(usage, attr, 0)
+        if isinstance(count, int):
+            metrics.inc("pdf_excel_tokens_total", count, provider="anthropic", kind=kind)
+    log.info(
+        "Tokens: input %s (cache read %s, cache write %s), output %s",
+        getattr(usage, "input_tokens", "?"),
+        getattr(usage, "cache_read_input_tokens", 0) or 0,
+        getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        getattr(usage, "output_tokens", "?"),
+    )
+
+
+def _prepare_request(
+    pdf_path: str,
+    queries: list[str],
+    api_key: str,
+    model: str,
+    page_budget: int | None,
+    sessions: DocumentSessions | None,
+    client,
+) -> tuple:
+    """Upload or encode the PDF and build the request. Returns (messages API, request kwargs)."""
+    if client is None:
+        client = get_client("anthropic", api_key)  # shared, keeps connections warm (see clients.py)
+    with metrics.timer("open"):
+        doc = open_pdf(pdf_path, " ".join(queries), page_budget, MAX_PDF_BYTES)
+    with doc:
+        acquire_request(doc.path or doc.read())  # the batch's rate limit, per request (see batch.py)
+        if sessions is not None:
+
+            def upload():
+                metrics.observe("pdf_excel_upload_bytes", doc.size, provider="anthropic")
+                with doc.file() as f:
+                    return client.beta.files.upload(file=(doc.name, f, "application/pdf"), betas=[FILES_API_BETA]).id
+
+            file_id = sessions.get_or_upload(
+                "anthropic",
+                api_key,
+                doc.sha256,
+                upload=upload,
+                delete=lambda ref: client.beta.files.delete(ref, betas=[FILES_API_BETA]),
+            )
+            source = {"type": "file", "file_id": file_id}
+        else:
+            metrics.observe("pdf_excel_upload_bytes", doc.size, provider="anthropic")
+            source = {"type": "base64", "media_type": "application/pdf", "data": doc.base64()}
 
     user_content = [
         {
             "type": "document",
-            "source": {
-                "type": "base64",
-                "media_type": "application/pdf",
-                "data": pdf_b64,
-            },
+            "source": source,
+            "cache_control": {"type": "ephemeral"},
         },
         {
             "type": "text",
-            "text": f"Extract the following from this PDF and return only the CSV block as specified:\n\n{user_query}",
+            "text": build_user_prompt(queries),
         },
     ]
-
-    message = client.messages.create(
+    request = dict(
         model=model,
         max_tokens=8192,
-        system=EXTRACTION_SYSTEM_PROMPT,
+        system=[{"type": "text", "text": EXTRACTION_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
         messages=[{"role": "user", "content": user_content}],
     )
+    if sessions is not None:
+        return client.beta.messages, {**request, "betas": [FILES_API_BETA]}
+    return client.messages, request
+
+
+def request_text(
+    pdf_path: str,
+    queries: list[str],
+    api_key: str,
+    model: str = DEFAULT_MODEL,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+) -> str:
+    """
+    Send the PDF and one or more queries to the Anthropic API and return the response text.
+    page_budget limits the upload to the pages most relevant to the queries.
+
+    The system prompt and document carry cache_control, so follow-up queries on the same
+    document within the cache TTL read the prefix from the prompt cache. With sessions, the
+    PDF is uploaded once via the Files API and later queries send only its file_id.
+    """
+    messages, request = _prepare_request(pdf_path, queries, api_key, model, page_budget, sessions, client)
+    log.info("Calling API…")
+    t0 = time.perf_counter()
+    message = messages.create(**request)
+    metrics.observe("pdf_excel_provider_seconds", time.perf_counter() - t0, provider="anthropic")
+    _log_usage(getattr(message, "usage", None))
 
     response_text = ""
     for block in message.content:
         if hasattr(block, "text"):
             response_text += block.text
+    return response_text
+
+
+def stream_text(
+    pdf_path: str,
+    queries: list[str],
+    api_key: str,
+    model: str = DEFAULT_MODEL,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+):
+    """Like request_text, but yields the response text as it arrives. Closing the generator ends the request."""
+    messages, request = _prepare_request(pdf_path, queries, api_key, model, page_budget, sessions, client)
+    log.info("Calling API (streaming)…")
+    t0 = time.perf_counter()
+    try:
+        with messages.stream(**request) as stream:
+            yield from stream.text_stream
+            _log_usage(getattr(stream.get_final_message(), "usage", None))
+    finally:
+        metrics.observe("pdf_excel_provider_seconds", time.perf_counter() - t0, provider="anthropic")
+
 
-    csv_content = extract_csv_from_response(response_text)
-    csv_to_excel(csv_content, output_path)
+def extract_csv(
+    pdf_path: str,
+    user_query: str,
+    api_key: str,
+    model: str = DEFAULT_MODEL,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+) -> str:
+    """Send the PDF and query to the Anthropic API and return the parsed CSV content."""
+    return extract_csv_from_response(request_text(pdf_path, [user_query], api_key, model, page_budget, sessions, client))
+
+
+def extract_csvs(
+    pdf_path: str,
+    queries: list[str],
+    api_key: str,
+    model: str = DEFAULT_MODEL,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+) -> list[str]:
+    """CSV content per query, from a single request (queries whose block fails to parse are re-asked alone)."""
+    return answer_queries(
+        queries,
+        lambda qs: request_text(pdf_path, qs, api_key, model, page_budget, sessions, client),
+        lambda q: extract_csv(pdf_path, q, api_key, model, page_budget, sessions, client),
+    )
+
+
+def extract_pdf_to_excel(
+    pdf_path: str,
+    user_query: str | list[str],
+    output_path: str,
+    api_key: str | None = None,
+    model: str | None = None,
+    cache: ResultCache | None = None,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    fmt: str = "xlsx",
+    stream: bool = False,
+    on_rows=None,
+    infer_types: bool = True,
+    chunk_pages: int | None = None,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+) -> str:
+    """
+    Extract data from PDF per user query using Anthropic API and save as Excel.
+    With a cache, a repeat of the same PDF bytes, query and model skips the API call.
+    page_budget (e.g. 10) sends only the best-matching pages plus neighbours, falling
+    back to the whole document when no small set of pages clearly matches the query.
+    With sessions, the PDF is uploaded once and reused by follow-up queries (see doc_sessions.py).
+    A list of queries is answered in one request, one sheet per query.
+    fmt "csv", "ndjson" or "parquet" writes the tables to a directory or .zip instead of Excel.
+    With stream, a single query's rows are parsed as the response arrives (on_rows(n) reports
+    progress); several queries still use one non-streamed request. Numeric and date columns are
+    written as typed values unless infer_types is False.
+    chunk_pages (e.g. 50) splits the PDF into sub-PDFs of at most that many pages (and 32 MB),
+    asks them chunk_workers at a time and merges the answers (see chunking.py); this lifts the
+    size and page limits and is not streamed.
+    pdf_path may also be the PDF's bytes or a binary file object, and output_path a writable
+    binary file object (see writers.py), so nothing has to be saved to disk.
+
+    Returns the path to the saved Excel file.
+    """
+    api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("Set ANTHROPIC_API_KEY in .env or pass api_key=...")
+    model = model or DEFAULT_MODEL
+
+    pdf_path = load_source(pdf_path)  # file objects are read once; chunk workers share the bytes
+    queries = [user_query] if isinstance(user_query, str) else list(user_query)
+    if not queries:
+        raise ValueError("No query given")
+
+    if chunk_pages and page_budget:
+        raise ValueError("Page budget and chunking can't be combined")
+
+    streamed = False
+
+    def compute(qs: list[str]) -> list[str]:
+        nonlocal streamed
+        if chunk_pages:
+            ask = lambda chunk, chunk_qs: extract_csvs(chunk, chunk_qs, api_key, model, None, sessions)  # noqa: E731
+            return ask_in_chunks(pdf_path, qs, ask, chunk_pages, MAX_PDF_BYTES, chunk_workers)
+        if stream and len(queries) == 1:
+            streamed = True
+            chunks = stream_text(pdf_path, qs, api_key, model, page_budget, sessions)
+            return [stream_csv_to_file(chunks, output_path, fmt, on_rows, infer_types)]
+        return extract_csvs(pdf_path, qs, api_key, model, page_budget, sessions)
+
+    answers = answers_with_cache(
+        queries,
+        cache,
+        key_for=lambda q: cache.key(pdf_path, q, "anthropic", model, PROMPT_VERSION, variant=cache_variant(page_budget, chunk_pages)),
+        compute=compute,
+    )
+    if not streamed:
+        answers_to_excel(queries, answers, output_path, fmt, infer_types)
     log.info("Done.")
     return output_path
 
@@ -167,10 +576,11 @@ def main() -> int:
     )
     parser.add_argument(
         "--model",
-        default="claude-sonnet-4-20250514",
-        help="Anthropic model (default: claude-sonnet-4-20250514)",
+        default=DEFAULT_MODEL,
+        help=f"Anthropic model (default: {DEFAULT_MODEL})",
     )
     args = parser.parse_args()
+    import anthropic
 
     try:
         out = args.output or str(Path(args.pdf).with_suffix(".xlsx"))
@@ -8,11 +8,26 @@ Set GEMINI_API_KEY in .env. Get a free key at https://aistudio.google.com/app/ap
 
 import logging
 import os
-from pathlib import Path
+import time
 
 from dotenv import load_dotenv
 
-from extract import extract_csv_from_response, csv_to_excel
+import metrics
+from batch import acquire_request
+from chunking import DEFAULT_CHUNK_WORKERS, ask_in_chunks
+from clients import get_client
+from doc_sessions import DocumentSessions
+from extract import (
+    answer_queries,
+    answers_to_excel,
+    answers_with_cache,
+    build_user_prompt,
+    cache_variant,
+    extract_csv_from_response,
+    stream_csv_to_file,
+)
+from ingest import load_source, open_pdf
+from result_cache import ResultCache
 
 load_dotenv()
 
@@ -21,6 +36,9 @@ log = logging.getLogger(__name__)
 # Gemini allows larger files; we use 32 MB to match web app and keep behaviour consistent
 MAX_PDF_BYTES = 32 * 1024 * 1024
 
+# Part of the result cache key; bump when SYSTEM_INSTRUCTION or the user prompt changes
+PROMPT_VERSION = "1"
+
 SYSTEM_INSTRUCTION = """You are a precise data extraction assistant. You receive a PDF and a user request describing exactly which part of the document to extract (e.g. "company taxes for January 2026", "sales table from Q3").
 
 Your ONLY job is to:
@@ -42,52 +60,78 @@ Rules:
 """
 
 
-def extract_pdf_to_excel(
+def _prepare_request(
     pdf_path: str,
-    user_query: str,
-    output_path: str,
-    api_key: str | None = None,
-    model: str | None = None,
-) -> str:
-    """
-    Extract data from PDF per user query using Gemini API and save as Excel.
-    Returns the path to the saved Excel file.
-    """
-    api_key = api_key or os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("Set GEMINI_API_KEY in .env or pass api_key=... (free at https://aistudio.google.com/app/apikey)")
-    model = model or os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
-
-    path = Path(pdf_path)
-    if not path.exists():
-        raise FileNotFoundError(f"PDF not found: {path}")
-    if path.suffix.lower() != ".pdf":
-        raise ValueError("File must be a PDF")
-    pdf_bytes = path.read_bytes()
-    if len(pdf_bytes) > MAX_PDF_BYTES:
-        raise ValueError(f"PDF too large (max {MAX_PDF_BYTES // (1024*1024)} MB)")
-
+    queries: list[str],
+    api_key: str,
+    model: str,
+    page_budget: int | None,
+    sessions: DocumentSessions | None,
+    client,
+) -> tuple:
+    """Upload or inline the PDF and build the request. Returns (client, generate_content kwargs)."""
     try:
-        from google import genai
         from google.genai import types
     except ImportError:
         raise ImportError("Install the Gemini SDK: pip install google-genai") from None
 
-    log.info("Calling Gemini API…")
-    client = genai.Client(api_key=api_key)
+    client = client or get_client("gemini", api_key)  # shared, keeps connections warm (see clients.py)
+    with metrics.timer("open"):
+        doc = open_pdf(pdf_path, " ".join(queries), page_budget, MAX_PDF_BYTES)
+    with doc:
+        acquire_request(doc.path or doc.read())  # the batch's rate limit, per request (see batch.py)
+        if sessions is not None:
 
-    user_prompt = f"Extract the following from this PDF and return only the CSV block as specified:\n\n{user_query}"
+            def upload():
+                metrics.observe("pdf_excel_upload_bytes", doc.size, provider="gemini")
+                with doc.file() as f:
+                    return client.files.upload(file=f, config=types.UploadFileConfig(mime_type="application/pdf")).uri
 
-    response = client.models.generate_content(
+            file_uri = sessions.get_or_upload("gemini", api_key, doc.sha256, upload=upload)
+            document = types.Part.from_uri(file_uri=file_uri, mime_type="application/pdf")
+        else:
+            # The SDK only takes bytes for inline data
+            metrics.observe("pdf_excel_upload_bytes", doc.size, provider="gemini")
+            document = types.Part.from_bytes(data=doc.read(), mime_type="application/pdf")
+
+    request = dict(
         model=model,
-        contents=[
-            types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf"),
-            user_prompt,
-        ],
+        contents=[document, build_user_prompt(queries)],
         config=types.GenerateContentConfig(
             system_instruction=[SYSTEM_INSTRUCTION],
         ),
     )
+    return client, request
+
+
+def _log_usage(usage) -> None:
+    for kind, attr in (("input", "prompt_token_count"), ("cache_read", "cached_content_token_count"), ("output", "candidates_token_count")):
+        count = getattr(usage, attr, None)
+        if isinstance(count, int):
+            metrics.inc("pdf_excel_tokens_total", count, provider="gemini", kind=kind)
+
+
+def request_text(
+    pdf_path: str,
+    queries: list[str],
+    api_key: str,
+    model: str,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+) -> str:
+    """
+    Send the PDF and one or more queries to the Gemini API and return the response text.
+    page_budget limits the upload to the pages most relevant to the queries.
+    With sessions, the PDF is uploaded once via the Files API and later queries send only its URI.
+    """
+    client, request = _prepare_request(pdf_path, queries, api_key, model, page_budget, sessions, client)
+    log.info("Calling Gemini API…")
+
+    t0 = time.perf_counter()
+    response = client.models.generate_content(**request)
+    metrics.observe("pdf_excel_provider_seconds", time.perf_counter() - t0, provider="gemini")
+    _log_usage(getattr(response, "usage_metadata", None))
 
     # response.text in newer SDK; fallback for candidates
     if hasattr(response, "text") and response.text:
@@ -99,8 +143,126 @@ def extract_pdf_to_excel(
         text = str(response)
     if not text:
         raise ValueError("Gemini returned an empty response")
+    return text
+
 
-    csv_content = extract_csv_from_response(text)
-    csv_to_excel(csv_content, output_path)
+def stream_text(
+    pdf_path: str,
+    queries: list[str],
+    api_key: str,
+    model: str,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+):
+    """Like request_text, but yields the response text as it arrives. Closing the generator ends the request."""
+    client, request = _prepare_request(pdf_path, queries, api_key, model, page_budget, sessions, client)
+    log.info("Calling Gemini API (streaming)…")
+    t0 = time.perf_counter()
+    usage = None
+    try:
+        for chunk in client.models.generate_content_stream(**request):
+            # Usage totals arrive with the last chunk
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if getattr(chunk, "text", None):
+                yield chunk.text
+        _log_usage(usage)
+    finally:
+        metrics.observe("pdf_excel_provider_seconds", time.perf_counter() - t0, provider="gemini")
+
+
+def extract_csv(
+    pdf_path: str,
+    user_query: str,
+    api_key: str,
+    model: str,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+) -> str:
+    """Send the PDF and query to the Gemini API and return the parsed CSV content."""
+    return extract_csv_from_response(request_text(pdf_path, [user_query], api_key, model, page_budget, sessions, client))
+
+
+def extract_csvs(
+    pdf_path: str,
+    queries: list[str],
+    api_key: str,
+    model: str,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    client=None,
+) -> list[str]:
+    """CSV content per query, from a single request (queries whose block fails to parse are re-asked alone)."""
+    return answer_queries(
+        queries,
+        lambda qs: request_text(pdf_path, qs, api_key, model, page_budget, sessions, client),
+        lambda q: extract_csv(pdf_path, q, api_key, model, page_budget, sessions, client),
+    )
+
+
+def extract_pdf_to_excel(
+    pdf_path: str,
+    user_query: str | list[str],
+    output_path: str,
+    api_key: str | None = None,
+    model: str | None = None,
+    cache: ResultCache | None = None,
+    page_budget: int | None = None,
+    sessions: DocumentSessions | None = None,
+    fmt: str = "xlsx",
+    stream: bool = False,
+    on_rows=None,
+    infer_types: bool = True,
+    chunk_pages: int | None = None,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+) -> str:
+    """
+    Extract data from PDF per user query using Gemini API and save as Excel.
+    With a cache, a repeat of the same PDF bytes, query and model skips the API call.
+    page_budget sends only the pages most relevant to the query (see page_select.py).
+    With sessions, the PDF is uploaded once and reused by follow-up queries (see doc_sessions.py).
+    A list of queries is answered in one request, one sheet per query.
+    fmt "csv", "ndjson" or "parquet" writes the tables to a directory or .zip instead of Excel.
+    With stream, a single query's rows are parsed as the response arrives (on_rows(n) reports progress).
+    Numeric and date columns are written as typed values unless infer_types is False.
+    chunk_pages splits the PDF into sub-PDFs asked in parallel and merges the answers (see chunking.py).
+    pdf_path and output_path may be in-memory sources and targets, as for extract.extract_pdf_to_excel.
+    Returns the path to the saved Excel file.
+    """
+    api_key = api_key or os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("Set GEMINI_API_KEY in .env or pass api_key=... (free at https://aistudio.google.com/app/apikey)")
+    model = model or os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+
+    pdf_path = load_source(pdf_path)
+    queries = [user_query] if isinstance(user_query, str) else list(user_query)
+    if not queries:
+        raise ValueError("No query given")
+
+    if chunk_pages and page_budget:
+        raise ValueError("Page budget and chunking can't be combined")
+
+    streamed = False
+
+    def compute(qs: list[str]) -> list[str]:
+        nonlocal streamed
+        if chunk_pages:
+            ask = lambda chunk, chunk_qs: extract_csvs(chunk, chunk_qs, api_key, model, None, sessions)  # noqa: E731
+            return ask_in_chunks(pdf_path, qs, ask, chunk_pages, MAX_PDF_BYTES, chunk_workers)
+        if stream and len(queries) == 1:
+            streamed = True
+            chunks = stream_text(pdf_path, qs, api_key, model, page_budget, sessions)
+            return [stream_csv_to_file(chunks, output_path, fmt, on_rows, infer_types)]
+        return extract_csvs(pdf_path, qs, api_key, model, page_budget, sessions)
+
+    answers = answers_with_cache(
+        queries,
+        cache,
+        key_for=lambda q: cache.key(pdf_path, q, "gemini", model, PROMPT_VERSION, variant=cache_variant(page_budget, chunk_pages)),
+        compute=compute,
+    )
+    if not streamed:
+        answers_to_excel(queries, answers, output_path, fmt, infer_types)
     log.info("Done.")
     return output_path
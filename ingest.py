@@ -0,0 +1,210 @@
+"""
+PDF ingestion for the AI providers without extra copies of the document.
+
+open_pdf() memory-maps the file (or wraps the bytes of a pruned subset) and computes its
+SHA-256 in one pass over the map, once per file version. Providers then take what they need:
+base64() encodes the inline string straight from the map, and file() streams the file from
+disk for Files API uploads. The hash is shared with the result cache and document sessions,
+so the file is not read again to key them.
+
+A "source" is a path, the PDF's bytes, or a binary file object (e.g. a spooled upload), so the
+web app can convert uploads without saving them first; source_file() and source_sha256() work
+on any of them.
+"""
+
+import base64
+import hashlib
+import io
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+HASH_CHUNK = 1024 * 1024
+
+# pdfium is not thread-safe, and conversions run side by side in web job, bulk and batch
+# threads: every use of pypdfium2 holds this lock
+PDFIUM_LOCK = threading.RLock()
+
+_DIGEST_MEMO_SIZE = 256
+_digests: OrderedDict = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def _memo_key(path: Path):
+    st = path.stat()
+    return (str(path.resolve()), st.st_size, st.st_mtime_ns)
+
+
+def _sha256_of(buffer) -> str:
+    h = hashlib.sha256()
+    with memoryview(buffer) as view:
+        for i in range(0, len(view), HASH_CHUNK):
+            h.update(view[i : i + HASH_CHUNK])
+    return h.hexdigest()
+
+
+def _remember(key, digest: str) -> None:
+    with _digests_lock:
+        _digests[key] = digest
+        _digests.move_to_end(key)
+        while len(_digests) > _DIGEST_MEMO_SIZE:
+            _digests.popitem(last=False)
+
+
+def file_sha256(path: str | Path) -> str:
+    """SHA-256 of a file's content, remembered per (path, size, mtime) so repeat lookups are free."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"PDF not found: {path}")
+    key = _memo_key(path)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is not None:
+        return digest
+    if key[1] == 0:
+        digest = hashlib.sha256().hexdigest()
+    else:
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest = _sha256_of(mm)
+    _remember(key, digest)
+    return digest
+
+
+def is_path(source) -> bool:
+    """True for a file path; False for bytes and binary file objects."""
+    return isinstance(source, (str, os.PathLike))
+
+
+def read_source(source) -> bytes:
+    """The whole PDF from bytes or a binary file object (read from the start)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+def load_source(source):
+    """Paths stay paths; a file object is read into bytes once, so threads can share the result."""
+    return source if is_path(source) or isinstance(source, bytes) else read_source(source)
+
+
+def source_file(source):
+    """The source as pdfplumber and pypdfium2 take it: a path string, or a binary file at offset 0."""
+    if is_path(source):
+        return str(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def source_sha256(source) -> str:
+    """SHA-256 of a source's content (see file_sha256 for paths)."""
+    if is_path(source):
+        return file_sha256(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _sha256_of(source)
+    h = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(HASH_CHUNK), b""):
+        h.update(chunk)
+    source.seek(0)
+    return h.hexdigest()
+
+
+class PdfDocument:
+    """The bytes to send for one request: a read-only map of the file, or an in-memory subset."""
+
+    def __init__(self, name: str, buffer, path: Path | None = None, sha256: str | None = None):
+        self.name = name
+        self.path = path
+        self.size = len(buffer)
+        self._buffer = buffer
+        self._sha256 = sha256
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            key = _memo_key(self.path) if self.path is not None else None
+            with _digests_lock:
+                self._sha256 = _digests.get(key)
+            if self._sha256 is None:
+                self._sha256 = _sha256_of(self._buffer)
+                if key is not None:
+                    _remember(key, self._sha256)
+        return self._sha256
+
+    def base64(self) -> str:
+        """Standard base64 of the document, encoded straight from the map (no bytes copy first)."""
+        return base64.standard_b64encode(self._buffer).decode("ascii")
+
+    def file(self):
+        """Binary reader over the document for uploads (streams from disk for whole files)."""
+        if self.path is not None:
+            return self.path.open("rb")
+        return io.BytesIO(self._buffer)  # shares the bytes object, no copy
+
+    def read(self) -> bytes:
+        """The document as bytes, for SDKs that only take bytes. Makes one copy of a mapped file."""
+        return self._buffer if isinstance(self._buffer, bytes) else self._buffer[:]
+
+    def close(self) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_pdf(
+    path,
+    query: str | None = None,
+    page_budget: int | None = None,
+    max_bytes: int | None = None,
+) -> PdfDocument:
+    """
+    Open the PDF to send. With a query and page_budget, only the pages most relevant to the
+    query are kept (see page_select.py); otherwise the whole file is memory-mapped.
+    path may also be the PDF's bytes or a binary file object, which is read into memory.
+    Raises ValueError if the result is larger than max_bytes. Use as a context manager.
+    """
+    if not is_path(path):
+        return _open_in_memory(read_source(path), query, page_budget, max_bytes)
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"PDF not found: {path}")
+    if path.suffix.lower() != ".pdf":
+        raise ValueError("File must be a PDF")
+    subset = None
+    if query and page_budget:
+        from page_select import prune_pdf  # pulls in pdfplumber; only needed for pruning
+
+        subset = prune_pdf(path, query, page_budget)
+    if subset is not None:
+        doc = PdfDocument(path.name, subset)
+    elif path.stat().st_size == 0:
+        raise ValueError("PDF is empty")
+    else:
+        with path.open("rb") as f:
+            doc = PdfDocument(path.name, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), path=path)
+    if max_bytes is not None and doc.size > max_bytes:
+        doc.close()
+        raise ValueError(f"PDF too large (max {max_bytes // (1024*1024)}MB)")
+    return doc
+
+
+def _open_in_memory(data: bytes, query: str | None, page_budget: int | None, max_bytes: int | None) -> PdfDocument:
+    if not data:
+        raise ValueError("PDF is empty")
+    if query and page_budget:
+        from page_select import prune_pdf
+
+        data = prune_pdf(data, query, page_budget) or data
+    if max_bytes is not None and len(data) > max_bytes:
+        raise ValueError(f"PDF too large (max {max_bytes // (1024*1024)}MB)")
+    return PdfDocument("document.pdf", data)
@@ -0,0 +1,213 @@
+"""
+Background job queue for the web app.
+
+/extract puts the conversion on a bounded queue and returns a job id at once; a pool of
+worker threads (optionally handing the work to worker processes) runs the conversions.
+When the queue is full, submit() raises QueueFull so the caller can answer 503.
+Finished jobs keep their result for a TTL, then the job is removed and its files are closed
+(an in-memory result, the spooled buffers passed to submit(), or a temp directory). A
+download that reads an in-memory result holds it with acquire_result()/release_result(), so
+it is only closed once the last such download ends.
+A running conversion can call report_progress() to update its job's progress (thread workers only).
+"""
+
+import logging
+import queue
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_current = threading.local()
+
+# Guards Job.readers and Job.released
+_readers_lock = threading.Lock()
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity; retry later."""
+
+
+@dataclass
+class Job:
+    id: str
+    download_name: str
+    work_dir: str | None = None
+    files: tuple = ()
+    status: str = QUEUED
+    result: object = None
+    error: str | None = None
+    progress: dict = field(default_factory=dict)
+    created: float = field(default_factory=time.time)
+    finished: float | None = None
+    readers: int = 0
+    released: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "progress": dict(self.progress),
+            "download_name": self.download_name,
+        }
+
+
+def report_progress(**fields) -> None:
+    """Merge fields into the progress of the job running in this thread (no-op outside a job)."""
+    _update_progress(getattr(_current, "job", None), fields)
+
+
+def progress_reporter():
+    """
+    report_progress bound to the job running in this thread, for callbacks that run in other
+    threads (the router's and chunk workers' pools).
+    """
+    job = getattr(_current, "job", None)
+    return lambda **fields: _update_progress(job, fields)
+
+
+def _update_progress(job: Job | None, fields: dict) -> None:
+    if job is not None:
+        job.progress = {**job.progress, **fields}
+
+
+def acquire_result(job: Job) -> bool:
+    """Count a reader of job.result, keeping it open until release_result(). False once the job is released."""
+    with _readers_lock:
+        if job.released:
+            return False
+        job.readers += 1
+        return True
+
+
+def release_result(job: Job) -> None:
+    """End a reader; closes the result if the job expired while it was being read."""
+    with _readers_lock:
+        job.readers -= 1
+        close = job.released and job.readers == 0
+    if close and hasattr(job.result, "close"):
+        job.result.close()
+
+
+def _release(job: Job) -> None:
+    """Close the job's files and remove its temp directory, if any. A result being read is closed by its last reader."""
+    for f in job.files:
+        # The output buffer is usually one of the files too; it is closed below, once unread
+        if f is not job.result and hasattr(f, "close"):
+            f.close()
+    with _readers_lock:
+        job.released = True
+        close = job.readers == 0
+    if close and hasattr(job.result, "close"):
+        job.result.close()
+    if job.work_dir is not None:
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+
+
+class JobQueue:
+    """
+    Bounded queue + worker pool. fn(*args) returns the result: a file path, bytes, or a
+    binary file object. With processes=True, workers hand fn to a process pool (fn, args and
+    the result must be picklable, so no file objects).
+    error_message(exc) turns a failure into the text stored on the job.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queued: int = 16,
+        result_ttl: float = 900,
+        processes: bool = False,
+        error_message=str,
+    ):
+        self.result_ttl = result_ttl
+        self.error_message = error_message
+        self.processes = processes
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(max_workers=workers) if processes else None
+        self._threads = [threading.Thread(target=self._worker, daemon=True, name=f"job-worker-{i}") for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn, *args, download_name: str, work_dir: str | None = None, files: tuple = ()) -> Job:
+        """
+        Queue fn(*args). work_dir (removed) and files (closed) belong to the job and are released
+        with it. Raises QueueFull when the queue is at capacity; they are not released then.
+        """
+        self.cleanup_expired()
+        job = Job(id=uuid.uuid4().hex, download_name=download_name, work_dir=work_dir, files=tuple(files))
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait((job, fn, args))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFull("Too many conversions in progress. Try again shortly.") from None
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self.cleanup_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cleanup_expired(self) -> None:
+        """Remove finished jobs older than result_ttl, with their files."""
+        now = time.time()
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j.finished is not None and now - j.finished > self.result_ttl]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            _release(job)
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, fn, args = item
+            job.status = RUNNING
+            _current.job = job
+            try:
+                if self._pool is not None:
+                    job.result = self._pool.submit(fn, *args).result()
+                else:
+                    job.result = fn(*args)
+                job.status = DONE
+            except Exception as e:
+                log.info("Job %s failed: %s", job.id, e)
+                job.error = self.error_message(e)
+                job.status = FAILED
+                _release(job)
+            finally:
+                _current.job = None
+                job.finished = time.time()
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {s: statuses.count(s) for s in (QUEUED, RUNNING, DONE, FAILED)} | {"queue_depth": self._queue.qsize()}
+
+    def shutdown(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for job in jobs:
+            _release(job)
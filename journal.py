@@ -0,0 +1,86 @@
+"""
+Batch journal for run.py tables/ask: one JSON line per finished PDF.
+
+Each line records the input, its size and mtime, the settings that shape the output, the
+output path, status ("done" or "failed"), duration and error. Lines are appended and flushed
+as each file finishes, so an interrupted batch leaves a journal of everything completed
+before the crash. With --resume, a PDF whose latest entry is "done" for the same file version
+and settings, and whose output still exists, is skipped.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL = ".pdf-excel-journal.jsonl"
+
+DONE, FAILED = "done", "failed"
+
+
+def settings_key(**settings) -> str:
+    """Stable text form of the options that affect a batch's output."""
+    return json.dumps(settings, sort_keys=True, default=str)
+
+
+class BatchJournal:
+    """Append-only JSONL journal; the latest entry per input wins."""
+
+    def __init__(self, path: str | Path = DEFAULT_JOURNAL, settings: str = ""):
+        self.path = Path(path)
+        self.settings = settings
+        self._latest: dict[str, dict] = {}
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for n, line in enumerate(f, 1):
+                    try:
+                        entry = json.loads(line)
+                        self._latest[entry["input"]] = entry
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        # A line cut short by a crash; everything before it is still good
+                        log.warning("Skipping unreadable journal line %d in %s", n, self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+
+    @staticmethod
+    def _key(pdf) -> str:
+        return str(Path(pdf).resolve())
+
+    def completed(self, pdf, output) -> bool:
+        """True if this version of pdf was already converted to output with the same settings."""
+        entry = self._latest.get(self._key(pdf))
+        if entry is None or entry.get("status") != DONE or entry.get("settings") != self.settings:
+            return False
+        try:
+            st = Path(pdf).stat()
+        except FileNotFoundError:
+            return False
+        if (entry.get("size"), entry.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+            return False
+        return entry.get("output") == str(output) and Path(output).exists()
+
+    def record(self, pdf, output, status: str, seconds: float, error: str | None = None) -> None:
+        try:
+            st = Path(pdf).stat()
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        except FileNotFoundError:
+            size = mtime_ns = None
+        entry = {
+            "input": self._key(pdf), "size": size, "mtime_ns": mtime_ns, "settings": self.settings,
+            "output": None if output is None else str(output), "status": status,
+            "seconds": round(seconds, 3), "error": error, "time": time.time(),
+        }
+        self._latest[entry["input"]] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,50 @@
+"""
+Peak memory (RSS) of the current process, for per-document reporting.
+
+On Linux the peak can be reset between documents via /proc/self/clear_refs, so each
+document reports its own peak. Elsewhere the process-lifetime peak from getrusage is used.
+The counter is per process, so only the main thread resets it: conversions running side by
+side in worker threads (the web job queue, bulk requests) would reset each other's peak, and
+report the process-wide peak instead.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_STATUS = Path("/proc/self/status")
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the peak RSS counter. Returns False if it was not reset (the platform does not
+    support it, or this is not the main thread), so the peak is process-wide.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return False
+    try:
+        _CLEAR_REFS.write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float | None:
+    """Peak RSS of this process in MB (since the last reset on Linux), or None if unknown."""
+    try:
+        for line in _STATUS.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KB on Linux/BSD
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
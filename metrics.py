@@ -0,0 +1,141 @@
+"""
+Per-stage timings and counters for the converters.
+
+Stages (open, split, prescreen, extract_tables, write_sheet, save, parse_csv) are timed with timer(stage);
+provider latency, upload size, tokens, pages, CSV parse fallbacks and cache hits are recorded
+with observe()/inc(). Everything goes to one process-wide registry, which app.py serves in
+Prometheus text format on /metrics. With enable_json_log() (run.py --metrics) each observation
+is also written to stderr as one JSON object per line.
+
+Observations made inside worker processes stay in those processes, so process-pool code
+reports its timings back to the parent, which records them.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger("pdf_excel.metrics")
+log.propagate = False
+log.setLevel(logging.WARNING)
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(1024 * 4**n for n in range(2, 10))  # 16 KB … 256 MB
+
+# name -> (type, help, buckets)
+METRICS = {
+    "pdf_excel_stage_seconds": ("histogram", "Time spent in each conversion stage.", TIME_BUCKETS),
+    "pdf_excel_provider_seconds": ("histogram", "AI provider request latency.", TIME_BUCKETS),
+    "pdf_excel_upload_bytes": ("histogram", "Size of the PDF sent to the AI provider.", BYTES_BUCKETS),
+    "pdf_excel_pages_total": ("counter", "PDF pages processed for table extraction.", None),
+    "pdf_excel_pages_skipped_total": ("counter", "Pages the pre-screen skipped as having no tables.", None),
+    "pdf_excel_tokens_total": ("counter", "Tokens reported by the AI provider, by kind.", None),
+    "pdf_excel_parse_fallbacks_total": ("counter", "Model responses parsed with a fallback, by kind.", None),
+    "pdf_excel_hedges_total": ("counter", "Ask AI requests also sent to another provider, by provider and reason (slow or error).", None),
+    "pdf_excel_cache_total": ("counter", "Cache lookups, by cache and result (hit or miss).", None),
+}
+
+_lock = threading.Lock()
+# name -> {labels tuple: value} for counters, {labels tuple: [bucket counts..., sum, count]} for histograms
+_values: dict[str, dict] = {name: {} for name in METRICS}
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _emit(name: str, value: float, labels: dict) -> None:
+    if log.isEnabledFor(logging.INFO):
+        log.info(json.dumps({"ts": round(time.time(), 3), "metric": name, "value": value, **labels}))
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one value in a histogram."""
+    buckets = METRICS[name][2]
+    key = _labels_key(labels)
+    with _lock:
+        series = _values[name].setdefault(key, [0] * (len(buckets) + 2))
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+    _emit(name, value, labels)
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Add to a counter."""
+    if not amount:
+        return
+    key = _labels_key(labels)
+    with _lock:
+        _values[name][key] = _values[name].get(key, 0) + amount
+    _emit(name, amount, labels)
+
+
+@contextmanager
+def timer(stage: str, **labels):
+    """Time the block as a stage of pdf_excel_stage_seconds."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("pdf_excel_stage_seconds", time.perf_counter() - t0, stage=stage, **labels)
+
+
+def value(name: str, **labels) -> float:
+    """Current counter value, or observation count for a histogram (mainly for tests)."""
+    with _lock:
+        v = _values[name].get(_labels_key(labels))
+    if v is None:
+        return 0
+    return v[-1] if isinstance(v, list) else v
+
+
+def reset() -> None:
+    with _lock:
+        for series in _values.values():
+            series.clear()
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _fmt_number(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        snapshot = {name: {k: list(v) if isinstance(v, list) else v for k, v in series.items()} for name, series in _values.items()}
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, v in sorted(snapshot[name].items()):
+            if kind == "counter":
+                lines.append(f"{name}{_fmt_labels(key)} {_fmt_number(v)}")
+                continue
+            for bound, count in zip(buckets, v):
+                lines.append(f"{name}_bucket{_fmt_labels(key, (('le', _fmt_number(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {v[-1]}")
+            lines.append(f"{name}_sum{_fmt_labels(key)} {_fmt_number(v[-2])}")
+            lines.append(f"{name}_count{_fmt_labels(key)} {v[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def enable_json_log(stream=None) -> None:
+    """Write every observation to stream (default stderr) as a JSON line."""
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
@@ -0,0 +1,80 @@
+"""
+Per-page table cache for incremental re-extraction of revised PDFs.
+
+A page's fingerprint covers its decoded content streams, its resources (fonts and XObjects,
+followed into form XObjects, so a page that only draws "/Fm0 Do" changes when the form does),
+page box and rotation, the pdfplumber table settings and the pdfplumber version. When a revised PDF comes back with
+only a few edited pages, every unchanged page hits the cache and skips extract_tables().
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pdfplumber
+from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
+
+from result_cache import DEFAULT_MAX_AGE, ResultCache
+
+DEFAULT_PAGE_CACHE_DIR = Path.home() / ".cache" / "pdf-excel" / "pages"
+DEFAULT_PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def page_fingerprint(page, table_settings: dict | None = None) -> str:
+    """Hash of what determines a page's extracted tables. Cheap next to extract_tables()."""
+    h = hashlib.sha256()
+    for stream in page.page_obj.contents:
+        h.update(resolve1(stream).get_data())
+    _hash_object(h, page.page_obj.resources, set())
+    h.update(repr((page.page_obj.mediabox, page.page_obj.cropbox, page.rotation)).encode())
+    h.update(json.dumps(table_settings or {}, sort_keys=True, default=str).encode())
+    h.update(pdfplumber.__version__.encode())
+    return h.hexdigest()
+
+
+def _hash_object(h, obj, seen: set) -> None:
+    """Feed a PDF object tree (dicts, arrays, stream data) to h; each indirect object once."""
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in seen:
+            h.update(b"<seen>")
+            return
+        seen.add(obj.objid)
+        obj = obj.resolve()
+    if isinstance(obj, PDFStream):
+        _hash_object(h, obj.attrs, seen)
+        h.update(obj.get_data())
+    elif isinstance(obj, dict):
+        h.update(b"<<")
+        for key in sorted(obj, key=str):
+            h.update(f"/{key} ".encode())
+            _hash_object(h, obj[key], seen)
+        h.update(b">>")
+    elif isinstance(obj, list):
+        h.update(b"[")
+        for item in obj:
+            _hash_object(h, item, seen)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode() + b" ")
+
+
+class PageTableCache(ResultCache):
+    """Extracted tables per page fingerprint, stored as JSON. Same LRU/age limits as ResultCache."""
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        max_bytes: int = DEFAULT_PAGE_CACHE_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        directory = directory or os.environ.get("PDF_EXCEL_PAGE_CACHE_DIR") or DEFAULT_PAGE_CACHE_DIR
+        super().__init__(directory, max_bytes=max_bytes, max_age=max_age, suffix=".json")
+
+    def get_tables(self, fingerprint: str) -> list | None:
+        content = self.get(fingerprint)
+        return None if content is None else json.loads(content)
+
+    def put_tables(self, fingerprint: str, tables: list) -> None:
+        # Called once per page; the caller runs evict() once per document
+        self.put(fingerprint, json.dumps(tables), evict=False)
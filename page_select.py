@@ -0,0 +1,139 @@
+"""
+Query-aware page pruning for "Ask AI": send the model only the pages likely to answer the query.
+
+Pages are scored against the query with BM25 over their text (table header rows count twice).
+The best pages, plus their neighbours, are copied into a smaller PDF up to a page budget.
+When the query does not single out a few pages (no term matches, or the chosen pages hold
+too little of the total score), the whole document is sent as before.
+"""
+
+import io
+import logging
+import math
+import re
+from collections import Counter
+
+import pdfplumber
+
+from ingest import PDFIUM_LOCK, source_file
+
+log = logging.getLogger(__name__)
+
+DEFAULT_NEIGHBORS = 1
+# Selected pages must hold at least this share of the document's total score, else send everything
+DEFAULT_MIN_COVERAGE = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at by for from in is it of on or the to with me all give show extract find table data".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def bm25_scores(docs: list[list[str]], query: list[str], k1: float = 1.5, b: float = 0.75) -> list[float]:
+    """BM25 score of each tokenized document for the query terms."""
+    n = len(docs)
+    if not n or not query:
+        return [0.0] * n
+    avg_len = sum(len(d) for d in docs) / n or 1.0
+    df = Counter(term for d in docs for term in set(d))
+    counts = [Counter(d) for d in docs]
+    scores = []
+    for doc, tf in zip(docs, counts):
+        score = 0.0
+        for term in set(query):
+            if not tf[term]:
+                continue
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def page_tokens(pdf_path) -> list[list[str]]:
+    """Tokens per page: page text, plus header rows of ruled tables (counted twice)."""
+    pages = []
+    with pdfplumber.open(source_file(pdf_path)) as pdf:
+        for page in pdf.pages:
+            tokens = tokenize(page.extract_text() or "")
+            # Only look for tables where there are ruling lines; a full text-based search is too slow here
+            if page.edges:
+                for table in page.find_tables():
+                    header = table.extract()[0] if table.rows else []
+                    tokens += tokenize(" ".join(c for c in header if c))
+            pages.append(tokens)
+            page.close()
+    return pages
+
+
+def select_pages(
+    scores: list[float],
+    page_budget: int,
+    neighbors: int = DEFAULT_NEIGHBORS,
+    min_coverage: float = DEFAULT_MIN_COVERAGE,
+) -> list[int] | None:
+    """
+    0-based page indices to send, best pages first with their neighbours, in page order.
+    Returns None when the whole document should be sent (fits the budget or low confidence).
+    """
+    total = sum(scores)
+    if len(scores) <= page_budget or total <= 0:
+        return None
+    chosen: set[int] = set()
+    for index in sorted(range(len(scores)), key=lambda i: (-scores[i], i)):
+        if scores[index] <= 0:
+            break
+        group = {i for i in range(index - neighbors, index + neighbors + 1) if 0 <= i < len(scores)}
+        if len(chosen | group) > page_budget:
+            if not chosen:
+                chosen = {index}
+            break
+        chosen |= group
+    if sum(scores[i] for i in chosen) / total < min_coverage:
+        return None
+    return sorted(chosen)
+
+
+def subset_pdf(pdf_path, pages: list[int]) -> bytes:
+    """A new PDF containing only the given 0-based pages, in order."""
+    import pypdfium2
+
+    with PDFIUM_LOCK:
+        src = pypdfium2.PdfDocument(source_file(pdf_path))
+        dst = pypdfium2.PdfDocument.new()
+        try:
+            dst.import_pages(src, pages)
+            buf = io.BytesIO()
+            dst.save(buf)
+            return buf.getvalue()
+        finally:
+            dst.close()
+            src.close()
+
+
+def _format_pages(pages: list[int]) -> str:
+    """[0, 1, 2, 6] -> '1-3, 7' (1-based)."""
+    parts, start = [], None
+    for i, p in enumerate(pages):
+        if start is None:
+            start = p
+        if i + 1 == len(pages) or pages[i + 1] != p + 1:
+            parts.append(f"{start + 1}-{p + 1}" if p > start else f"{p + 1}")
+            start = None
+    return ", ".join(parts)
+
+
+def prune_pdf(pdf_path, query: str, page_budget: int, neighbors: int = DEFAULT_NEIGHBORS) -> bytes | None:
+    """
+    Reduced PDF with the pages most relevant to the query, or None to send the whole document.
+    """
+    tokens = page_tokens(pdf_path)
+    pages = select_pages(bm25_scores(tokens, tokenize(query)), page_budget, neighbors)
+    if pages is None:
+        log.info("Page pruning: sending all %d pages", len(tokens))
+        return None
+    log.info("Page pruning: sending pages %s of %d", _format_pages(pages), len(tokens))
+    return subset_pdf(pdf_path, pages)
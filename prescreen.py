@@ -0,0 +1,158 @@
+"""
+Page selection and cheap pre-screening for table extraction.
+
+pdfplumber parses each page's layout before extract_tables() searches it, and that parse is
+most of the per-page cost. prescreen_pages() looks at every page through pdfium instead (path
+objects and text runs, about 2 ms a page) and drops pages where the table search cannot find
+anything: with the "lines" strategies a table needs at least two horizontal and two vertical
+ruling edges; with the "text" strategy it needs rows of text split into separate cells.
+Prose, cover and image-only pages fail both and are never parsed by pdfplumber.
+
+TABLE_PROFILES are named pdfplumber table_settings; parse_pages() reads "5-40,72" page specs.
+"""
+
+import json
+import logging
+
+from ingest import PDFIUM_LOCK, source_file
+
+log = logging.getLogger(__name__)
+
+# Named pdfplumber table_settings (None = pdfplumber's defaults, ruling lines on both axes)
+TABLE_PROFILES = {
+    "lines": None,
+    "lines-strict": {"vertical_strategy": "lines_strict", "horizontal_strategy": "lines_strict"},
+    "text": {"vertical_strategy": "text", "horizontal_strategy": "text"},
+    "mixed": {"vertical_strategy": "text", "horizontal_strategy": "lines"},
+}
+
+# Path objects thinner than this (pt) are ruling lines; anything larger also counts as a rect
+LINE_MAX_WIDTH = 2.0
+# Gap (pt) between text runs on one line that makes them separate cells
+CELL_GAP = 3.0
+
+
+def table_settings_for(profile: str = "lines", overrides: dict | str | None = None) -> dict | None:
+    """table_settings for a named profile, with overrides (dict or JSON object) on top."""
+    if profile not in TABLE_PROFILES:
+        raise ValueError(f"Unknown table profile: {profile} (choose from {', '.join(TABLE_PROFILES)})")
+    settings = TABLE_PROFILES[profile]
+    if isinstance(overrides, str):
+        try:
+            overrides = json.loads(overrides)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Table settings must be a JSON object: {e}") from None
+        if not isinstance(overrides, dict):
+            raise ValueError("Table settings must be a JSON object")
+    if overrides:
+        settings = {**(settings or {}), **overrides}
+    return dict(settings) if settings else None
+
+
+def parse_pages(spec: str) -> list[tuple[int, int | None]]:
+    """ "5-40,72,90-" -> [(5, 40), (72, 72), (90, None)] (1-based, inclusive; None = last page)."""
+    ranges = []
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        try:
+            first = int(start)
+            last = (int(end) if end else None) if sep else first
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part!r} (use e.g. 5-40,72)") from None
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range: {part!r}")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError("No pages given")
+    return ranges
+
+
+def page_indices(ranges: list[tuple[int, int | None]] | None, total_pages: int) -> list[int]:
+    """0-based page indices for parsed ranges, in page order without repeats (all pages if None)."""
+    if ranges is None:
+        return list(range(total_pages))
+    chosen = set()
+    for first, last in ranges:
+        if first > total_pages:
+            raise ValueError(f"Page {first} is out of range (PDF has {total_pages} pages)")
+        chosen.update(range(first - 1, min(last or total_pages, total_pages)))
+    return sorted(chosen)
+
+
+def _edge_counts(page) -> tuple[int, int]:
+    """(horizontal, vertical) ruling edges from the page's path objects; rects count for both."""
+    import pypdfium2.raw as pdfium_c
+
+    horizontal = vertical = 0
+    for obj in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH]):
+        left, bottom, right, top = obj.get_bounds()
+        width, height = right - left, top - bottom
+        if height <= LINE_MAX_WIDTH and width > LINE_MAX_WIDTH:
+            horizontal += 1
+        elif width <= LINE_MAX_WIDTH and height > LINE_MAX_WIDTH:
+            vertical += 1
+        elif width > LINE_MAX_WIDTH:
+            # A rect, or one path drawing a whole grid: could hold edges on both axes
+            horizontal += 2
+            vertical += 2
+    return horizontal, vertical
+
+
+def _text_layout(page) -> tuple[int, int]:
+    """(text runs, lines with two or more runs separated by a cell-sized gap)."""
+    textpage = page.get_textpage()
+    try:
+        runs = [textpage.get_rect(i) for i in range(textpage.count_rects())]
+    finally:
+        textpage.close()
+    lines: dict[int, list[tuple[float, float]]] = {}
+    for left, bottom, right, top in runs:
+        lines.setdefault(round((bottom + top) / 2 / 2), []).append((left, right))
+    cell_rows = 0
+    for spans in lines.values():
+        spans.sort()
+        if any(nxt[0] - cur[1] >= CELL_GAP for cur, nxt in zip(spans, spans[1:])):
+            cell_rows += 1
+    return len(runs), cell_rows
+
+
+def may_have_tables(page, table_settings: dict | None = None) -> bool:
+    """False if extract_tables() with these settings cannot find a table on this pdfium page."""
+    from pdfplumber.table import TableSettings
+
+    # Merged with pdfplumber's defaults, so overrides such as min_words_vertical count
+    settings = TableSettings.resolve(table_settings)
+    vertical, horizontal = settings.vertical_strategy, settings.horizontal_strategy
+    # pdfplumber adds explicit lines under every strategy, and they may be all a table needs
+    if "explicit" in (vertical, horizontal) or settings.explicit_vertical_lines or settings.explicit_horizontal_lines:
+        return True
+    h_edges = v_edges = runs = cell_rows = None
+    if vertical.startswith("lines") or horizontal.startswith("lines"):
+        h_edges, v_edges = _edge_counts(page)
+    if "text" in (vertical, horizontal):
+        runs, cell_rows = _text_layout(page)
+    v_ok = v_edges >= 2 if vertical.startswith("lines") else cell_rows >= settings.min_words_vertical
+    h_ok = h_edges >= 2 if horizontal.startswith("lines") else runs >= max(settings.min_words_horizontal, 1)
+    return v_ok and h_ok
+
+
+def prescreen_pages(pdf_path, pages: list[int], table_settings: dict | None = None) -> list[int]:
+    """The pages (0-based indices) that may have tables under table_settings."""
+    import pypdfium2
+
+    with PDFIUM_LOCK:
+        pdf = pypdfium2.PdfDocument(source_file(pdf_path))
+        try:
+            keep = []
+            for index in pages:
+                page = pdf[index]
+                try:
+                    if may_have_tables(page, table_settings):
+                        keep.append(index)
+                finally:
+                    page.close()
+            return keep
+        finally:
+            pdf.close()
@@ -0,0 +1,30 @@
+"""
+Lazily loaded conversion backends.
+
+run.py and app.py look converters up here by name instead of importing them at startup, so
+each command loads only what it uses: `tables` never imports an AI SDK, and `--version`
+imports no backend at all. Every converter takes (pdf_path, ..., output_path, ...) and
+returns the path of the written file.
+"""
+
+import importlib
+
+# name -> (module, converter function)
+BACKENDS = {
+    "tables": ("tables_to_excel", "pdf_tables_to_excel"),
+    "anthropic": ("extract", "extract_pdf_to_excel"),
+    "gemini": ("extract_gemini", "extract_pdf_to_excel"),
+    # Both providers, hedged and with failover (see router.py)
+    "auto": ("router", "extract_pdf_to_excel"),
+}
+
+AI_PROVIDERS = ("anthropic", "gemini", "auto")
+
+
+def get_converter(name: str):
+    """Import the backend's module on first use and return its converter function."""
+    try:
+        module, attr = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown backend: {name} (choose from {', '.join(BACKENDS)})") from None
+    return getattr(importlib.import_module(module), attr)
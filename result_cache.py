@@ -0,0 +1,145 @@
+"""
+On-disk cache for "Ask AI" results, shared by the CLI (run.py ask) and the web app.
+
+Entries are keyed by the PDF's content hash, the normalized query, the provider, the model
+and the prompt version, and hold the parsed CSV. A hit skips the provider call entirely.
+Least-recently-used entries are evicted once the cache exceeds its size limit, and entries
+older than the age limit are dropped.
+
+Each entry is one <key>.csv file (suffix configurable): mtime = when it was stored (age limit), atime = last use (LRU).
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from ingest import source_sha256
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "pdf-excel" / "ask"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600  # seconds
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, so trivial variants share an entry."""
+    return " ".join(query.lower().split())
+
+
+class ResultCache:
+    """Content-addressed CSV cache in a directory. Safe to share between threads and processes."""
+
+    def __init__(
+        self,
+        directory: str | Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+        suffix: str = ".csv",
+    ):
+        self.directory = Path(directory)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(pdf_path, query: str, provider: str, model: str, prompt_version: str, variant: str = "") -> str:
+        """pdf_path may be a path or the PDF's bytes. variant covers any other option that changes what is sent (e.g. page pruning)."""
+        parts = [source_sha256(pdf_path), normalize_query(query), provider, model, prompt_version, variant]
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        content = None
+        try:
+            st = path.stat()
+            if time.time() - st.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                content = path.read_text(encoding="utf-8")
+                # Record the use for LRU; keep mtime (store time) for the age limit
+                os.utime(path, (time.time(), st.st_mtime))
+        except OSError:
+            content = None
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return content
+
+    def put(self, key: str, csv_content: str, evict: bool = True) -> None:
+        """Store an entry. Pass evict=False when storing many entries and call evict() once after."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(csv_content)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if now - st.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((st.st_atime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self) -> dict:
+        sizes = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                sizes.append(path.stat().st_size)
+            except OSError:
+                continue
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses, "entries": len(sizes), "bytes": sum(sizes)}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> ResultCache:
+    """
+    Process-wide cache used by run.py and app.py. Configure with PDF_EXCEL_CACHE_DIR,
+    PDF_EXCEL_CACHE_MAX_MB and PDF_EXCEL_CACHE_MAX_AGE_HOURS.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(
+                os.environ.get("PDF_EXCEL_CACHE_DIR") or DEFAULT_CACHE_DIR,
+                max_bytes=int(float(os.environ.get("PDF_EXCEL_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+                max_age=float(os.environ.get("PDF_EXCEL_CACHE_MAX_AGE_HOURS", DEFAULT_MAX_AGE / 3600)) * 3600,
+            )
+        return _default_cache
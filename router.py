@@ -0,0 +1,315 @@
+"""
+Ask AI across both providers: hedged requests and failover between Gemini and Anthropic.
+
+ProviderRouter keeps a rolling window of latencies and errors per (provider, model). A request
+goes to the preferred provider first; if no answer has arrived by that provider's p95 latency
+(a fixed delay until enough samples exist), the same request is sent to the other provider
+and the first valid CSV wins. The loser is cancelled: it stops reading and closes its
+connection. Only streamed requests (a single query, not chunked) are hedged, because a
+non-streamed call can't be stopped and the loser would run, and bill, to the end; the others
+only fail over. An error (429/503/529 overload, a failure, or a response without a usable
+CSV) fails over to the other provider at once, and an overloaded provider is tried second for
+a cool-down period.
+
+extract_pdf_to_excel() is the "auto" converter (providers.py): with both GEMINI_API_KEY and
+ANTHROPIC_API_KEY set it races them through default_router(); with one key it is that provider.
+"""
+
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+from batch import error_status, retry_after_seconds
+from chunking import DEFAULT_CHUNK_WORKERS, ask_in_chunks
+from ingest import load_source
+from result_cache import ResultCache
+
+log = logging.getLogger(__name__)
+
+# First choice when neither provider has a problem (Gemini has the free tier)
+PROVIDER_ORDER = ("gemini", "anthropic")
+KEY_ENV = {"gemini": "GEMINI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+
+OVERLOAD_STATUS = {429, 503, 529}
+
+
+class ProviderStats:
+    """Rolling latencies (successful requests) and outcomes for one provider and model."""
+
+    def __init__(self, window: int = 100):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.cooldown_until = 0.0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class ProviderRouter:
+    """
+    Races calls to several providers. hedge_quantile of a provider's recent latencies (once it
+    has min_samples) is how long to wait before hedging; default_delay until then. Set hedge to
+    False to only fail over on errors.
+    """
+
+    def __init__(
+        self,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        default_delay: float = 20.0,
+        min_delay: float = 1.0,
+        min_samples: int = 5,
+        window: int = 100,
+        cooldown: float = 30.0,
+    ):
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.cooldown = cooldown
+        self._stats: dict[tuple[str, str], ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, provider: str, model: str) -> ProviderStats:
+        with self._lock:
+            return self._stats.setdefault((provider, model), ProviderStats(self.window))
+
+    def rank(self, keys: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """Keys in the order to try: cooling-down and mostly-failing providers go last."""
+        now = time.monotonic()
+
+        def score(item):
+            index, key = item
+            stats = self.stats(*key)
+            failing = len(stats.outcomes) >= self.min_samples and stats.error_rate >= 0.5
+            return (stats.cooldown_until > now, failing, index)
+
+        return [key for _, key in sorted(enumerate(keys), key=score)]
+
+    def hedge_delay(self, provider: str, model: str) -> float:
+        stats = self.stats(provider, model)
+        if len(stats.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, stats.quantile(self.hedge_quantile))
+
+    def _failed(self, key: tuple[str, str], seconds: float, error: BaseException) -> None:
+        stats = self.stats(*key)
+        stats.record(seconds, ok=False)
+        if error_status(error) in OVERLOAD_STATUS:
+            pause = retry_after_seconds(error)
+            stats.cooldown_until = time.monotonic() + max(self.cooldown, pause or 0.0)
+
+    def race(self, calls: dict, hedge: bool | None = None) -> tuple[tuple[str, str], object]:
+        """
+        calls maps (provider, model) -> fn(cancel) returning an answer; fn should stop early once
+        the threading.Event cancel is set. Returns (key, answer) of the first call to succeed;
+        raises the first error if all fail. hedge=False fails over on errors only (for calls
+        that can't be cancelled); default self.hedge.
+        """
+        hedge = self.hedge if hedge is None else hedge
+        order = self.rank(list(calls))
+        cancels = {key: threading.Event() for key in order}
+        pool = ThreadPoolExecutor(len(order), thread_name_prefix="router")
+        running: dict = {}
+        errors: list[BaseException] = []
+        launched = 0
+        deadline = math.inf
+
+        def launch(reason: str | None = None) -> None:
+            nonlocal deadline, launched
+            key = order[launched]
+            launched += 1
+            if reason is not None:
+                log.info("%s: asking %s as well", reason, key[0])
+                metrics.inc("pdf_excel_hedges_total", provider=key[0], reason=reason)
+            # In the caller's context, so the call's requests count against a batch's rate limit
+            running[pool.submit(contextvars.copy_context().run, calls[key], cancels[key])] = (key, time.monotonic())
+            deadline = time.monotonic() + self.hedge_delay(*key) if hedge else math.inf
+
+        try:
+            launch()
+            while running:
+                more = launched < len(order)
+                timeout = max(0.0, deadline - time.monotonic()) if more and deadline < math.inf else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    launch("slow")
+                    continue
+                for future in done:
+                    key, started = running.pop(future)
+                    seconds = time.monotonic() - started
+                    try:
+                        answer = future.result()
+                    except Exception as e:
+                        log.warning("%s failed after %.1f s: %s", key[0], seconds, e)
+                        self._failed(key, seconds, e)
+                        errors.append(e)
+                        if launched < len(order):
+                            launch("error")
+                        continue
+                    self.stats(*key).record(seconds, ok=True)
+                    return key, answer
+            raise errors[0]
+        finally:
+            for event in cancels.values():
+                event.set()
+            pool.shutdown(wait=False)
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+
+def default_router() -> ProviderRouter:
+    """
+    Process-wide router used by the "auto" converter. Configure with PDF_EXCEL_HEDGE=0 (fail over
+    only), PDF_EXCEL_HEDGE_DELAY (seconds before the first hedge while there are too few samples,
+    20) and PDF_EXCEL_HEDGE_QUANTILE (0.95).
+    """
+    global _default_router
+    with _default_lock:
+        if _default_router is None:
+            _default_router = ProviderRouter(
+                hedge=os.environ.get("PDF_EXCEL_HEDGE", "1") != "0",
+                default_delay=float(os.environ.get("PDF_EXCEL_HEDGE_DELAY", 20.0)),
+                hedge_quantile=float(os.environ.get("PDF_EXCEL_HEDGE_QUANTILE", 0.95)),
+            )
+        return _default_router
+
+
+def _provider_module(provider: str):
+    import importlib
+
+    return importlib.import_module({"anthropic": "extract", "gemini": "extract_gemini"}[provider])
+
+
+def _default_model(provider: str) -> str:
+    if provider == "anthropic":
+        from extract import DEFAULT_MODEL
+
+        return DEFAULT_MODEL
+    return os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+
+
+def _ask(provider, api_key, model, pdf_path, queries, page_budget, sessions, chunk_pages, chunk_workers, on_rows, cancel) -> list[str]:
+    """One provider's answers (CSV per query). A single query is streamed so cancel can end it early."""
+    from extract import extract_csv_from_response, read_csv_stream, rows_to_csv
+
+    module = _provider_module(provider)
+    if chunk_pages:
+        ask = lambda chunk, qs: module.extract_csvs(chunk, qs, api_key, model, None, sessions)  # noqa: E731
+        return ask_in_chunks(pdf_path, queries, ask, chunk_pages, module.MAX_PDF_BYTES, chunk_workers)
+    if len(queries) > 1:
+        return module.extract_csvs(pdf_path, queries, api_key, model, page_budget, sessions)
+    chunks = module.stream_text(pdf_path, queries, api_key, model, page_budget, sessions)
+    rows, parser = read_csv_stream(chunks, on_rows, cancel)
+    if cancel.is_set():
+        raise RuntimeError(f"{provider} request cancelled")
+    if rows:
+        return [rows_to_csv(rows)]
+    if parser.in_block:
+        raise ValueError("CSV has no rows")
+    return [extract_csv_from_response(parser.text)]
+
+
+def extract_pdf_to_excel(
+    pdf_path: str,
+    user_query: str | list[str],
+    output_path: str,
+    api_key: str | None = None,
+    model: str | None = None,
+    cache: ResultCache | None = None,
+    page_budget: int | None = None,
+    sessions=None,
+    fmt: str = "xlsx",
+    stream: bool = False,
+    on_rows=None,
+    infer_types: bool = True,
+    chunk_pages: int | None = None,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+    router: ProviderRouter | None = None,
+) -> str:
+    """
+    Like extract.extract_pdf_to_excel, answered by whichever configured provider is faster.
+    Each provider uses its own key and default model (see module docstring), so api_key and
+    model can't be given. Single queries are always streamed; on_rows(n) reports the row count of
+    the provider furthest ahead. Returns the path to the saved file.
+    """
+    from extract import PROMPT_VERSION, answers_to_excel, answers_with_cache, cache_variant
+
+    if api_key or model:
+        raise ValueError("The auto provider uses each provider's own key and default model; choose a provider to set them")
+    keys = {p: os.environ.get(KEY_ENV[p]) for p in PROVIDER_ORDER if os.environ.get(KEY_ENV[p])}
+    if not keys:
+        raise ValueError("Set GEMINI_API_KEY (free) or ANTHROPIC_API_KEY in .env")
+    if len(keys) == 1:
+        [provider] = keys
+        return _provider_module(provider).extract_pdf_to_excel(
+            pdf_path, user_query, output_path, cache=cache, page_budget=page_budget, sessions=sessions, fmt=fmt,
+            stream=stream, on_rows=on_rows, infer_types=infer_types, chunk_pages=chunk_pages, chunk_workers=chunk_workers,
+        )
+    if chunk_pages and page_budget:
+        raise ValueError("Page budget and chunking can't be combined")
+    pdf_path = load_source(pdf_path)  # both racers read the same bytes
+    queries = [user_query] if isinstance(user_query, str) else list(user_query)
+    if not queries:
+        raise ValueError("No query given")
+    router = router or default_router()
+    models = {p: _default_model(p) for p in keys}
+
+    most_rows = 0
+    rows_lock = threading.Lock()
+
+    def report_rows(n: int) -> None:
+        nonlocal most_rows
+        with rows_lock:
+            if n > most_rows:
+                most_rows = n
+                on_rows(n)
+
+    def compute(qs: list[str]) -> list[str]:
+        calls = {
+            (p, models[p]): (
+                lambda cancel, p=p: _ask(
+                    p, keys[p], models[p], pdf_path, qs, page_budget, sessions, chunk_pages, chunk_workers,
+                    report_rows if on_rows is not None else None, cancel,
+                )
+            )
+            for p in keys
+        }
+        # Several queries or chunks are not streamed, so can't be cancelled: no hedging then
+        (provider, _), answers = router.race(calls, hedge=len(qs) == 1 and not chunk_pages)
+        log.info("Answered by %s", provider)
+        return answers
+
+    answers = answers_with_cache(
+        queries,
+        cache,
+        key_for=lambda q: cache.key(
+            pdf_path, q, "auto", "+".join(models.values()), PROMPT_VERSION, variant=cache_variant(page_budget, chunk_pages)
+        ),
+        compute=compute,
+    )
+    answers_to_excel(queries, answers, output_path, fmt, infer_types)
+    log.info("Done.")
+    return output_path
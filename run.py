@@ -4,20 +4,25 @@ Single entry point for PDF → Excel.
 
   python run.py tables <pdf> [pdf2 ...]   Extract all tables (no AI). Batch: multiple PDFs → multiple Excel files.
   python run.py ask <pdf> <query>         AI agent: extract what you ask for. Optional: multiple PDFs with same query.
+  python run.py ask <pdf> -q <q1> -q <q2>  Several queries in one request → one sheet per query.
+  python run.py watch <dir>               Convert PDFs as they are added to or changed in a folder.
+  --format csv|ndjson|parquet              One file per table (directory or .zip, with manifest.json) instead of .xlsx.
 """
 
 import argparse
 import sys
+import time
 from pathlib import Path
 
 def _get_version():
     p = Path(__file__).resolve().parent / "VERSION"
     return p.read_text().strip() if p.exists() else "0.0.0"
 
-# Project modules
-from tables_to_excel import pdf_tables_to_excel
-from extract import extract_pdf_to_excel
-import anthropic
+# Project modules. Backends (pdfplumber, the AI SDKs) are imported by the command that needs them.
+import metrics
+from prescreen import TABLE_PROFILES, parse_pages, table_settings_for
+from providers import AI_PROVIDERS, get_converter
+from writers import FORMATS, default_output
 
 
 def _expand_pdfs(paths):
@@ -38,8 +43,21 @@ def _expand_pdfs(paths):
     return out
 
 
+def _pages_arg(spec: str) -> str:
+    try:
+        parse_pages(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    return spec
+
+
 def cmd_tables(args) -> int:
     overwrite = not args.no_overwrite
+    try:
+        table_settings = table_settings_for(args.profile, args.table_settings)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
     pdfs = _expand_pdfs(args.pdfs)
     if not pdfs:
         print("Error: No PDF files found.", file=sys.stderr)
@@ -47,78 +65,296 @@ def cmd_tables(args) -> int:
     if args.output and len(pdfs) > 1:
         print("Error: -o/--output only allowed for a single PDF.", file=sys.stderr)
         return 1
-    for i, pdf in enumerate(pdfs):
-        out = args.output if len(pdfs) == 1 and args.output else None
-        if len(pdfs) > 1:
-            print(f"[{i+1}/{len(pdfs)}] {pdf}")
-        try:
-            result = pdf_tables_to_excel(str(pdf), out, overwrite=overwrite)
-            print(f"Saved: {result}")
-        except Exception as e:
-            print(f"Error: {e}", file=sys.stderr)
-            return 1
-    return 0
+    pdf_tables_to_excel = get_converter("tables")
+    if args.incremental:
+        from page_cache import PageTableCache
+
+        page_cache = PageTableCache()
+    else:
+        page_cache = None
+    journal = _open_journal(
+        args, pdfs, command="tables", format=args.format, infer_types=args.infer_types,
+        table_settings=table_settings, pages=args.pages, max_tables=args.max_tables, prescreen=args.prescreen,
+    )
+    succeeded, failed, skipped = 0, [], 0
+    try:
+        for i, pdf in enumerate(pdfs):
+            out = args.output if len(pdfs) == 1 and args.output else str(default_output(pdf, args.format))
+            prefix = f"[{i+1}/{len(pdfs)}] {pdf}: " if len(pdfs) > 1 else ""
+            if args.resume and journal.completed(pdf, out):
+                print(f"{prefix}Already done: {out}")
+                skipped += 1
+                continue
+            start = time.monotonic()
+            try:
+                result = pdf_tables_to_excel(
+                    str(pdf), out, overwrite=overwrite, workers=args.jobs, low_memory=args.low_memory, page_cache=page_cache,
+                    fmt=args.format, infer_types=args.infer_types, table_settings=table_settings,
+                    pages=args.pages, max_tables=args.max_tables, prescreen=args.prescreen,
+                )
+            except Exception as e:
+                print(f"{prefix}Error: {e}", file=sys.stderr)
+                failed.append(pdf)
+                if journal is not None:
+                    journal.record(pdf, out, "failed", time.monotonic() - start, str(e))
+                if not args.continue_on_error:
+                    break
+                continue
+            print(f"{prefix}Saved: {result}")
+            succeeded += 1
+            if journal is not None:
+                journal.record(pdf, result, "done", time.monotonic() - start)
+    finally:
+        if journal is not None:
+            journal.close()
+    _batch_summary(len(pdfs), succeeded, failed, skipped, journal)
+    return 1 if failed else 0
+
+
+def _open_journal(args, pdfs, **settings):
+    """The batch journal for this run: always for several PDFs, or when --resume/--journal is given."""
+    if len(pdfs) < 2 and not (args.resume or args.journal):
+        return None
+    from journal import DEFAULT_JOURNAL, BatchJournal, settings_key
+
+    return BatchJournal(args.journal or DEFAULT_JOURNAL, settings_key(**settings))
+
+
+def _batch_summary(total: int, succeeded: int, failed: list, skipped: int, journal) -> None:
+    if total < 2:
+        return
+    not_run = total - succeeded - len(failed) - skipped
+    parts = [f"{succeeded} succeeded", f"{len(failed)} failed"]
+    if skipped:
+        parts.append(f"{skipped} already done")
+    if not_run:
+        parts.append(f"{not_run} not run")
+    print(f"Done: {', '.join(parts)}.")
+    for pdf in failed:
+        print(f"  failed: {pdf}")
+    if journal is not None and (failed or not_run):
+        print(f"Journal: {journal.path} (re-run with --resume to do only the remaining files)")
+
+
+def cmd_watch(args) -> int:
+    import logging
+
+    from watch import HotFolder
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%H:%M:%S")
+    options = {
+        "fmt": args.format, "infer_types": args.infer_types, "prescreen": args.prescreen,
+        "table_settings": table_settings_for(args.profile, args.table_settings),
+    }
+    folder = HotFolder(
+        args.directory, options, output_dir=args.output_dir, manifest=args.manifest, workers=args.workers,
+        settle=args.settle, interval=args.interval, recursive=args.recursive, poll=args.poll,
+    )
+    counts = folder.run(once=args.once)
+    print(f"Converted {counts['converted']}, failed {counts['failed']}, unchanged {counts['unchanged']}")
+    return 1 if counts["failed"] else 0
+
+
+def _ask_error_message(e: Exception) -> str:
+    """Short user-facing message for a failed Ask AI call (either provider)."""
+    from batch import error_status
+
+    msg = str(e).lower()
+    anthropic = sys.modules.get("anthropic")  # only loaded if the Anthropic provider was used
+    if (anthropic is not None and isinstance(e, anthropic.APIError)) or error_status(e) is not None:
+        if "401" in msg or "auth" in msg or "api key" in msg:
+            return "Invalid or missing API key. Set ANTHROPIC_API_KEY or GEMINI_API_KEY in .env."
+        if "429" in msg or "rate" in msg:
+            return "API rate limit exceeded. Try again later."
+        return f"API request failed. {e}"
+    return str(e)
+
+
+def _ask_inputs(args) -> tuple[list[str], list[str]]:
+    """
+    Split `ask` arguments into PDF paths and queries. Queries come from -q/--query and
+    --query-file; without those, the last positional argument is the query (classic form).
+    """
+    queries = list(args.queries)
+    if args.query_file:
+        for line in Path(args.query_file).read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                queries.append(line)
+    if queries:
+        return args.inputs, queries
+    if len(args.inputs) < 2:
+        raise ValueError("Give a query after the PDF(s), or use -q/--query or --query-file.")
+    return args.inputs[:-1], [args.inputs[-1]]
 
 
 def cmd_ask(args) -> int:
-    pdfs = _expand_pdfs(args.pdf)
+    pdf_args, queries = _ask_inputs(args)
+    query = queries[0] if len(queries) == 1 else queries
+    pdfs = _expand_pdfs(pdf_args)
     if not pdfs:
         print("Error: No PDF files found.", file=sys.stderr)
         return 1
     if args.output and len(pdfs) > 1:
         print("Error: -o/--output only allowed for a single PDF.", file=sys.stderr)
         return 1
-    for i, pdf in enumerate(pdfs):
-        out = args.output
-        if not out and len(pdfs) == 1:
-            out = str(Path(pdf).with_suffix(".xlsx"))
-        elif not out:
-            out = str(Path(pdf).with_suffix(".xlsx"))
-        if len(pdfs) > 1:
-            print(f"[{i+1}/{len(pdfs)}] {pdf}")
-        try:
-            result = extract_pdf_to_excel(str(pdf), args.query, out, model=args.model)
-            print(f"Saved: {result}")
-        except anthropic.APIError as e:
-            msg = str(e).lower()
-            if "401" in msg or "auth" in msg:
-                print("Error: Invalid or missing API key. Set ANTHROPIC_API_KEY in .env.", file=sys.stderr)
-            elif "429" in msg or "rate" in msg:
-                print("Error: API rate limit exceeded. Try again later.", file=sys.stderr)
+    if args.model and args.provider == "auto":
+        print("Error: --model needs --provider anthropic or gemini (auto uses each provider's default).", file=sys.stderr)
+        return 1
+    import asyncio
+
+    from batch import RateLimiter, run_batch
+    from clients import close_clients
+    from doc_sessions import default_sessions
+    from result_cache import default_cache
+
+    extract_fn = get_converter(args.provider)
+    cache = None if args.no_cache else default_cache()
+    sessions = default_sessions() if args.reuse_upload else None
+    jobs = [(pdf, args.output or str(default_output(pdf, args.format))) for pdf in pdfs]
+    journal = _open_journal(
+        args, pdfs, command="ask", queries=queries, provider=args.provider, model=args.model, format=args.format,
+        infer_types=args.infer_types, page_budget=args.page_budget, chunk_pages=args.chunk_pages,
+    )
+    skipped = 0
+    if args.resume:
+        remaining = []
+        for pdf, out in jobs:
+            if journal.completed(pdf, out):
+                print(f"{pdf}: Already done: {out}")
+            else:
+                remaining.append((pdf, out))
+        skipped, jobs = len(jobs) - len(remaining), remaining
+
+    def work(job):
+        pdf, out = job
+        return extract_fn(str(pdf), query, out, model=args.model, cache=cache,
+                          page_budget=args.page_budget, sessions=sessions, fmt=args.format, stream=args.stream,
+                          infer_types=args.infer_types, chunk_pages=args.chunk_pages, chunk_workers=args.chunk_workers)
+
+    done = 0
+
+    def report(result):
+        nonlocal done
+        done += 1
+        prefix = f"[{done}/{len(jobs)}] {result.item[0]}: " if len(jobs) > 1 else ""
+        if result.ok:
+            print(f"{prefix}Saved: {result.value}")
+        else:
+            print(f"{prefix}Error: {_ask_error_message(result.error)}", file=sys.stderr)
+        if journal is not None:
+            if result.ok:
+                journal.record(result.item[0], result.value, "done", result.duration)
             else:
-                print(f"Error: API request failed. {e}", file=sys.stderr)
-            return 1
-        except Exception as e:
-            print(f"Error: {e}", file=sys.stderr)
-            return 1
-    return 0
+                journal.record(result.item[0], result.item[1], "failed", result.duration, _ask_error_message(result.error))
+
+    try:
+        results = asyncio.run(
+            run_batch(
+                jobs,
+                work,
+                concurrency=args.concurrency,
+                limiter=RateLimiter(rpm=args.rpm, tpm=args.tpm),
+                per_request=True,  # chunks and re-asked queries are requests of their own
+                max_retries=args.retries,
+                on_result=report,
+            )
+        )
+    finally:
+        if journal is not None:
+            journal.close()
+        close_clients()
+    failed = [r.item[0] for r in results if not r.ok]
+    _batch_summary(len(pdfs), len(results) - len(failed), failed, skipped, journal)
+    if cache is not None and len(pdfs) > 1:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hit(s), {stats['misses']} miss(es)")
+    return 1 if failed else 0
+
+
+def _add_journal_args(p) -> None:
+    p.add_argument("--resume", action="store_true", help="Skip PDFs the journal records as done with the same settings (output still present)")
+    p.add_argument("--journal", default=None, help="Batch journal file, one JSON line per PDF (default: ./.pdf-excel-journal.jsonl; written for 2+ PDFs)")
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(
         description="PDF → Excel: extract tables (offline) or ask the AI agent for specific data.",
-        epilog="Examples:\n  %(prog)s tables report.pdf\n  %(prog)s tables a.pdf b.pdf\n  %(prog)s ask report.pdf \"taxes for January 2026\"",
+        epilog="Examples:\n  %(prog)s tables report.pdf\n  %(prog)s tables a.pdf b.pdf\n  %(prog)s ask report.pdf \"taxes for January 2026\"\n  %(prog)s ask report.pdf -q taxes -q payroll -q revenue",
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
     parser.add_argument("--version", action="version", version=_get_version())
+    parser.add_argument("--metrics", action="store_true", help="Write per-stage timings and counters to stderr as JSON lines")
     sub = parser.add_subparsers(dest="cmd", required=True, help="Command")
 
     # tables: one or more PDFs
     p_tables = sub.add_parser("tables", help="Extract all tables from PDF(s) to Excel (no AI)")
     p_tables.add_argument("pdfs", nargs="+", help="PDF file(s) or directory containing PDFs")
-    p_tables.add_argument("-o", "--output", default=None, help="Output .xlsx path (single PDF only)")
+    p_tables.add_argument("-o", "--output", default=None, help="Output .xlsx path, or directory/.zip for other formats (single PDF only)")
+    p_tables.add_argument("--format", choices=FORMATS, default="xlsx", help="xlsx, or one file per table as csv/ndjson/parquet with a manifest (default: xlsx)")
+    p_tables.add_argument("--no-types", action="store_false", dest="infer_types", help="Write every cell as text (no number, percent, currency or date detection)")
     p_tables.add_argument("--no-overwrite", action="store_true", help="Do not overwrite existing output")
+    p_tables.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes per PDF (0 = all CPU cores; default: 1)")
+    p_tables.add_argument("--low-memory", action="store_true", help="Release each page's parsed data after use (for very long PDFs)")
+    p_tables.add_argument("--incremental", action="store_true", help="Reuse cached tables for pages unchanged since an earlier run")
+    p_tables.add_argument("--pages", type=_pages_arg, default=None, help="Pages to extract, e.g. 5-40,72 (default: all)")
+    p_tables.add_argument("--max-tables", type=int, default=None, help="Stop after this many tables per PDF")
+    p_tables.add_argument("--profile", choices=TABLE_PROFILES, default="lines", help="Table detection: ruling lines, text alignment, or mixed (default: lines)")
+    p_tables.add_argument("--table-settings", default=None, help="JSON pdfplumber table_settings applied on top of the profile")
+    p_tables.add_argument("--no-prescreen", action="store_false", dest="prescreen", help="Run the full table search on every page, even ones that look table-free")
+    p_tables.add_argument("--continue-on-error", action="store_true", help="Keep going after a PDF fails (default: stop at the first failure)")
+    _add_journal_args(p_tables)
     p_tables.set_defaults(func=cmd_tables)
 
     # ask: PDF(s) + query
     p_ask = sub.add_parser("ask", help="AI agent: extract what you ask for from PDF(s)")
-    p_ask.add_argument("pdf", nargs="+", help="PDF file(s) or directory containing PDFs")
-    p_ask.add_argument("query", help="What to extract, e.g. 'company taxes for January 2026'")
-    p_ask.add_argument("-o", "--output", default=None, help="Output .xlsx path (single PDF only)")
-    p_ask.add_argument("--model", default="claude-sonnet-4-20250514", help="Anthropic model")
+    p_ask.add_argument(
+        "inputs",
+        nargs="+",
+        metavar="PDF",
+        help="PDF file(s) or directory containing PDFs, then what to extract, e.g. 'company taxes for January 2026' (unless -q/--query-file is used)",
+    )
+    p_ask.add_argument("-q", "--query", action="append", dest="queries", default=[], metavar="QUERY", help="What to extract; repeat for several (one request, one sheet per query)")
+    p_ask.add_argument("--query-file", default=None, help="File with one query per line (blank lines and # comments ignored)")
+    p_ask.add_argument("-o", "--output", default=None, help="Output .xlsx path, or directory/.zip for other formats (single PDF only)")
+    p_ask.add_argument("--format", choices=FORMATS, default="xlsx", help="xlsx, or one file per table as csv/ndjson/parquet with a manifest (default: xlsx)")
+    p_ask.add_argument("--no-types", action="store_false", dest="infer_types", help="Write every cell as text (no number, percent, currency or date detection)")
+    p_ask.add_argument("--provider", choices=AI_PROVIDERS, default="anthropic", help="AI provider; auto races Gemini and Anthropic when both keys are set (default: anthropic)")
+    p_ask.add_argument("--model", default=None, help="Model name, not with --provider auto (default: claude-sonnet-4-20250514 / GEMINI_MODEL or gemini-2.0-flash)")
+    p_ask.add_argument("--no-cache", action="store_true", help="Always call the API; do not read or write the result cache")
+    p_ask.add_argument("--page-budget", type=int, default=None, help="Send only the N pages most relevant to the query (plus neighbours); whole PDF if unclear")
+    p_ask.add_argument("--chunk-pages", type=int, default=None, help="Split the PDF into chunks of N pages (and at most 32 MB), ask them in parallel and merge the answers; for PDFs over the provider limits")
+    p_ask.add_argument("--chunk-workers", type=int, default=4, help="Chunks asked at the same time with --chunk-pages (default: 4)")
+    p_ask.add_argument("--reuse-upload", action="store_true", help="Upload each PDF once (provider Files API) and reuse it for later queries")
+    p_ask.add_argument("--stream", action="store_true", help="Write rows as the answer streams in (single query); stops reading after an \"error\" row")
+    p_ask.add_argument("-c", "--concurrency", type=int, default=1, help="PDFs processed at the same time (default: 1)")
+    p_ask.add_argument("--rpm", type=float, default=None, help="Max API requests per minute (default: no limit)")
+    p_ask.add_argument("--tpm", type=float, default=None, help="Max input tokens per minute, estimated from page count (default: no limit)")
+    p_ask.add_argument("--retries", type=int, default=5, help="Retries per PDF on rate-limit/overload errors (default: 5)")
+    _add_journal_args(p_ask)
     p_ask.set_defaults(func=cmd_ask)
 
+    # watch: hot folder
+    p_watch = sub.add_parser("watch", help="Convert PDFs (all tables) as they are added to or changed in a folder")
+    p_watch.add_argument("directory", help="Folder to watch")
+    p_watch.add_argument("--output-dir", default=None, help="Write outputs here, mirroring the folder layout (default: next to each PDF)")
+    p_watch.add_argument("--manifest", default=None, help="SQLite manifest of converted files (default: <directory>/.pdf-excel-manifest.sqlite)")
+    p_watch.add_argument("-w", "--workers", type=int, default=2, help="PDFs converted at the same time (default: 2)")
+    p_watch.add_argument("--settle", type=float, default=2.0, help="Seconds a file must stay unchanged before it is converted (default: 2)")
+    p_watch.add_argument("--interval", type=float, default=5.0, help="Polling interval in seconds (default: 5)")
+    p_watch.add_argument("-r", "--recursive", action="store_true", help="Include subfolders")
+    p_watch.add_argument("--poll", action="store_true", help="Poll even if watchdog is installed (e.g. network shares)")
+    p_watch.add_argument("--once", action="store_true", help="Convert what is new or changed, then exit")
+    p_watch.add_argument("--format", choices=FORMATS, default="xlsx", help="xlsx, or one file per table as csv/ndjson/parquet with a manifest (default: xlsx)")
+    p_watch.add_argument("--no-types", action="store_false", dest="infer_types", help="Write every cell as text (no number, percent, currency or date detection)")
+    p_watch.add_argument("--profile", choices=TABLE_PROFILES, default="lines", help="Table detection: ruling lines, text alignment, or mixed (default: lines)")
+    p_watch.add_argument("--table-settings", default=None, help="JSON pdfplumber table_settings applied on top of the profile")
+    p_watch.add_argument("--no-prescreen", action="store_false", dest="prescreen", help="Run the full table search on every page, even ones that look table-free")
+    p_watch.set_defaults(func=cmd_watch)
+
     args = parser.parse_args()
+    if args.metrics:
+        metrics.enable_json_log()
     try:
         return args.func(args)
     except FileNotFoundError as e:
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Benchmarks for the PDF → Excel paths, with a JSON baseline to catch regressions.
+   Run from project root: python scripts/bench.py --save bench_baseline.json
+   Later:                 python scripts/bench.py --compare bench_baseline.json
+
+   tables  pdf_tables_to_excel on a synthetic corpus (scripts/make_sample_pdf.py)
+   csv     extract_csv_from_response + csv_to_excel on a large model response
+   flask   POST /extract → job → download, with the AI provider stubbed out (no API calls)
+
+   Each benchmark records wall time, peak RSS and its throughput (pages/s, tables/s or rows/s);
+   the best of --repeat runs is kept. --compare exits 1 if any metric is worse than the baseline
+   by more than --tolerance."""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+sys.path.insert(0, str(root / "scripts"))
+
+from make_sample_pdf import make_corpus  # noqa: E402
+from memusage import peak_rss_mb, reset_peak_rss  # noqa: E402
+
+# Direction of "better" per metric, for --compare
+HIGHER_IS_BETTER = {"pages_per_s", "tables_per_s", "rows_per_s", "jobs_per_s"}
+LOWER_IS_BETTER = {"wall_s", "peak_rss_mb"}
+
+
+def _measure(fn, repeat: int) -> tuple[float, float | None, object]:
+    """Best wall time and the peak RSS of that run (since reset). Returns (wall_s, peak_mb, result)."""
+    best = None
+    for _ in range(repeat):
+        reset_peak_rss()
+        t0 = time.perf_counter()
+        result = fn()
+        wall = time.perf_counter() - t0
+        peak = peak_rss_mb()
+        if best is None or wall < best[0]:
+            best = (wall, peak, result)
+    return best
+
+
+def _count_sheets(xlsx: Path) -> int:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx, read_only=True)
+    try:
+        return len(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def bench_tables(args, work: Path) -> dict:
+    from tables_to_excel import pdf_tables_to_excel
+
+    pdf = make_corpus(
+        work / "corpus.pdf",
+        pages=args.pages,
+        tables_per_page=args.tables_per_page,
+        rows=args.rows,
+        cols=args.cols,
+        style=args.style,
+        text=args.text,
+    )
+    settings = {"vertical_strategy": "text", "horizontal_strategy": "text"} if args.style == "whitespace" else None
+    out = work / ("corpus.xlsx" if args.format == "xlsx" else "corpus")
+    wall, peak, _ = _measure(
+        lambda: pdf_tables_to_excel(
+            str(pdf), str(out), workers=args.jobs, low_memory=args.low_memory, table_settings=settings, fmt=args.format
+        ),
+        args.repeat,
+    )
+    tables = _count_sheets(out) if args.format == "xlsx" else len(json.loads((out / "manifest.json").read_text())["tables"])
+    return {
+        "wall_s": round(wall, 4),
+        "pages_per_s": round(args.pages / wall, 2),
+        "tables_per_s": round(tables / wall, 2),
+        "tables_found": tables,
+        "peak_rss_mb": peak,
+    }
+
+
+def _model_response(rows: int, cols: int) -> str:
+    header = ",".join(f"Col{c}" for c in range(1, cols + 1))
+    body = "\n".join(",".join([f"Row {r}"] + [f'"{r * c:,}.50"' for c in range(1, cols)]) for r in range(1, rows + 1))
+    return f"Here is the data.\n---BEGIN CSV---\n{header}\n{body}\n---END CSV---\n"
+
+
+def bench_csv(args, work: Path) -> dict:
+    from extract import csv_to_excel, extract_csv_from_response
+
+    text = _model_response(args.csv_rows, args.cols)
+    out = work / ("csv.xlsx" if args.format == "xlsx" else "csv")
+    wall, peak, _ = _measure(lambda: csv_to_excel(extract_csv_from_response(text), str(out), args.format), args.repeat)
+    return {"wall_s": round(wall, 4), "rows_per_s": round(args.csv_rows / wall, 1), "peak_rss_mb": peak}
+
+
+def bench_flask(args, work: Path) -> dict:
+    os.environ.pop("GEMINI_API_KEY", None)
+    os.environ["ANTHROPIC_API_KEY"] = "bench"
+    import app as web
+    from extract import csv_to_excel, extract_csv_from_response
+
+    text = _model_response(args.flask_rows, args.cols)
+
+    def stub_provider(pdf_path, query, output_path, **kwargs):
+        csv_to_excel(extract_csv_from_response(text), output_path)
+        return output_path
+
+    real_get_converter = web.get_converter
+    web.get_converter = lambda name: stub_provider if name in ("anthropic", "auto") else real_get_converter(name)
+    pdf = make_corpus(work / "upload.pdf", pages=args.flask_pages, cols=args.cols)
+    client = web.app.test_client()
+
+    def run_jobs():
+        urls = []
+        for _ in range(args.flask_jobs):
+            with open(pdf, "rb") as f:
+                resp = client.post(
+                    "/extract",
+                    data={"pdf": (f, "upload.pdf"), "mode": "ask", "query": "all rows"},
+                    headers={"Accept": "application/json"},
+                )
+            if resp.status_code != 202:
+                raise RuntimeError(f"/extract returned {resp.status_code}: {resp.get_data(as_text=True)}")
+            urls.append(resp.get_json())
+        for job in urls:
+            while (status := client.get(job["status_url"]).get_json()["status"]) not in ("done", "failed"):
+                time.sleep(0.005)
+            if status != "done":
+                raise RuntimeError("Job failed")
+            client.get(job["result_url"]).close()
+
+    wall, peak, _ = _measure(run_jobs, args.repeat)
+    return {"wall_s": round(wall, 4), "jobs_per_s": round(args.flask_jobs / wall, 2), "peak_rss_mb": peak}
+
+
+BENCHMARKS = {"tables": bench_tables, "csv": bench_csv, "flask": bench_flask}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Metrics worse than the baseline by more than tolerance (a fraction), as report lines."""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get("results", {}).get(name, {})
+        for metric, value in metrics.items():
+            old = base.get(metric)
+            if value is None or not old:
+                continue
+            change = (value - old) / old
+            worse = (metric in HIGHER_IS_BETTER and change < -tolerance) or (metric in LOWER_IS_BETTER and change > tolerance)
+            line = f"{name}.{metric}: {old} → {value} ({change:+.1%})"
+            print(("REGRESSION  " if worse else "            ") + line)
+            if worse:
+                regressions.append(line)
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the PDF → Excel paths.")
+    ap.add_argument("--only", action="append", choices=list(BENCHMARKS), help="Run only these benchmarks (repeatable)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best is kept")
+    ap.add_argument("--pages", type=int, default=50, help="Corpus pages for the tables benchmark")
+    ap.add_argument("--tables-per-page", type=int, default=2)
+    ap.add_argument("--rows", type=int, default=15)
+    ap.add_argument("--cols", type=int, default=5)
+    ap.add_argument("--style", choices=["ruled", "whitespace"], default="ruled")
+    ap.add_argument("--text", action="store_true", help="Mix text paragraphs into the corpus")
+    ap.add_argument("-j", "--jobs", type=int, default=1, help="Workers for the tables benchmark")
+    ap.add_argument("--low-memory", action="store_true")
+    ap.add_argument("--format", choices=["xlsx", "csv", "ndjson", "parquet"], default="xlsx", help="Output format for tables and csv")
+    ap.add_argument("--csv-rows", type=int, default=20000, help="Rows in the synthetic model response")
+    ap.add_argument("--flask-jobs", type=int, default=10, help="Uploads per flask run")
+    ap.add_argument("--flask-pages", type=int, default=5)
+    ap.add_argument("--flask-rows", type=int, default=200, help="Rows in the stubbed provider's response")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Show the converters' progress logging")
+    ap.add_argument("--save", metavar="FILE", help="Write results as a JSON baseline")
+    ap.add_argument("--compare", metavar="FILE", help="Compare with a saved baseline; exit 1 on regression")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before --compare fails (0.2 = 20%%)")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s", force=True)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.only or list(BENCHMARKS):
+            work = Path(tmp) / name
+            work.mkdir()
+            results[name] = BENCHMARKS[name](args, work)
+            print(f"{name}: {json.dumps(results[name])}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params": {k: v for k, v in vars(args).items() if k not in ("only", "repeat", "verbose", "save", "compare", "tolerance")},
+        },
+        "results": results,
+    }
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved baseline: {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("params") != report["meta"]["params"]:
+            print("Note: baseline was recorded with different parameters.")
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
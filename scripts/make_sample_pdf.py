@@ -1,57 +1,160 @@
 #!/usr/bin/env python3
-"""Generate a sample PDF with tables for testing the PDF → Excel converter.
+"""Generate PDFs with tables for testing the PDF → Excel converter.
    Run from project root: python scripts/make_sample_pdf.py
-   Creates sample_report.pdf in the project root."""
+   Creates sample_report.pdf in the project root.
 
+   With --pages (and the other options) it builds a synthetic corpus for benchmarks instead:
+   python scripts/make_sample_pdf.py --pages 200 --tables-per-page 2 --rows 20 --cols 6 --style whitespace --text -o corpus.pdf"""
+
+import argparse
+import random
 from pathlib import Path
+
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
 # Output next to script's parent (project root)
 root = Path(__file__).resolve().parent.parent
-out_path = root / "sample_report.pdf"
-
-doc = SimpleDocTemplate(str(out_path), pagesize=letter)
-story = []
-styles = getSampleStyleSheet()
-
-# Title
-story.append(Paragraph("Sample Report for PDF→Excel Test", styles["Title"]))
-story.append(Spacer(1, 20))
-
-# Table 1: Simple data
-data1 = [
-    ["Product", "Qty", "Price", "Total"],
-    ["Widget A", "10", "2.50", "25.00"],
-    ["Widget B", "5", "4.00", "20.00"],
-    ["Widget C", "8", "1.75", "14.00"],
-]
-t1 = Table(data1)
-t1.setStyle(TableStyle([
-    ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 10),
-    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-    ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.black),
-    ("BOX", (0, 0), (-1, -1), 0.5, colors.black),
-]))
-story.append(t1)
-story.append(Spacer(1, 30))
-
-# Table 2: Another section
-data2 = [
-    ["Month", "Revenue", "Expenses"],
-    ["January 2026", "12,500", "8,200"],
-    ["February 2026", "14,200", "9,100"],
-]
-t2 = Table(data2)
-t2.setStyle(TableStyle([
-    ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 10),
-    ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
+
+RULED = TableStyle([
+    ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8),
+    ("FONT", (0, 1), (-1, -1), "Helvetica", 8),
     ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.black),
     ("BOX", (0, 0), (-1, -1), 0.5, colors.black),
-]))
-story.append(t2)
+])
+# No lines at all: only text alignment shows the columns
+WHITESPACE = TableStyle([
+    ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8),
+    ("FONT", (0, 1), (-1, -1), "Helvetica", 8),
+])
+
+WORDS = "revenue expenses quarterly report payroll taxes summary region total budget forecast net gross margin".split()
+
+
+def make_sample(out_path: Path) -> Path:
+    """The small two-table sample report."""
+    doc = SimpleDocTemplate(str(out_path), pagesize=letter)
+    story = []
+    styles = getSampleStyleSheet()
+
+    # Title
+    story.append(Paragraph("Sample Report for PDF→Excel Test", styles["Title"]))
+    story.append(Spacer(1, 20))
+
+    # Table 1: Simple data
+    data1 = [
+        ["Product", "Qty", "Price", "Total"],
+        ["Widget A", "10", "2.50", "25.00"],
+        ["Widget B", "5", "4.00", "20.00"],
+        ["Widget C", "8", "1.75", "14.00"],
+    ]
+    t1 = Table(data1)
+    t1.setStyle(TableStyle([
+        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 10),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BOX", (0, 0), (-1, -1), 0.5, colors.black),
+    ]))
+    story.append(t1)
+    story.append(Spacer(1, 30))
+
+    # Table 2: Another section
+    data2 = [
+        ["Month", "Revenue", "Expenses"],
+        ["January 2026", "12,500", "8,200"],
+        ["February 2026", "14,200", "9,100"],
+    ]
+    t2 = Table(data2)
+    t2.setStyle(TableStyle([
+        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 10),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
+        ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BOX", (0, 0), (-1, -1), 0.5, colors.black),
+    ]))
+    story.append(t2)
+
+    doc.build(story)
+    return out_path
+
+
+def make_corpus(
+    out_path: Path,
+    pages: int = 10,
+    tables_per_page: int = 1,
+    rows: int = 10,
+    cols: int = 4,
+    style: str = "ruled",
+    text: bool = False,
+    seed: int = 0,
+    prose_every: int = 0,
+) -> Path:
+    """
+    Synthetic PDF: `pages` pages, each with `tables_per_page` tables of `rows` data rows x `cols`
+    columns. style is "ruled" (grid lines) or "whitespace" (no lines). text adds a paragraph of
+    filler before each table. With prose_every=N, every Nth page is paragraphs only (no table).
+    The same arguments always give the same content.
+    """
+    if style not in ("ruled", "whitespace"):
+        raise ValueError('style must be "ruled" or "whitespace"')
+    rng = random.Random(seed)
+    styles = getSampleStyleSheet()
+    story = []
+    for p in range(1, pages + 1):
+        if prose_every and p % prose_every == 0:
+            for _ in range(4):
+                story.append(Paragraph(" ".join(rng.choice(WORDS) for _ in range(90)), styles["BodyText"]))
+            if p < pages:
+                story.append(PageBreak())
+            continue
+        for t in range(1, tables_per_page + 1):
+            if text:
+                story.append(Paragraph(" ".join(rng.choice(WORDS) for _ in range(60)), styles["BodyText"]))
+            header = [f"Col{c}" for c in range(1, cols + 1)]
+            data = [header] + [
+                [f"P{p}T{t}R{r}"] + [f"{rng.uniform(0, 10000):,.2f}" for _ in range(cols - 1)]
+                for r in range(1, rows + 1)
+            ]
+            table = Table(data)
+            table.setStyle(RULED if style == "ruled" else WHITESPACE)
+            story.append(table)
+            story.append(Spacer(1, 12))
+        if p < pages:
+            story.append(PageBreak())
+    SimpleDocTemplate(str(out_path), pagesize=letter).build(story)
+    return out_path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Generate a sample PDF, or a synthetic corpus with --pages.")
+    ap.add_argument("-o", "--output", help="Output PDF (default: sample_report.pdf, or corpus.pdf with --pages)")
+    ap.add_argument("--pages", type=int, help="Build a synthetic corpus with this many pages")
+    ap.add_argument("--tables-per-page", type=int, default=1)
+    ap.add_argument("--rows", type=int, default=10, help="Data rows per table")
+    ap.add_argument("--cols", type=int, default=4, help="Columns per table")
+    ap.add_argument("--style", choices=["ruled", "whitespace"], default="ruled")
+    ap.add_argument("--text", action="store_true", help="Mix a paragraph of text in before each table")
+    ap.add_argument("--prose-every", type=int, default=0, help="Make every Nth page paragraphs only (no table)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    if args.pages is None:
+        out_path = make_sample(Path(args.output) if args.output else root / "sample_report.pdf")
+    else:
+        out_path = make_corpus(
+            Path(args.output) if args.output else root / "corpus.pdf",
+            pages=args.pages,
+            tables_per_page=args.tables_per_page,
+            rows=args.rows,
+            cols=args.cols,
+            style=args.style,
+            text=args.text,
+            seed=args.seed,
+            prose_every=args.prose_every,
+        )
+    print(f"Created: {out_path}")
+
 
-doc.build(story)
-print(f"Created: {out_path}")
+if __name__ == "__main__":
+    main()
@@ -6,63 +6,245 @@ Part of the converter foundation. Use extract.py for the AI agent (natural-langu
 """
 
 import argparse
+import contextlib
 import logging
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 log = logging.getLogger(__name__)
 
 import pdfplumber
-from openpyxl import Workbook
+
+import metrics
+from columns import ColumnTable
+from ingest import is_path, load_source, source_file
+from memusage import peak_rss_mb, reset_peak_rss
+from page_cache import PageTableCache, page_fingerprint
+from prescreen import TABLE_PROFILES, page_indices, parse_pages, prescreen_pages, table_settings_for
+from writers import FORMATS, default_output, open_writer
+
+# Pages per work unit = total / (workers * this). Smaller units balance uneven pages across the pool.
+CHUNKS_PER_WORKER = 4
+
+
+def _page_chunks(pages: list[int], workers: int) -> list[list[int]]:
+    """Split 0-based page indices into consecutive chunks, in page order."""
+    size = max(1, -(-len(pages) // (workers * CHUNKS_PER_WORKER)))
+    return [pages[start : start + size] for start in range(0, len(pages), size)]
+
+
+def _release_page(pdf, page) -> None:
+    """Drop a page's parsed layout/char caches and pdfminer's resolved-object cache."""
+    page.close()
+    # pdfminer keeps every resolved object (content streams, fonts) for the life of the
+    # document; clearing it bounds memory at the cost of re-resolving shared resources.
+    pdf.doc._cached_objs.clear()
+    pdf.doc._parsed_objs.clear()
+
+
+def _page_tables(pdf, page, opts: dict, page_cache: PageTableCache | None, stats: dict) -> list:
+    """
+    Extract one page's tables, reusing cached tables when the page fingerprint is unchanged.
+    Counts cache hits in stats["cache_hits"]; releases the page afterwards in low-memory mode.
+    """
+    table_settings = opts.get("table_settings")
+    fingerprint = tables = None
+    if page_cache is not None:
+        fingerprint = page_fingerprint(page, table_settings)
+        tables = page_cache.get_tables(fingerprint)
+        if tables is not None:
+            stats["cache_hits"] = stats.get("cache_hits", 0) + 1
+    if tables is None:
+        tables = page.extract_tables(table_settings)
+        if fingerprint is not None:
+            page_cache.put_tables(fingerprint, tables)
+    if opts.get("low_memory"):
+        _release_page(pdf, page)
+    return tables
+
+
+# In a worker process: the PDF's bytes, sent once by the pool initializer (see _iter_page_tables)
+_worker_pdf: bytes | None = None
+
+
+def _init_worker(data: bytes) -> None:
+    global _worker_pdf
+    _worker_pdf = data
+
+
+def _extract_pages(pdf_path, pages: list[int], opts: dict) -> tuple[list[tuple[int, list]], dict]:
+    """
+    Worker: open the PDF (a path, or None for the worker's _worker_pdf) on its own and extract tables from the given 0-based pages.
+    Returns ((page_num, tables) per page with page_num 1-based, worker stats incl. peak RSS in MB
+    and per-page extraction seconds, which the parent records in metrics).
+    """
+    out = []
+    stats = {"extract_s": []}
+    page_cache = PageTableCache(opts["page_cache_dir"]) if opts.get("page_cache_dir") else None
+    with pdfplumber.open(source_file(_worker_pdf if pdf_path is None else pdf_path)) as pdf:
+        for index in pages:
+            t0 = time.perf_counter()
+            out.append((index + 1, _page_tables(pdf, pdf.pages[index], opts, page_cache, stats)))
+            stats["extract_s"].append(time.perf_counter() - t0)
+    stats["peak_mb"] = peak_rss_mb()
+    return out, stats
+
+
+def _iter_page_tables(pdf, pdf_path, pages: list[int], workers: int, opts: dict, stats: dict, page_cache: PageTableCache | None = None):
+    """
+    Yield (page_num, tables) for the given 0-based pages in page order, using a process pool when
+    workers > 1 (workers open their own page cache from opts["page_cache_dir"]).
+    Page cache hits go to stats["cache_hits"], the largest worker peak RSS (MB) to stats["worker_peak_mb"],
+    total extraction seconds and pages to stats["extract_s"] and stats["extracted"]. Closing the generator early cancels pending pages.
+    """
+    total_pages = len(pdf.pages)
+    stats.setdefault("extract_s", 0.0)
+    stats.setdefault("extracted", 0)
+    if workers <= 1 or len(pages) < 2:
+        for index in pages:
+            if total_pages > 1:
+                log.info("Page %d/%d", index + 1, total_pages)
+            t0 = time.perf_counter()
+            with metrics.timer("extract_tables"):
+                tables = _page_tables(pdf, pdf.pages[index], opts, page_cache, stats)
+            stats["extract_s"] += time.perf_counter() - t0
+            stats["extracted"] += 1
+            yield index + 1, tables
+        return
+
+    chunks = _page_chunks(pages, workers)
+    workers = min(workers, len(chunks))
+    log.info("Extracting %d pages with %d workers", len(pages), workers)
+    if is_path(pdf_path):
+        source, pool = str(pdf_path), ProcessPoolExecutor(max_workers=workers)
+    else:
+        # Bytes go to each worker once, not pickled again with each of the chunks
+        source, pool = None, ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,))
+    try:
+        # map() yields results in submission order, so sheets come out exactly as in the serial path
+        results = pool.map(_extract_pages, [source] * len(chunks), chunks, [opts] * len(chunks))
+        for chunk_pages, (chunk, worker_stats) in zip(chunks, results):
+            log.info("Pages %d-%d/%d", chunk_pages[0] + 1, chunk_pages[-1] + 1, total_pages)
+            stats["cache_hits"] = stats.get("cache_hits", 0) + worker_stats.get("cache_hits", 0)
+            for seconds in worker_stats["extract_s"]:
+                metrics.observe("pdf_excel_stage_seconds", seconds, stage="extract_tables")
+            stats["extract_s"] += sum(worker_stats["extract_s"])
+            stats["extracted"] += len(chunk)
+            if worker_stats["peak_mb"] is not None:
+                stats["worker_peak_mb"] = max(stats.get("worker_peak_mb", 0.0), worker_stats["peak_mb"])
+            yield from chunk
+    finally:
+        pool.shutdown(cancel_futures=True)
 
 
 def pdf_tables_to_excel(
-    pdf_path: str,
-    output_path: str | None = None,
+    pdf_path,
+    output_path=None,
     overwrite: bool = True,
+    workers: int = 1,
+    low_memory: bool = False,
+    table_settings: dict | None = None,
+    page_cache: PageTableCache | None = None,
+    fmt: str = "xlsx",
+    infer_types: bool = True,
+    pages: str | None = None,
+    max_tables: int | None = None,
+    prescreen: bool = True,
 ) -> str:
     """
     Extract every table from the PDF and write to one Excel file.
     Each table becomes a sheet. If no tables are found, writes one sheet with a message.
+    fmt "csv", "ndjson" or "parquet" writes one file per table to a directory (or a .zip
+    output path) with a manifest.json instead; with no tables the manifest lists none.
+
+    workers > 1 splits the pages across a process pool (0 = one per CPU core); each worker
+    opens the PDF itself and results are reassembled in page order, so the output is identical.
+    low_memory releases each page's parsed objects once its tables are written, so peak
+    memory stays roughly flat as page count grows. Peak memory is logged per document.
+    table_settings is passed to pdfplumber's extract_tables(). With a page_cache, pages whose
+    fingerprint is unchanged since an earlier run reuse their cached tables (incremental mode).
+    Columns of numbers, percentages, amounts and dates are written as typed values (see
+    columns.py); infer_types=False keeps every cell as text.
+
+    pages ("5-40,72") limits extraction to those pages; max_tables stops after that many tables.
+    With prescreen, pages that cannot hold a table under table_settings (prose, covers, images)
+    are skipped before pdfplumber parses them (see prescreen.py).
+
+    pdf_path may also be the PDF's bytes or a binary file object, and output_path a writable
+    binary file object (see writers.py); an in-memory PDF needs an output_path.
     """
-    pdf_path = Path(pdf_path)
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"Not found: {pdf_path}")
-    if pdf_path.suffix.lower() != ".pdf":
-        raise ValueError("File must be a .pdf")
+    if is_path(pdf_path):
+        pdf_path = Path(pdf_path)
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"Not found: {pdf_path}")
+        if pdf_path.suffix.lower() != ".pdf":
+            raise ValueError("File must be a .pdf")
+    else:
+        pdf_path = load_source(pdf_path)
+        if output_path is None:
+            raise ValueError("An output is required when the PDF is not a file")
+        if not pdf_path:
+            raise ValueError("PDF is empty")
 
-    out = Path(output_path or pdf_path.with_suffix(".xlsx"))
-    if out.exists() and not overwrite:
-        raise FileExistsError(f"Output exists (use --overwrite to replace): {out}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (choose from {', '.join(FORMATS)})")
+    out = output_path if output_path is not None else default_output(pdf_path, fmt)
+    if is_path(out):
+        out = Path(out)
+        if out.exists() and not overwrite:
+            raise FileExistsError(f"Output exists (use --overwrite to replace): {out}")
 
-    out.parent.mkdir(parents=True, exist_ok=True)
-    wb = Workbook()
-    wb.remove(wb.active)
+    page_ranges = parse_pages(pages) if pages else None
+    if max_tables is not None and max_tables < 1:
+        raise ValueError("max_tables must be at least 1")
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    own_peak = reset_peak_rss()
+    stats = {}
+    opts = {
+        "low_memory": low_memory,
+        "table_settings": table_settings,
+        "page_cache_dir": str(page_cache.directory) if page_cache is not None else None,
+    }
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
+        with contextlib.ExitStack() as stack:
+            with metrics.timer("open"):
+                # Opened before the writer, so an unreadable PDF leaves no output behind
+                pdf = stack.enter_context(pdfplumber.open(source_file(pdf_path)))
+                total_pages = len(pdf.pages)
+            writer = stack.enter_context(open_writer(out, fmt))
+            selected = page_indices(page_ranges, total_pages)
+            candidates = selected
+            if prescreen:
+                t0 = time.perf_counter()
+                with metrics.timer("prescreen"):
+                    candidates = prescreen_pages(pdf_path, selected, table_settings)
+                stats["prescreen_s"] = time.perf_counter() - t0
             sheet_num = 0
-            for page_num, page in enumerate(pdf.pages, start=1):
-                if total_pages > 1:
-                    log.info("Page %d/%d", page_num, total_pages)
-                tables = page.extract_tables()
-                if not tables:
-                    continue
-                for i, table in enumerate(tables):
-                    if not table:
-                        continue
-                    sheet_num += 1
-                    name = f"Page{page_num}" if len(tables) == 1 else f"Page{page_num}_T{i+1}"
-                    name = name.replace("\\", "").replace("/", "").replace("*", "").replace("?", "").replace("[", "").replace("]", "")[:31]
-                    ws = wb.create_sheet(title=name or f"Sheet{sheet_num}")
-                    for row in table:
-                        ws.append([str(c).strip() if c is not None else "" for c in row])
-
-            if sheet_num == 0:
-                ws = wb.create_sheet(title="Info")
-                ws.append(["No tables detected in this PDF."])
+            page_tables = _iter_page_tables(pdf, pdf_path, candidates, workers, opts, stats, page_cache)
+            try:
+                for page_num, tables in page_tables:
+                    for i, table in enumerate(tables):
+                        if not table:
+                            continue  # empty tables keep their place in the _T<n> numbering
+                        sheet_num += 1
+                        name = f"Page{page_num}" if len(tables) == 1 else f"Page{page_num}_T{i+1}"
+                        writer.write_table(name, ColumnTable.from_rows(table, infer=infer_types))
+                        if sheet_num == max_tables:
+                            break
+                    if sheet_num == max_tables:
+                        log.info("Stopped after %d table(s) (--max-tables)", max_tables)
+                        break
+            finally:
+                page_tables.close()
+
+            if sheet_num == 0 and fmt == "xlsx":
+                writer.write_sheet("Info", [["No tables detected in this PDF."]])
     except Exception as e:
         msg = str(e).lower()
         if "password" in msg or "encrypted" in msg:
@@ -71,9 +253,32 @@ def pdf_tables_to_excel(
             raise ValueError("PDF could not be read (corrupt or invalid file).") from e
         raise
 
-    wb.save(out)
-    log.info("Wrote %d sheet(s) to %s", sheet_num if sheet_num > 0 else 1, out)
-    return str(out)
+    metrics.inc("pdf_excel_pages_total", len(selected))
+    skipped = len(selected) - len(candidates)
+    if prescreen and skipped:
+        metrics.inc("pdf_excel_pages_skipped_total", skipped)
+        # Estimate: skipped pages would have cost what the extracted pages did on average
+        saved = skipped * stats["extract_s"] / max(stats["extracted"], 1) - stats["prescreen_s"]
+        log.info("Pre-screen skipped %d of %d page(s) without tables (~%.1f s saved)", skipped, len(selected), max(saved, 0.0))
+    if page_cache is not None:
+        page_cache.evict()
+        hits = stats.get("cache_hits", 0)
+        metrics.inc("pdf_excel_cache_total", hits, cache="page", result="hit")
+        metrics.inc("pdf_excel_cache_total", stats["extracted"] - hits, cache="page", result="miss")
+        log.info("Reused cached tables for %d page(s)", hits)
+    target = out if is_path(out) else "memory"
+    if fmt == "xlsx":
+        log.info("Wrote %d sheet(s) to %s", sheet_num if sheet_num > 0 else 1, target)
+    else:
+        log.info("Wrote %d table(s) to %s", sheet_num, target)
+    peak = peak_rss_mb()
+    if peak is not None:
+        label = "Peak memory" if own_peak else "Peak memory (process-wide)"
+        if "worker_peak_mb" in stats:
+            log.info("%s: %.1f MB (largest worker: %.1f MB)", label, peak, stats["worker_peak_mb"])
+        else:
+            log.info("%s: %.1f MB", label, peak)
+    return str(out) if is_path(out) else out
 
 
 def main() -> int:
@@ -81,13 +286,36 @@ def main() -> int:
         description="Extract all tables from a PDF into an Excel file (no API key required)."
     )
     parser.add_argument("pdf", help="Path to the PDF file")
-    parser.add_argument("-o", "--output", default=None, help="Output .xlsx path")
+    parser.add_argument("-o", "--output", default=None, help="Output .xlsx path (other formats: a directory, or a .zip)")
+    parser.add_argument("--format", choices=FORMATS, default="xlsx", help="Output format (default: xlsx)")
     parser.add_argument("--no-overwrite", action="store_false", dest="overwrite", default=True, help="Do not overwrite; fail if output file already exists")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes for table extraction (0 = all CPU cores; default: 1)")
+    parser.add_argument("--low-memory", action="store_true", help="Release each page's parsed data after use (for very long PDFs)")
+    parser.add_argument("--incremental", action="store_true", help="Reuse cached tables for pages unchanged since an earlier run")
+    parser.add_argument("--no-types", action="store_false", dest="infer_types", help="Write every cell as text (no number, percent, currency or date detection)")
+    parser.add_argument("--pages", default=None, help="Pages to extract, e.g. 5-40,72 (default: all)")
+    parser.add_argument("--max-tables", type=int, default=None, help="Stop after this many tables")
+    parser.add_argument("--profile", choices=TABLE_PROFILES, default="lines", help="Table detection: ruling lines, text alignment, or mixed (default: lines)")
+    parser.add_argument("--table-settings", default=None, help="JSON pdfplumber table_settings applied on top of the profile")
+    parser.add_argument("--no-prescreen", action="store_false", dest="prescreen", help="Run the full table search on every page")
     args = parser.parse_args()
 
     try:
         log.info("Input: %s", args.pdf)
-        result = pdf_tables_to_excel(args.pdf, args.output, overwrite=args.overwrite)
+        result = pdf_tables_to_excel(
+            args.pdf,
+            args.output,
+            overwrite=args.overwrite,
+            workers=args.jobs,
+            low_memory=args.low_memory,
+            page_cache=PageTableCache() if args.incremental else None,
+            fmt=args.format,
+            infer_types=args.infer_types,
+            table_settings=table_settings_for(args.profile, args.table_settings),
+            pages=args.pages,
+            max_tables=args.max_tables,
+            prescreen=args.prescreen,
+        )
         print(f"Saved: {result}")
         return 0
     except (FileNotFoundError, ValueError, FileExistsError) as e:
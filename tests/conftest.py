@@ -5,3 +5,37 @@ from pathlib import Path
 root = Path(__file__).resolve().parent.parent
 if str(root) not in sys.path:
     sys.path.insert(0, str(root))
+
+import pytest
+
+
+def _make_tables_pdf(path: Path, pages: int = 3) -> Path:
+    """Small multi-page PDF with one ruled table per page (reportlab)."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle
+
+    story = []
+    for n in range(1, pages + 1):
+        t = Table([["Item", "Qty"], [f"Row {n}a", str(n)], [f"Row {n}b", str(n * 2)]])
+        t.setStyle(TableStyle([
+            ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.black),
+            ("BOX", (0, 0), (-1, -1), 0.5, colors.black),
+        ]))
+        story.append(t)
+        if n < pages:
+            story.append(PageBreak())
+    SimpleDocTemplate(str(path), pagesize=letter).build(story)
+    return path
+
+
+@pytest.fixture
+def make_tables_pdf(tmp_path):
+    """Factory: make_tables_pdf(name, pages) -> path to a PDF with one table per page."""
+    return lambda name, pages=3: _make_tables_pdf(tmp_path / name, pages)
+
+
+@pytest.fixture
+def tables_pdf(tmp_path):
+    """Path to a 3-page PDF with one table per page."""
+    return _make_tables_pdf(tmp_path / "tables.pdf")
@@ -0,0 +1,140 @@
+"""Tests for batch.py (concurrent Ask AI batches) against a local fake provider."""
+
+import asyncio
+import threading
+import time
+
+from batch import RateLimiter, TokenBucket, is_retryable, retry_after_seconds, run_batch
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    """Shaped like anthropic.APIStatusError: status_code + response.headers."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, {"retry-after": retry_after} if retry_after is not None else {})
+
+
+class FakeProvider:
+    """Blocking fake: scripted errors per item, tracks calls and peak concurrency."""
+
+    def __init__(self, script=None, latency=0.01):
+        self.script = {k: list(v) for k, v in (script or {}).items()}
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, item):
+        with self._lock:
+            self.calls.append(item)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            errors = self.script.get(item)
+            if errors:
+                raise errors.pop(0)
+            return f"{item}.xlsx"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_concurrency_limit_and_order():
+    provider = FakeProvider(latency=0.05)
+    results = asyncio.run(run_batch(list(range(8)), provider, concurrency=3))
+    assert [r.value for r in results] == [f"{i}.xlsx" for i in range(8)]
+    assert provider.peak == 3
+
+
+def test_retries_429_honouring_retry_after():
+    provider = FakeProvider({"a": [FakeAPIError(429, retry_after="0.05")]})
+    start = time.monotonic()
+    [result] = asyncio.run(run_batch(["a"], provider, base_delay=10))
+    assert result.ok and result.attempts == 2
+    assert 0.05 <= time.monotonic() - start < 5
+
+
+def test_failure_does_not_stop_batch():
+    provider = FakeProvider({"bad": [FakeAPIError(400)]})
+    seen = []
+    results = asyncio.run(run_batch(["a", "bad", "c"], provider, concurrency=1, on_result=seen.append))
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].attempts == 1
+    assert len(seen) == 3
+
+
+def test_gives_up_after_max_retries():
+    provider = FakeProvider({"a": [FakeAPIError(503)] * 5})
+    [result] = asyncio.run(run_batch(["a"], provider, max_retries=2, base_delay=0.001))
+    assert not result.ok and result.attempts == 3
+
+
+def test_retry_classification():
+    assert is_retryable(FakeAPIError(429))
+    assert is_retryable(FakeAPIError(529))
+    assert not is_retryable(FakeAPIError(401))
+    assert not is_retryable(ValueError("No CSV block found"))
+    assert retry_after_seconds(FakeAPIError(429, retry_after="3")) == 3.0
+    assert retry_after_seconds(FakeAPIError(429)) is None
+
+
+def test_token_bucket_limits_rate():
+    async def go():
+        bucket = TokenBucket(rate=20, per=1.0)  # 20/s, burst 20
+        start = time.monotonic()
+        for _ in range(30):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert 0.4 < asyncio.run(go()) < 2
+
+
+def test_rate_limiter_tokens_per_minute():
+    async def go():
+        limiter = RateLimiter(tpm=600)  # 10 tokens/s
+        start = time.monotonic()
+        await limiter.acquire(600)
+        await limiter.acquire(5)
+        return time.monotonic() - start
+
+    assert 0.4 < asyncio.run(go()) < 2
+
+
+def test_per_request_batch_charges_every_provider_request(tables_pdf):
+    from batch import acquire_request
+    from chunking import ask_in_chunks
+
+    class CountingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__(tpm=10**9)
+            self.charged = []
+
+        async def acquire(self, tokens=0):
+            self.charged.append(tokens)
+            await super().acquire(tokens)
+
+    def ask(chunk, queries):
+        acquire_request(chunk)
+        return ["a\n1"]
+
+    def convert(pdf):
+        ask_in_chunks(pdf, ["q"], ask, chunk_pages=1, max_bytes=10**8)  # 3 chunk requests
+        acquire_request(pdf)  # a re-asked query
+        return "ok"
+
+    limiter = CountingLimiter()
+    results = asyncio.run(run_batch([str(tables_pdf)], convert, limiter=limiter, per_request=True))
+    assert results[0].ok
+    assert limiter.charged == [2000, 2000, 2000, 6000]  # a page per chunk, then the whole PDF
+
+    acquire_request(str(tables_pdf))  # outside a batch: no limit, returns at once
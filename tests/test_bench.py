@@ -0,0 +1,39 @@
+"""Tests for the synthetic corpus generator and the benchmark baseline comparison."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import pytest
+from openpyxl import load_workbook
+
+from bench import compare
+from make_sample_pdf import make_corpus
+from tables_to_excel import pdf_tables_to_excel
+
+
+def test_corpus_tables_are_detected(tmp_path):
+    pdf = make_corpus(tmp_path / "c.pdf", pages=3, tables_per_page=2, rows=4, cols=3, text=True)
+    out = pdf_tables_to_excel(str(pdf), str(tmp_path / "c.xlsx"))
+    wb = load_workbook(out, read_only=True)
+    assert wb.sheetnames == ["Page1_T1", "Page1_T2", "Page2_T1", "Page2_T2", "Page3_T1", "Page3_T2"]
+    rows = list(wb["Page2_T2"].iter_rows(values_only=True))
+    wb.close()
+    assert rows[0] == ("Col1", "Col2", "Col3")
+    assert len(rows) == 5 and rows[1][0] == "P2T2R1"
+
+
+def test_corpus_is_deterministic(tmp_path):
+    a = make_corpus(tmp_path / "a.pdf", pages=2, style="whitespace", seed=7)
+    b = make_corpus(tmp_path / "b.pdf", pages=2, style="whitespace", seed=7)
+    assert a.stat().st_size == b.stat().st_size
+    with pytest.raises(ValueError):
+        make_corpus(tmp_path / "x.pdf", style="dotted")
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"results": {"tables": {"wall_s": 1.0, "pages_per_s": 100.0, "peak_rss_mb": 100.0}}}
+    assert compare({"tables": {"wall_s": 1.1, "pages_per_s": 95.0, "peak_rss_mb": 90.0}}, baseline, 0.2) == []
+    regressions = compare({"tables": {"wall_s": 1.5, "pages_per_s": 60.0, "peak_rss_mb": 100.0}}, baseline, 0.2)
+    assert [r.split(":")[0] for r in regressions] == ["tables.wall_s", "tables.pages_per_s"]
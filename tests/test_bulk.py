@@ -0,0 +1,132 @@
+"""Tests for bulk.py and the /api/bulk endpoint in app.py. No API calls."""
+
+import base64
+import io
+import json
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bulk import BulkItem, stream_zip
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(2) as p:
+        yield p
+
+
+def test_zip_is_streamed_as_items_finish(pool):
+    release = threading.Event()
+
+    def convert(item, out):
+        if item.filename == "slow.pdf":
+            release.wait(5)
+        if item.filename == "bad.pdf":
+            raise ValueError("not a pdf")
+        out.write(item.pdf)
+
+    items = [BulkItem("slow.pdf", b"S"), BulkItem("fast.pdf", b"F"), BulkItem("bad.pdf", b"B"), BulkItem("fast.pdf", b"G", fmt="csv")]
+    stream = stream_zip(items, convert, pool)
+    head = next(stream)  # arrives while slow.pdf is still converting
+    assert b"fast.xlsx" in head or b"fast_csv.zip" in head
+    release.set()
+    data = head + b"".join(stream)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist()[-2:] == ["slow.xlsx", "manifest.json"]
+        assert zf.read("fast_csv.zip") == b"G"
+        manifest = json.loads(zf.read("manifest.json"))
+    assert [f["status"] for f in manifest["files"]] == ["done", "done", "failed", "done"]
+    assert manifest["files"][2]["error"] == "not a pdf" and "output" not in manifest["files"][2]
+    assert manifest["succeeded"] == 3 and manifest["failed"] == 1
+    assert all("seconds" in f and "wait_s" in f for f in manifest["files"])
+
+
+def test_repeated_names_are_numbered(pool):
+    items = [BulkItem("a.pdf", b"1"), BulkItem("A.pdf", b"2"), BulkItem("a.pdf", b"3")]
+    data = b"".join(stream_zip(items, lambda item, out: out.write(item.pdf), pool))
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(data)).read("manifest.json"))
+    assert [f["output"] for f in manifest["files"]] == ["a.xlsx", "A_2.xlsx", "a_3.xlsx"]
+
+
+def test_closing_the_stream_cancels_pending_items():
+    started, running, release = [], threading.Event(), threading.Event()
+
+    def convert(item, out):
+        started.append(item.filename)
+        if item.filename == "1.pdf":
+            running.set()
+            release.wait(5)
+        out.write(b"x")
+
+    uploads = [io.BytesIO(b"%PDF") for _ in range(5)]
+    with ThreadPoolExecutor(1) as one:
+        stream = stream_zip([BulkItem(f"{i}.pdf", f) for i, f in enumerate(uploads)], convert, one)
+        next(stream)  # 0.pdf is in
+        running.wait(5)
+        stream.close()  # the client went away
+        release.set()
+    assert started == ["0.pdf", "1.pdf"]
+    assert all(f.closed for f in uploads)
+
+
+def _post(client, **kwargs):
+    return client.post("/api/bulk", **kwargs)
+
+
+def test_bulk_endpoint_multipart_and_json(tables_pdf):
+    import app as web
+
+    client = web.app.test_client()
+    with open(tables_pdf, "rb") as a, open(tables_pdf, "rb") as b:
+        resp = _post(client, data={
+            "pdf": [(a, "q1.pdf"), (b, "q2.pdf")],
+            "options": json.dumps([{}, {"format": "ndjson"}]),
+        })
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert sorted(zf.namelist()) == ["manifest.json", "q1.xlsx", "q2_ndjson.zip"]
+        assert zf.read("q1.xlsx")[:2] == b"PK"
+
+    content = base64.b64encode(tables_pdf.read_bytes()).decode()
+    resp = _post(client, json={"files": [{"filename": "j.pdf", "content": content}]})
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(resp.data)).read("manifest.json"))
+    assert manifest["files"][0]["status"] == "done"
+
+
+def test_bulk_endpoint_rejects_bad_requests(monkeypatch):
+    import app as web
+
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "k")
+    client = web.app.test_client()
+    assert "No files" in _post(client, data={}).get_json()["error"]
+    resp = _post(client, data={"pdf": [(io.BytesIO(b"%PDF"), "a.pdf")], "mode": "ask"})
+    assert resp.status_code == 400 and "query" in resp.get_json()["error"]
+    resp = _post(client, data={"pdf": [(io.BytesIO(b"%PDF"), "a.pdf")], "options": "[{}, {}]"})
+    assert "one object per file" in resp.get_json()["error"]
+    resp = _post(client, json={"files": [{"filename": "a.pdf", "content": "not base64!"}]})
+    assert "base64" in resp.get_json()["error"]
+    resp = _post(client, json={"files": [{"filename": "a.txt", "content": ""}]})
+    assert "not a PDF" in resp.get_json()["error"]
+    for spec in ({"filename": "a.pdf"}, {"filename": "a.pdf", "content": None}, {"filename": "a.pdf", "content": ""}):
+        resp = _post(client, json={"files": [spec]})
+        assert resp.status_code == 400 and "empty" in resp.get_json()["error"]
+    resp = _post(client, data={"pdf": [(io.BytesIO(b""), "a.pdf")]})
+    assert resp.status_code == 400 and "empty" in resp.get_json()["error"]
+    monkeypatch.setattr(web, "BULK_MAX_FILES", 1)
+    resp = _post(client, json={"files": [{"filename": "a.pdf"}, {"filename": "b.pdf"}]})
+    assert "Too many files" in resp.get_json()["error"]
+
+
+def test_bulk_body_over_the_limit_is_413(monkeypatch):
+    import app as web
+
+    monkeypatch.setattr(web, "BULK_MAX_CONTENT_LENGTH", 1000)
+    resp = _post(web.app.test_client(), data={"pdf": [(io.BytesIO(b"%PDF" + b"x" * 2000), "a.pdf")]})
+    assert resp.status_code == 413
+    assert "Request too large" in resp.get_json()["error"]
@@ -0,0 +1,72 @@
+"""Tests for chunking.py (map-reduce Ask AI over page-range sub-PDFs)."""
+
+import threading
+
+import pypdfium2
+import pytest
+from openpyxl import load_workbook
+
+import extract
+from chunking import merge_csvs, plan_chunks
+
+
+def test_merge_keeps_one_header_and_page_order():
+    merged = merge_csvs([
+        "Item,Qty\nA,1\nA,1\nB,2",
+        "error\nNo matching data found",
+        "qty,item\n2,B\n3,C\nItem,Qty",  # reordered header, boundary repeat, stray header
+    ])
+    assert merged.splitlines() == ["Item,Qty", "A,1", "A,1", "B,2", "C,3"]
+
+
+def test_merge_drops_repeats_only_at_the_boundary():
+    merged = merge_csvs(["a,b\n1,x\n2,y\n3,z", "a,b\n2,y\n3,z\n4,w\n1,x", "a,b\n9,q"])
+    assert merged.splitlines() == ["a,b", "1,x", "2,y", "3,z", "4,w", "1,x", "9,q"]
+
+
+def test_merge_unions_columns_and_keeps_not_found():
+    assert merge_csvs(["a\n1", "a,b\n2,x"]).splitlines() == ["a,b", "1,", "2,x"]
+    assert merge_csvs(["error\nNo matching data found", ""]) == "error\nNo matching data found"
+
+
+def test_plan_chunks_splits_by_pages_and_size(make_tables_pdf):
+    pdf = make_tables_pdf("t.pdf", pages=5)
+    assert [pages for pages, _ in plan_chunks(pdf, 2, 10**8)] == [[0, 1], [2, 3], [4]]
+    one_page = len(plan_chunks(pdf, 1, 10**8)[0][1])
+    # Room for about one page: the 2-page chunks are halved
+    assert [pages for pages, _ in plan_chunks(pdf, 2, one_page + 200)] == [[0], [1], [2], [3], [4]]
+    with pytest.raises(ValueError, match="alone is larger"):
+        plan_chunks(pdf, 2, 100)
+
+
+def _page_texts(path) -> list[str]:
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        return [pdf[i].get_textpage().get_text_range() for i in range(len(pdf))]
+    finally:
+        pdf.close()
+
+
+def test_chunked_extraction_merges_answers(make_tables_pdf, tmp_path, monkeypatch):
+    pdf = make_tables_pdf("t.pdf", pages=5)
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def fake_request_text(chunk_path, queries, *args):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        try:
+            rows = [line.split()[1] for text in _page_texts(chunk_path) for line in text.splitlines() if line.startswith("Row")]
+            return "---BEGIN CSV---\nrow\n" + "\n".join(rows) + "\n---END CSV---"
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(extract, "request_text", fake_request_text)
+    out = extract.extract_pdf_to_excel(str(pdf), "rows", str(tmp_path / "o.xlsx"), api_key="k", chunk_pages=2, chunk_workers=3)
+    values = [r[0] for r in load_workbook(out).active.iter_rows(values_only=True)]
+    assert values == ["row", "1a", "1b", "2a", "2b", "3a", "3b", "4a", "4b", "5a", "5b"]
+    assert 1 <= peak[0] <= 3
+
+    with pytest.raises(ValueError, match="can't be combined"):
+        extract.extract_pdf_to_excel(str(pdf), "rows", str(tmp_path / "p.xlsx"), api_key="k", chunk_pages=2, page_budget=3)
@@ -0,0 +1,107 @@
+"""Tests for clients.py (shared provider clients) against a local HTTP stand-in for the Messages API."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import clients
+import extract
+
+REPLY = {
+    "id": "msg_1", "type": "message", "role": "assistant", "model": "m",
+    "content": [{"type": "text", "text": "---BEGIN CSV---\na\n1\n---END CSV---"}],
+    "stop_reason": "end_turn", "stop_sequence": None, "usage": {"input_tokens": 10, "output_tokens": 5},
+}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    connections = 0
+    requests = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).requests += 1
+        body = json.dumps(REPLY).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    StandIn.connections = StandIn.requests = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield StandIn
+    server.shutdown()
+    server.server_close()
+
+
+def test_one_client_per_provider_and_key():
+    made, closed = [], []
+
+    class Fake:
+        def __init__(self, key):
+            self.key = key
+            made.append(key)
+
+        def close(self):
+            closed.append(self.key)
+
+    pool = clients.ClientPool(factories={"anthropic": lambda key, settings: Fake(key)})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get("anthropic", "k1"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert made == ["k1"] and all(c is results[0] for c in results)
+    assert pool.get("anthropic", "k2") is not results[0]
+    with pytest.raises(ValueError):
+        pool.get("other", "k1")
+    pool.close()
+    assert sorted(closed) == ["k1", "k2"] and len(pool) == 0
+
+
+def test_pooled_client_reuses_connections(stand_in, tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    pool = clients.ClientPool()
+    for _ in range(5):
+        text = extract.request_text(str(pdf), ["q"], "k", "m", client=pool.get("anthropic", "k"))
+    assert "---BEGIN CSV---" in text
+    assert (stand_in.requests, stand_in.connections) == (5, 1)
+    pool.close()
+
+    # A client per request (the old behaviour) opens a connection every time
+    for _ in range(3):
+        fresh = clients.ClientPool()
+        extract.request_text(str(pdf), ["q"], "k", "m", client=fresh.get("anthropic", "k"))
+        fresh.close()
+    assert stand_in.connections == 4
+
+
+def test_default_pool_is_shared_and_closed(stand_in, tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    clients.close_clients()
+    extract.request_text(str(pdf), ["q"], "k", "m")
+    extract.request_text(str(pdf), ["q"], "k", "m")
+    assert len(clients.default_pool()) == 1
+    assert stand_in.connections == 1
+    clients.close_clients()
+    assert len(clients.default_pool()) == 0
@@ -0,0 +1,60 @@
+"""Tests for columns.py (columnar tables and per-column type inference)."""
+
+import datetime
+
+import pytest
+
+from columns import CURRENCY, DATE, FLOAT, INT, PERCENT, TEXT, ColumnTable
+
+
+def _column(*cells, infer=True):
+    return ColumnTable.from_rows([["h"], *[[c] for c in cells]], infer=infer).columns[0]
+
+
+@pytest.mark.parametrize(
+    "cells, kind, values, number_format",
+    [
+        ((" 1 ", "22", None), INT, [1, 22, None], None),
+        (("1,234", "(5,000)", "-"), INT, [1234, -5000, None], "#,##0"),
+        (("1.5", "-2.25", "3"), FLOAT, [1.5, -2.25, 3.0], "0.00"),
+        (("12.5%", "-3%"), PERCENT, [0.125, -0.03], "0.0%"),
+        (("$1,200.00", "($35.10)", "$-2"), CURRENCY, [1200.0, -35.1, -2.0], '"$"#,##0.00'),
+        (("2026/01/05", "2026/2/28", ""), DATE, [datetime.date(2026, 1, 5), datetime.date(2026, 2, 28), None], "yyyy-mm-dd"),
+        (("31.12.2025", "01.02.2026"), DATE, [datetime.date(2025, 12, 31), datetime.date(2026, 2, 1)], "yyyy-mm-dd"),
+        (("13/01/2026", "02/03/2026"), DATE, [datetime.date(2026, 1, 13), datetime.date(2026, 3, 2)], "yyyy-mm-dd"),
+        (("01/13/2026", "02/03/2026"), DATE, [datetime.date(2026, 1, 13), datetime.date(2026, 2, 3)], "yyyy-mm-dd"),
+    ],
+)
+def test_typed_columns(cells, kind, values, number_format):
+    col = _column(*cells)
+    assert (col.kind, col.tolist(), col.number_format) == (kind, values, number_format)
+
+
+@pytest.mark.parametrize(
+    "cells",
+    [
+        ("1", "two"),  # one note keeps the column text
+        ("00123", "00124"),  # identifiers
+        ("1234567890123456",),  # too many digits for float64
+        ("1,5", "2,75"),  # decimal comma, not thousands
+        ("1.234,56", "2.000,00"),  # European grouping
+        ("+-5", "1"),  # more than one sign
+        ("--5", "1"),
+        ("-$-5", "$3"),
+        ("(-5)", "1"),
+        ("10%", "3"),  # mixed percent and plain
+        ("03/04/2026", "05/06/2026"),  # ambiguous day/month
+        ("2026-02-30",),  # not a date
+    ],
+)
+def test_columns_that_stay_text(cells):
+    col = _column(*cells)
+    assert col.kind == TEXT
+    assert col.tolist() == [c.strip() for c in cells]
+
+
+def test_ragged_rows_and_no_inference():
+    table = ColumnTable.from_rows([["a", "b"], ["1"], ["2", "x", "extra"]])
+    assert table.header == ["a", "b", ""]
+    assert list(table.rows()) == [(1, "", ""), (2, "x", "extra")]
+    assert _column(" 1 ", infer=False).tolist() == ["1"]
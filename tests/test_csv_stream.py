@@ -0,0 +1,134 @@
+"""Tests for csv_stream.py and the streamed "Ask AI" path, against a mock client."""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import load_workbook
+
+import extract
+import metrics
+import writers
+from csv_stream import CsvStreamParser
+
+
+def _pieces(text: str, size: int = 3) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def _parse(chunks) -> tuple[CsvStreamParser, list[list[str]]]:
+    parser = CsvStreamParser()
+    rows = []
+    for chunk in chunks:
+        rows += parser.feed(chunk)
+    return parser, rows + parser.finish()
+
+
+def test_rows_complete_across_chunks():
+    text = 'Sure.\n---BEGIN CSV---\nName,Note\nA,"multi\nline, yes"\nB,2\n---END CSV---\ntrailing'
+    parser, rows = _parse(_pieces(text))
+    assert rows == [["Name", "Note"], ["A", "multi\nline, yes"], ["B", "2"]]
+    assert parser.done and parser.rows == 2
+
+
+def test_row_is_returned_once_its_line_ends():
+    parser = CsvStreamParser()
+    assert parser.feed("---BEGIN CSV---\na,b\n1,") == [["a", "b"]]
+    assert parser.feed("2") == []
+    assert parser.feed("\n") == [["1", "2"]]
+
+
+def test_error_answer_stops_after_first_row():
+    parser, rows = _parse(["---BEGIN CSV---\nerror\nNo matching data found\n", "more"])
+    assert rows == [["error"], ["No matching data found"]]
+    assert parser.done and parser.is_error
+
+
+def test_no_block_keeps_text_for_fallback():
+    parser, rows = _parse(_pieces("```csv\na,b\n1,2\n```"))
+    assert rows == [] and not parser.in_block
+    assert extract.extract_csv_from_response(parser.text) == "a,b\n1,2"
+
+
+def test_stream_to_file_stops_reading_early(tmp_path):
+    def chunks():
+        yield "---BEGIN CSV---\nerror\n"
+        yield "No matching data found\n"
+        raise AssertionError("read past the error row")
+
+    seen = []
+    out = tmp_path / "out.xlsx"
+    content = extract.stream_csv_to_file(chunks(), str(out), on_rows=seen.append)
+    assert content == "error\nNo matching data found"
+    assert seen == [1]
+    assert list(load_workbook(out)["Extracted"].values) == [("error",), ("No matching data found",)]
+
+
+def test_stream_to_file_writes_past_the_sample_as_rows_arrive(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "STREAM_SAMPLE_ROWS", 2)
+    events = []
+    start_table = writers.XlsxWriter.start_table
+    monkeypatch.setattr(writers.XlsxWriter, "start_table", lambda *a: events.append("sheet") or start_table(*a))
+
+    def chunks():
+        yield "---BEGIN CSV---\nDate,Amount\n2026-01-01,$1.50\n2026-01-02,$2\n2026-01-03,3\n"
+        events.append("last chunk")
+        yield "later,n/a\n---END CSV---"
+
+    out = tmp_path / "out.xlsx"
+    content = extract.stream_csv_to_file(chunks(), str(out))
+    assert events == ["sheet", "last chunk"]
+    assert content.splitlines()[-1] == "later,n/a"
+    rows = list(load_workbook(out)["Extracted"].values)
+    assert [r[1] for r in rows[1:]] == [1.5, 2, 3, None]
+    assert rows[3][0].day == 3 and rows[4][0] == "later"  # a cell that is not a date stays text
+
+
+def test_stream_to_file_falls_back_without_block(tmp_path):
+    out = tmp_path / "out.xlsx"
+    assert extract.stream_csv_to_file(iter(["Here:\na,b\n", "1,2"]), str(out)) == "a,b\n1,2"
+    assert list(load_workbook(out)["Extracted"].values) == [("a", "b"), (1, 2)]
+
+
+def test_stream_to_file_empty_block(tmp_path):
+    with pytest.raises(ValueError, match="no rows"):
+        extract.stream_csv_to_file(iter(["---BEGIN CSV---\n\n---END CSV---"]), str(tmp_path / "out.xlsx"))
+    assert not (tmp_path / "out.xlsx").exists()
+
+
+class StreamingAnthropic:
+    """Shaped like anthropic.Anthropic for messages.stream()."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.closed = False
+        self.messages = SimpleNamespace(stream=self._stream)
+
+    @contextmanager
+    def _stream(self, **kwargs):
+        final = SimpleNamespace(usage=SimpleNamespace(input_tokens=10, output_tokens=5))
+        try:
+            yield SimpleNamespace(text_stream=iter(_pieces(self.text, 4)), get_final_message=lambda: final)
+        finally:
+            self.closed = True
+
+
+def test_anthropic_stream_text(tables_pdf):
+    metrics.reset()
+    client = StreamingAnthropic("---BEGIN CSV---\na,b\n1,2\n---END CSV---")
+    text = "".join(extract.stream_text(str(tables_pdf), ["items"], "key", client=client))
+    assert text == client.text and client.closed
+    assert metrics.value("pdf_excel_tokens_total", provider="anthropic", kind="output") == 5
+    assert metrics.value("pdf_excel_provider_seconds", provider="anthropic") == 1
+
+
+def test_extract_pdf_streams_single_query(tables_pdf, tmp_path, monkeypatch):
+    client = StreamingAnthropic("---BEGIN CSV---\nItem,Qty\nx,1\ny,2\n---END CSV---")
+    stream_text = extract.stream_text
+    monkeypatch.setattr(extract, "stream_text", lambda *args: stream_text(*args, client=client))
+    monkeypatch.setattr(extract, "extract_csvs", lambda *a: pytest.fail("non-streamed request"))
+    seen = []
+    out = tmp_path / "out.xlsx"
+    extract.extract_pdf_to_excel(str(tables_pdf), "items", str(out), api_key="key", stream=True, on_rows=seen.append)
+    assert seen == [1, 2]
+    assert list(load_workbook(out)["Extracted"].values) == [("Item", "Qty"), ("x", 1), ("y", 2)]
@@ -0,0 +1,105 @@
+"""Tests for doc_sessions.py and upload reuse in both providers, against mock clients."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import extract
+import extract_gemini
+from doc_sessions import DocumentSessions
+
+CSV_REPLY = "---BEGIN CSV---\na,b\n1,2\n---END CSV---"
+
+
+class MockAnthropic:
+    """Records uploads and requests; shaped like anthropic.Anthropic for the calls we make."""
+
+    def __init__(self):
+        self.uploads = []
+        self.deleted = []
+        self.requests = []
+        files = SimpleNamespace(upload=self._upload, delete=lambda ref, betas=None: self.deleted.append(ref))
+        messages = SimpleNamespace(create=self._create)
+        self.beta = SimpleNamespace(files=files, messages=messages)
+        self.messages = messages
+
+    def _upload(self, file, betas=None):
+        self.uploads.append(file)
+        return SimpleNamespace(id=f"file_{len(self.uploads)}")
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        usage = SimpleNamespace(input_tokens=10, cache_read_input_tokens=len(self.requests) - 1, output_tokens=5)
+        return SimpleNamespace(content=[SimpleNamespace(text=CSV_REPLY)], usage=usage)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4 fake")
+    return path
+
+
+def test_registry_reuses_until_ttl():
+    sessions = DocumentSessions(ttl=100)
+    uploads = iter(["ref1", "ref2"])
+    assert sessions.get_or_upload("anthropic", "key", "abc", lambda: next(uploads)) == "ref1"
+    assert sessions.get_or_upload("anthropic", "key", "abc", lambda: next(uploads)) == "ref1"
+    assert sessions.get_or_upload("anthropic", "other-key", "abc", lambda: next(uploads)) == "ref2"
+    assert (sessions.uploads, sessions.reuses) == (2, 1)
+
+
+def test_expired_session_is_deleted_and_reuploaded():
+    sessions = DocumentSessions(ttl=-1)
+    deleted = []
+    sessions.get_or_upload("anthropic", "key", "abc", lambda: "ref1")
+    ref = sessions.get_or_upload("anthropic", "key", "abc", lambda: "ref2", delete=deleted.append)
+    assert ref == "ref2" and deleted == ["ref1"]
+
+
+def test_registry_persists_between_instances(tmp_path):
+    path = tmp_path / "sessions.json"
+    DocumentSessions(path=path).get_or_upload("gemini", "key", "abc", lambda: "uri1")
+    assert DocumentSessions(path=path).get_or_upload("gemini", "key", "abc", lambda: "uri2") == "uri1"
+    assert "key" not in path.read_text()
+
+
+def test_anthropic_uploads_once_for_follow_up_queries(pdf):
+    client = MockAnthropic()
+    sessions = DocumentSessions()
+    for query in ("taxes", "payroll", "revenue"):
+        assert extract.extract_csv(str(pdf), query, "key", sessions=sessions, client=client) == "a,b\n1,2"
+    assert len(client.uploads) == 1
+    doc = client.requests[-1]["messages"][0]["content"][0]
+    assert doc["source"] == {"type": "file", "file_id": "file_1"}
+    assert doc["cache_control"] == {"type": "ephemeral"}
+    assert client.requests[-1]["betas"] == [extract.FILES_API_BETA]
+
+
+def test_anthropic_without_sessions_sends_cached_base64_prefix(pdf):
+    client = MockAnthropic()
+    extract.extract_csv(str(pdf), "taxes", "key", client=client)
+    request = client.requests[0]
+    assert not client.uploads
+    assert request["messages"][0]["content"][0]["source"]["type"] == "base64"
+    assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "betas" not in request
+
+
+def test_gemini_uploads_once_for_follow_up_queries(pdf):
+    calls = {"upload": 0, "generate": []}
+
+    def upload(file, config=None):
+        calls["upload"] += 1
+        return SimpleNamespace(uri="https://files.example/doc")
+
+    def generate_content(model, contents, config=None):
+        calls["generate"].append(contents)
+        return SimpleNamespace(text=CSV_REPLY)
+
+    client = SimpleNamespace(files=SimpleNamespace(upload=upload), models=SimpleNamespace(generate_content=generate_content))
+    sessions = DocumentSessions()
+    for query in ("taxes", "payroll"):
+        extract_gemini.extract_csv(str(pdf), query, "key", "gemini-test", sessions=sessions, client=client)
+    assert calls["upload"] == 1
+    assert calls["generate"][1][0].file_data.file_uri == "https://files.example/doc"
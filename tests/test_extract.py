@@ -87,3 +87,57 @@ class TestCsvToExcel:
             assert rows[1][1] == "c"
         finally:
             Path(path).unlink(missing_ok=True)
+
+
+class TestMultiQuery:
+    """Tests for answering several queries in one request."""
+
+    def test_prompt_lists_numbered_requests(self):
+        from extract import build_user_prompt
+        prompt = build_user_prompt(["taxes", "payroll"])
+        assert "Q1: taxes" in prompt and "Q2: payroll" in prompt
+        assert "---BEGIN CSV: Q1---" in prompt
+
+    def test_labelled_blocks(self):
+        from extract import extract_labelled_csv_blocks
+        text = "---BEGIN CSV: Q2---\nb\n2\n---END CSV---\n---BEGIN CSV: Q1---\na\n1\n---END CSV---\n---BEGIN CSV: Q3---\n---END CSV---"
+        assert extract_labelled_csv_blocks(text) == {1: "a\n1", 2: "b\n2"}
+
+    def test_only_failed_blocks_are_re_asked(self):
+        from extract import answer_queries
+        asked_alone = []
+        reply = (
+            "---BEGIN CSV: Q1---\na\n1\n---END CSV---\n---BEGIN CSV: Q3---\nc\n3\n---END CSV---\n"
+            '---BEGIN CSV: Q4---\nd\n"4\n---END CSV---\n---BEGIN CSV: Q5---\ne\n---END CSV---'
+        )
+
+        def ask_one(q):
+            asked_alone.append(q)
+            return "b\n2"
+
+        answers = answer_queries(["q1", "q2", "q3", "q4", "q5"], lambda qs: reply, ask_one)
+        assert answers == ["a\n1", "b\n2", "c\n3", "b\n2", "b\n2"]
+        assert asked_alone == ["q2", "q4", "q5"]  # missing, unterminated quote, header only
+
+    def test_one_sheet_per_query(self, tmp_path):
+        from openpyxl import load_workbook
+        from extract import answers_to_excel
+        out = tmp_path / "out.xlsx"
+        answers_to_excel(["taxes", "payroll"], ["a\n1", ""], str(out))
+        wb = load_workbook(out)
+        assert wb.sheetnames == ["taxes", "payroll"]
+        assert list(wb["payroll"].iter_rows(values_only=True)) == [("error",), ("No rows returned",)]
+
+    def test_single_request_for_many_queries(self, tmp_path, monkeypatch):
+        import extract
+        requests = []
+
+        def fake_request_text(pdf_path, queries, *args):
+            requests.append(list(queries))
+            return "".join(f"---BEGIN CSV: Q{n}---\ncol\n{q}\n---END CSV---\n" for n, q in enumerate(queries, 1))
+
+        monkeypatch.setattr(extract, "request_text", fake_request_text)
+        pdf = tmp_path / "doc.pdf"
+        pdf.write_bytes(b"%PDF-1.4 fake")
+        extract.extract_pdf_to_excel(str(pdf), ["taxes", "payroll", "revenue"], str(tmp_path / "o.xlsx"), api_key="k")
+        assert requests == [["taxes", "payroll", "revenue"]]
@@ -0,0 +1,81 @@
+"""Tests for ingest.py."""
+
+import base64
+import hashlib
+import io
+
+import pytest
+
+import ingest
+from ingest import PdfDocument, file_sha256, open_pdf, source_sha256
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4\n" + bytes(range(256)) * 50_001)
+    return path
+
+
+def test_base64_matches_standard_encoding(pdf):
+    data = pdf.read_bytes()
+    with open_pdf(pdf) as doc:
+        assert doc.size == len(data)
+        assert doc.base64() == base64.standard_b64encode(data).decode("ascii")
+        assert doc.read() == data
+        with doc.file() as f:
+            assert f.read() == data
+
+
+def test_hash_is_shared_with_file_sha256(pdf, monkeypatch):
+    with open_pdf(pdf) as doc:
+        digest = doc.sha256
+    assert digest == hashlib.sha256(pdf.read_bytes()).hexdigest()
+
+    def fail(_):
+        raise AssertionError("file hashed twice")
+
+    monkeypatch.setattr(ingest, "_sha256_of", fail)
+    assert file_sha256(pdf) == digest
+
+
+def test_hash_follows_file_changes(pdf):
+    before = file_sha256(pdf)
+    pdf.write_bytes(b"%PDF-1.4 changed")
+    assert file_sha256(pdf) != before
+
+
+def test_limits_and_validation(pdf, tmp_path):
+    with pytest.raises(ValueError, match="too large"):
+        open_pdf(pdf, max_bytes=1024)
+    with pytest.raises(FileNotFoundError):
+        open_pdf(tmp_path / "missing.pdf")
+    txt = tmp_path / "doc.txt"
+    txt.write_text("x")
+    with pytest.raises(ValueError, match="must be a PDF"):
+        open_pdf(txt)
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError, match="empty"):
+        open_pdf(empty)
+
+
+def test_in_memory_document():
+    data = b"%PDF-1.4 subset"
+    doc = PdfDocument("doc.pdf", data)
+    assert doc.read() is data
+    assert doc.sha256 == hashlib.sha256(data).hexdigest()
+    assert base64.b64decode(doc.base64()) == data
+
+
+def test_bytes_and_file_object_sources(pdf):
+    data = pdf.read_bytes()
+    for source in (data, io.BytesIO(data)):
+        with open_pdf(source) as doc:
+            assert doc.read() == data
+            assert doc.sha256 == file_sha256(pdf)
+        assert source_sha256(source) == file_sha256(pdf)
+    with pytest.raises(ValueError, match="empty"):
+        open_pdf(b"")
+    with pytest.raises(ValueError, match="too large"):
+        open_pdf(io.BytesIO(data), max_bytes=1024)
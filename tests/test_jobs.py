@@ -0,0 +1,245 @@
+"""Tests for jobs.py and the queued /extract flow in app.py. No API calls."""
+
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+
+from jobs import DONE, FAILED, JobQueue, QueueFull, acquire_result, progress_reporter, release_result, report_progress
+
+
+def wait_finished(q, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = q.get(job_id)
+        if job is not None and job.status in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+@pytest.fixture
+def queue():
+    q = JobQueue(workers=1, max_queued=2)
+    yield q
+    q.shutdown()
+
+
+def test_job_completes(queue, tmp_path):
+    out = tmp_path / "out.xlsx"
+    out.write_bytes(b"x")
+    job = queue.submit(lambda: str(out), work_dir=str(tmp_path), download_name="doc.xlsx")
+    job = wait_finished(queue, job.id)
+    assert job.status == DONE
+    assert job.result == str(out)
+    assert job.to_dict()["download_name"] == "doc.xlsx"
+
+
+def test_report_progress_updates_running_job(queue, tmp_path):
+    def work():
+        report_progress(rows=3)
+        report_progress(rows=7, stage="write")
+        return str(tmp_path)
+
+    job = wait_finished(queue, queue.submit(work, work_dir=str(tmp_path), download_name="d.xlsx").id)
+    assert job.to_dict()["progress"] == {"rows": 7, "stage": "write"}
+    report_progress(rows=1)  # outside a job: ignored
+    assert job.progress["rows"] == 7
+
+
+def test_progress_reporter_works_from_other_threads(queue, tmp_path):
+    def work():
+        report = progress_reporter()
+        t = threading.Thread(target=report, kwargs={"rows": 5})
+        t.start()
+        t.join()
+        return str(tmp_path)
+
+    job = wait_finished(queue, queue.submit(work, download_name="d.xlsx").id)
+    assert job.progress == {"rows": 5}
+
+
+def test_failure_uses_error_message_and_removes_work_dir(tmp_path):
+    q = JobQueue(workers=1, error_message=lambda e: f"nope: {e}")
+    work = tmp_path / "work"
+    work.mkdir()
+
+    def boom():
+        raise ValueError("bad pdf")
+
+    try:
+        job = wait_finished(q, q.submit(boom, work_dir=str(work), download_name="d.xlsx").id)
+    finally:
+        q.shutdown()
+    assert job.status == FAILED
+    assert job.error == "nope: bad pdf"
+    assert not work.exists()
+
+
+def test_full_queue_raises(queue, tmp_path):
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+        return "x"
+
+    queue.submit(block, work_dir=str(tmp_path / "a"), download_name="a")
+    started.wait(5)  # the worker holds the first job; the next two fill the queue
+    queue.submit(block, work_dir=str(tmp_path / "b"), download_name="b")
+    queue.submit(block, work_dir=str(tmp_path / "c"), download_name="c")
+    with pytest.raises(QueueFull):
+        queue.submit(block, work_dir=str(tmp_path / "d"), download_name="d")
+    assert queue.stats()["queue_depth"] == 2
+    release.set()
+
+
+def test_expired_results_are_removed(tmp_path):
+    q = JobQueue(workers=1, result_ttl=0)
+    work = tmp_path / "work"
+    work.mkdir()
+    try:
+        job = q.submit(lambda: "out.xlsx", work_dir=str(work), download_name="d.xlsx")
+        deadline = time.time() + 10
+        while job.finished is None and time.time() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.01)
+        assert q.get(job.id) is None
+        assert not work.exists()
+    finally:
+        q.shutdown()
+
+
+def test_result_being_read_is_closed_by_its_last_reader(tmp_path):
+    q = JobQueue(workers=1, result_ttl=0)
+    try:
+        job = q.submit(lambda: io.BytesIO(b"xlsx"), download_name="d.xlsx")
+        deadline = time.time() + 10
+        while job.finished is None and time.time() < deadline:
+            time.sleep(0.02)
+        assert acquire_result(job)
+        q.cleanup_expired()  # expires while a download is reading it
+        assert not job.result.closed
+        assert not acquire_result(job)  # no new readers
+        release_result(job)
+        assert job.result.closed
+    finally:
+        q.shutdown()
+
+
+def test_extract_endpoint_queues_and_serves_result(tables_pdf):
+    import app as web
+
+    client = web.app.test_client()
+    with open(tables_pdf, "rb") as f:
+        resp = client.post(
+            "/extract",
+            data={"pdf": (f, "report.pdf"), "mode": "tables"},
+            headers={"Accept": "application/json"},
+        )
+    assert resp.status_code == 202
+    data = resp.get_json()
+
+    deadline = time.time() + 30
+    while True:
+        status = client.get(data["status_url"]).get_json()
+        if status["status"] in (DONE, FAILED) or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert status["status"] == DONE, status
+    result = client.get(data["result_url"])
+    assert result.status_code == 200
+    assert "report.xlsx" in result.headers["Content-Disposition"]
+    assert result.data[:2] == b"PK"
+
+    assert client.get("/jobs/nope").status_code == 404
+
+
+def test_extract_rejects_non_pdf_as_json():
+    import app as web
+
+    client = web.app.test_client()
+    resp = client.post(
+        "/extract",
+        data={"pdf": (io.BytesIO(b"hi"), "notes.txt")},
+        headers={"Accept": "application/json"},
+    )
+    assert resp.status_code == 400
+    assert "PDF" in resp.get_json()["error"]
+
+
+def test_extract_endpoint_zip_format(tables_pdf):
+    import app as web
+
+    client = web.app.test_client()
+    with open(tables_pdf, "rb") as f:
+        data = client.post(
+            "/extract",
+            data={"pdf": (f, "report.pdf"), "mode": "tables", "format": "ndjson"},
+            headers={"Accept": "application/json"},
+        ).get_json()
+    deadline = time.time() + 30
+    while client.get(data["status_url"]).get_json()["status"] not in (DONE, FAILED) and time.time() < deadline:
+        time.sleep(0.05)
+    result = client.get(data["result_url"])
+    assert result.mimetype == "application/zip"
+    assert "report_ndjson.zip" in result.headers["Content-Disposition"]
+    assert "manifest.json" in zipfile.ZipFile(io.BytesIO(result.data)).namelist()
+
+
+def test_extract_endpoint_keeps_files_in_memory(tables_pdf, monkeypatch):
+    import tempfile
+
+    import app as web
+
+    def no_disk(*args, **kwargs):
+        raise AssertionError("request wrote a temp directory")
+
+    monkeypatch.setattr(tempfile, "mkdtemp", no_disk)
+    client = web.app.test_client()
+    with open(tables_pdf, "rb") as f:
+        data = client.post(
+            "/extract", data={"pdf": (f, "report.pdf"), "mode": "tables"}, headers={"Accept": "application/json"}
+        ).get_json()
+    job = wait_finished(web.job_queue, data["job_id"], timeout=30)
+    assert job.status == DONE, job.error
+    assert not isinstance(job.result, str) and not job.result._rolled
+    first, second = client.get(data["result_url"]), client.get(data["result_url"])
+    assert first.content_length == len(first.data) and first.data[:2] == b"PK"
+    assert second.data == first.data
+    first.close(), second.close()  # the downloads end, so expiry closes the result
+
+    files = job.files
+    monkeypatch.setattr(web.job_queue, "result_ttl", 0)
+    time.sleep(0.01)
+    assert client.get(data["status_url"]).status_code == 404
+    assert all(f.closed for f in files)
+
+
+def test_expiring_job_does_not_cut_off_a_running_download(monkeypatch):
+    import app as web
+
+    def convert(mode, query, pdf, out, fmt="xlsx"):
+        out.write(b"x" * 100_000)  # several send_file blocks
+        return out
+
+    monkeypatch.setattr(web, "_convert", convert)
+    client = web.app.test_client()
+    data = client.post(
+        "/extract", data={"pdf": (io.BytesIO(b"%PDF-1.4"), "r.pdf")}, headers={"Accept": "application/json"}
+    ).get_json()
+    job = wait_finished(web.job_queue, data["job_id"])
+    resp = client.get(data["result_url"], buffered=False)
+    blocks = iter(resp.response)
+    body = next(blocks)
+    monkeypatch.setattr(web.job_queue, "result_ttl", 0)
+    time.sleep(0.01)
+    web.job_queue.cleanup_expired()
+    assert all(f.closed for f in job.files if f is not job.result)
+    body += b"".join(blocks)  # the rest of the stream still reads
+    resp.close()
+    assert body == b"x" * 100_000
+    assert job.result.closed
@@ -0,0 +1,94 @@
+"""Tests for journal.py and resumable batches in run.py."""
+
+import json
+import shutil
+import sys
+
+import pytest
+
+import run
+from journal import BatchJournal, settings_key
+
+
+def test_completed_needs_same_file_settings_and_output(tmp_path):
+    pdf, out = tmp_path / "a.pdf", tmp_path / "a.xlsx"
+    pdf.write_bytes(b"%PDF v1")
+    out.write_bytes(b"xlsx")
+    key = settings_key(fmt="xlsx")
+    with BatchJournal(tmp_path / "j.jsonl", key) as journal:
+        journal.record(pdf, out, "failed", 1.0, "boom")
+        assert not journal.completed(pdf, out)
+        journal.record(pdf, out, "done", 2.0)
+        assert journal.completed(pdf, out)
+
+    # Reloaded from disk, a line cut short by a crash is ignored
+    with (tmp_path / "j.jsonl").open("a") as f:
+        f.write('{"input": "trunc')
+    journal = BatchJournal(tmp_path / "j.jsonl", key)
+    assert journal.completed(pdf, out)
+    assert not BatchJournal(tmp_path / "j.jsonl", settings_key(fmt="csv")).completed(pdf, out)
+    pdf.write_bytes(b"%PDF v2, changed")
+    assert not journal.completed(pdf, out)
+    journal.close()
+
+
+def _run(monkeypatch, *argv) -> int:
+    monkeypatch.setattr(sys, "argv", ["run.py", *argv])
+    return run.main()
+
+
+@pytest.fixture
+def batch_dir(make_tables_pdf, tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    for name in ("a.pdf", "c.pdf"):
+        shutil.copy(make_tables_pdf(name, pages=1), inbox / name)
+    (inbox / "b.pdf").write_bytes(b"broken")
+    return inbox
+
+
+def test_tables_stops_at_first_failure_by_default(batch_dir, tmp_path, monkeypatch, capsys):
+    journal = tmp_path / "j.jsonl"
+    assert _run(monkeypatch, "tables", str(batch_dir), "--journal", str(journal)) == 1
+    assert [json.loads(line)["status"] for line in journal.read_text().splitlines()] == ["done", "failed"]
+    assert not (batch_dir / "c.xlsx").exists()
+    assert "1 not run" in capsys.readouterr().out
+
+
+def test_tables_resume_does_only_remaining_work(batch_dir, tmp_path, monkeypatch, capsys):
+    journal = tmp_path / "j.jsonl"
+    assert _run(monkeypatch, "tables", str(batch_dir), "--journal", str(journal), "--continue-on-error") == 1
+    assert (batch_dir / "c.xlsx").exists()
+    assert "2 succeeded, 1 failed" in capsys.readouterr().out
+
+    calls = []
+    real = run.get_converter("tables")
+    monkeypatch.setattr(run, "get_converter", lambda name: lambda pdf, *a, **kw: calls.append(pdf) or real(pdf, *a, **kw))
+    (batch_dir / "b.pdf").unlink()
+    assert _run(monkeypatch, "tables", str(batch_dir), "--journal", str(journal), "--resume") == 0
+    assert calls == []
+    assert "0 succeeded, 0 failed, 2 already done" in capsys.readouterr().out
+
+
+def test_ask_resume_skips_done_pdfs(batch_dir, tmp_path, monkeypatch):
+    calls = []
+
+    def fake_extract(pdf, query, out, **kwargs):
+        calls.append(pdf)
+        if pdf.endswith("b.pdf"):
+            raise ValueError("bad PDF")
+        open(out, "w").close()
+        return out
+
+    monkeypatch.setattr(run, "get_converter", lambda name: fake_extract)
+    argv = ["ask", str(batch_dir), "totals", "--journal", str(tmp_path / "j.jsonl"), "--no-cache"]
+    assert _run(monkeypatch, *argv) == 1
+    assert len(calls) == 3
+    calls.clear()
+    assert _run(monkeypatch, *argv, "--resume") == 1
+    assert [p.rsplit("/", 1)[-1] for p in calls] == ["b.pdf"]
+    calls.clear()
+    # A different query is different work
+    argv[2] = "payroll"
+    _run(monkeypatch, *argv, "--resume")
+    assert len(calls) == 3
@@ -0,0 +1,80 @@
+"""Tests for metrics.py and the instrumented conversion paths."""
+
+import io
+import json
+
+import pytest
+
+import metrics
+from extract import extract_csv_from_response
+from tables_to_excel import pdf_tables_to_excel
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_renders_cumulative_buckets():
+    metrics.observe("pdf_excel_stage_seconds", 0.003, stage="open")
+    metrics.observe("pdf_excel_stage_seconds", 0.2, stage="open")
+    text = metrics.render_prometheus()
+    assert "# TYPE pdf_excel_stage_seconds histogram" in text
+    assert 'pdf_excel_stage_seconds_bucket{stage="open",le="0.001"} 0' in text
+    assert 'pdf_excel_stage_seconds_bucket{stage="open",le="0.005"} 1' in text
+    assert 'pdf_excel_stage_seconds_bucket{stage="open",le="0.25"} 2' in text
+    assert 'pdf_excel_stage_seconds_bucket{stage="open",le="+Inf"} 2' in text
+    assert 'pdf_excel_stage_seconds_count{stage="open"} 2' in text
+    assert 'pdf_excel_stage_seconds_sum{stage="open"} 0.203' in text
+
+
+def test_counters_and_json_log():
+    stream = io.StringIO()
+    metrics.enable_json_log(stream)
+    try:
+        metrics.inc("pdf_excel_tokens_total", 120, provider="anthropic", kind="input")
+        metrics.inc("pdf_excel_tokens_total", 0, provider="anthropic", kind="output")
+    finally:
+        metrics.log.handlers.clear()
+        metrics.log.setLevel("WARNING")
+    assert metrics.value("pdf_excel_tokens_total", provider="anthropic", kind="input") == 120
+    assert 'pdf_excel_tokens_total{kind="input",provider="anthropic"} 120' in metrics.render_prometheus()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0]) | {"ts": 0} == {"ts": 0, "metric": "pdf_excel_tokens_total", "value": 120, "provider": "anthropic", "kind": "input"}
+
+
+def test_tables_path_records_stages(tables_pdf, tmp_path):
+    pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "out.xlsx"))
+    assert metrics.value("pdf_excel_pages_total") == 3
+    assert metrics.value("pdf_excel_stage_seconds", stage="open") == 1
+    assert metrics.value("pdf_excel_stage_seconds", stage="extract_tables") == 3
+    assert metrics.value("pdf_excel_stage_seconds", stage="write_sheet") == 3
+    assert metrics.value("pdf_excel_stage_seconds", stage="save") == 1
+
+
+def test_worker_timings_reach_parent(make_tables_pdf, tmp_path):
+    pdf = make_tables_pdf("multi.pdf", pages=4)
+    pdf_tables_to_excel(str(pdf), str(tmp_path / "out.xlsx"), workers=2)
+    assert metrics.value("pdf_excel_stage_seconds", stage="extract_tables") == 4
+
+
+def test_parse_fallbacks_are_counted():
+    extract_csv_from_response("---BEGIN CSV---\na,b\n1,2\n---END CSV---")
+    extract_csv_from_response("```csv\na,b\n1,2\n```")
+    extract_csv_from_response("Here you go:\na,b\n1,2")
+    assert metrics.value("pdf_excel_parse_fallbacks_total", kind="markdown") == 1
+    assert metrics.value("pdf_excel_parse_fallbacks_total", kind="plain") == 1
+    assert metrics.value("pdf_excel_stage_seconds", stage="parse_csv") == 3
+
+
+def test_metrics_endpoint():
+    import app as web
+
+    metrics.inc("pdf_excel_pages_total", 5)
+    resp = web.app.test_client().get("/metrics")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    assert "pdf_excel_pages_total 5" in resp.get_data(as_text=True)
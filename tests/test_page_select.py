@@ -0,0 +1,53 @@
+"""Tests for page_select.py (query-aware page pruning before Ask AI)."""
+
+import io
+
+import pdfplumber
+
+from page_select import bm25_scores, prune_pdf, select_pages, tokenize
+
+
+def _text_pdf(path, page_texts):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(str(path), pagesize=letter)
+    for text in page_texts:
+        c.drawString(72, 720, text)
+        c.showPage()
+    c.save()
+    return path
+
+
+def test_bm25_prefers_matching_page():
+    docs = [tokenize("cover page annual report"), tokenize("payroll taxes january 2026"), tokenize("revenue by region")]
+    scores = bm25_scores(docs, tokenize("taxes for January"))
+    assert scores.index(max(scores)) == 1
+    assert scores[0] == scores[2] == 0
+
+
+def test_select_pages_adds_neighbours_within_budget():
+    scores = [0, 0, 0, 5, 0, 0, 0, 0, 0, 1]
+    assert select_pages(scores, page_budget=4, neighbors=1) == [2, 3, 4]
+
+
+def test_select_pages_falls_back_when_unclear():
+    assert select_pages([0.0] * 20, page_budget=5) is None  # nothing matches
+    assert select_pages([1.0] * 20, page_budget=5) is None  # everything matches equally
+    assert select_pages([1.0, 2.0], page_budget=5) is None  # already within budget
+
+
+def test_prune_pdf_keeps_relevant_pages(tmp_path):
+    texts = [f"Chapter {n} general narrative" for n in range(12)]
+    texts[7] = "Payroll taxes January 2026 withheld"
+    pdf = _text_pdf(tmp_path / "doc.pdf", texts)
+    data = prune_pdf(pdf, "payroll taxes for January", page_budget=3)
+    with pdfplumber.open(io.BytesIO(data)) as reduced:
+        pages = [p.extract_text() for p in reduced.pages]
+    assert len(pages) == 3
+    assert "Payroll taxes" in pages[1]
+
+
+def test_prune_pdf_whole_document_for_generic_query(tmp_path):
+    pdf = _text_pdf(tmp_path / "doc.pdf", [f"Chapter {n} general narrative" for n in range(12)])
+    assert prune_pdf(pdf, "unrelated question", page_budget=3) is None
@@ -0,0 +1,72 @@
+"""Tests for prescreen.py and page selection in tables_to_excel.py, against the synthetic corpus."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import pytest
+from openpyxl import load_workbook
+
+import metrics
+from make_sample_pdf import make_corpus
+from prescreen import page_indices, parse_pages, prescreen_pages, table_settings_for
+from tables_to_excel import pdf_tables_to_excel
+
+
+def _sheets(path) -> dict:
+    wb = load_workbook(path)
+    return {ws.title: list(ws.values) for ws in wb.worksheets}
+
+
+def test_parse_pages():
+    assert parse_pages("5-40, 72,90-") == [(5, 40), (72, 72), (90, None)]
+    assert page_indices(parse_pages("3,1-2,2"), 10) == [0, 1, 2]
+    assert page_indices(parse_pages("9-"), 10) == [8, 9]
+    for bad in ("a", "4-2", "0", ","):
+        with pytest.raises(ValueError):
+            parse_pages(bad)
+    with pytest.raises(ValueError, match="out of range"):
+        page_indices(parse_pages("11"), 10)
+
+
+def test_table_settings_profiles():
+    assert table_settings_for("lines") is None
+    assert table_settings_for("text", '{"snap_tolerance": 5}') == {"vertical_strategy": "text", "horizontal_strategy": "text", "snap_tolerance": 5}
+    with pytest.raises(ValueError):
+        table_settings_for("nope")
+    with pytest.raises(ValueError, match="JSON object"):
+        table_settings_for("lines", "[1]")
+
+
+# Corpus pages 3, 6, 9 are prose only; every other page has one table after a paragraph
+TABLE_PAGES = ["Page1", "Page2", "Page4", "Page5", "Page7", "Page8"]
+
+
+@pytest.mark.parametrize("style, profile", [("ruled", "lines"), ("ruled", "mixed"), ("whitespace", "text")])
+def test_prescreen_misses_no_table_pages(tmp_path, style, profile):
+    pdf = make_corpus(tmp_path / "c.pdf", pages=9, rows=6, cols=4, style=style, text=True, prose_every=3)
+    settings = table_settings_for(profile)
+    metrics.reset()
+    screened = _sheets(pdf_tables_to_excel(str(pdf), str(tmp_path / "a.xlsx"), table_settings=settings))
+    assert metrics.value("pdf_excel_pages_skipped_total") == 3
+    full = _sheets(pdf_tables_to_excel(str(pdf), str(tmp_path / "b.xlsx"), table_settings=settings, prescreen=False))
+    assert sorted(screened) == TABLE_PAGES
+    # The full search may "find" tables in prose with the text strategy; table pages are identical
+    assert {name: full[name] for name in screened} == screened
+
+
+def test_prescreen_follows_explicit_lines_and_overrides(tmp_path):
+    pdf = make_corpus(tmp_path / "c.pdf", pages=3, rows=6, cols=4, style="whitespace", text=True, prose_every=3)
+    # Explicit lines are added under every strategy: even the prose page may have a table
+    explicit = {"explicit_vertical_lines": [100, 300], "explicit_horizontal_lines": [100, 300]}
+    assert prescreen_pages(pdf, [0, 1, 2], table_settings_for("lines", explicit)) == [0, 1, 2]
+    assert prescreen_pages(pdf, [0, 1, 2], table_settings_for("text")) == [0, 1]
+    assert prescreen_pages(pdf, [0, 1, 2], table_settings_for("text", {"min_words_vertical": 50})) == []
+
+
+def test_pages_and_max_tables(make_tables_pdf, tmp_path):
+    pdf = make_tables_pdf("t.pdf", pages=6)
+    assert list(_sheets(pdf_tables_to_excel(str(pdf), str(tmp_path / "a.xlsx"), pages="2-3,6"))) == ["Page2", "Page3", "Page6"]
+    out = pdf_tables_to_excel(str(pdf), str(tmp_path / "b.xlsx"), pages="3-", max_tables=2, workers=2)
+    assert list(_sheets(out)) == ["Page3", "Page4"]
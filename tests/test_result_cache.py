@@ -0,0 +1,94 @@
+"""Tests for result_cache.py and the cached "Ask AI" path. No API calls."""
+
+import os
+import time
+
+import pytest
+
+import extract
+from result_cache import ResultCache, normalize_query
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4 fake")
+    return path
+
+
+def test_normalize_query():
+    assert normalize_query("  Taxes  for\nJanuary ") == "taxes for january"
+
+
+def test_key_depends_on_content_query_provider_model(pdf, tmp_path):
+    base = ResultCache.key(pdf, "taxes", "anthropic", "m1", "1")
+    assert ResultCache.key(pdf, " TAXES ", "anthropic", "m1", "1") == base
+    assert ResultCache.key(pdf, "payroll", "anthropic", "m1", "1") != base
+    assert ResultCache.key(pdf, "taxes", "gemini", "m1", "1") != base
+    assert ResultCache.key(pdf, "taxes", "anthropic", "m2", "1") != base
+    assert ResultCache.key(pdf, "taxes", "anthropic", "m1", "2") != base
+    other = tmp_path / "copy.pdf"
+    other.write_bytes(pdf.read_bytes())
+    assert ResultCache.key(other, "taxes", "anthropic", "m1", "1") == base
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = ResultCache(tmp_path / "c")
+    assert cache.get("k") is None
+    cache.put("k", "a,b\n1,2")
+    assert cache.get("k") == "a,b\n1,2"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = ResultCache(tmp_path / "c", max_age=60)
+    cache.put("k", "a\n1")
+    old = time.time() - 120
+    os.utime(cache.directory / "k.csv", (old, old))
+    assert cache.get("k") is None
+    assert not (cache.directory / "k.csv").exists()
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = ResultCache(tmp_path / "c", max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    now = time.time()
+    os.utime(cache.directory / "a.csv", (now - 100, now))
+    os.utime(cache.directory / "b.csv", (now - 200, now))
+    cache.put("c", "z" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+
+
+def test_extract_uses_cache_without_api_call(pdf, tmp_path, monkeypatch):
+    calls = []
+
+    def fake_extract_csv(pdf_path, user_query, *args):
+        calls.append(user_query)
+        return "col\nval"
+
+    monkeypatch.setattr(extract, "extract_csv", fake_extract_csv)
+    cache = ResultCache(tmp_path / "c")
+    for n in range(2):
+        extract.extract_pdf_to_excel(str(pdf), "Taxes", str(tmp_path / f"out{n}.xlsx"), api_key="k", cache=cache)
+    assert calls == ["Taxes"]
+    assert cache.stats()["hits"] == 1
+    assert (tmp_path / "out1.xlsx").exists()
+
+
+def test_error_answers_are_not_cached(pdf, tmp_path, monkeypatch):
+    calls = []
+
+    def fake_extract_csv(pdf_path, user_query, *args):
+        calls.append(user_query)
+        return "error\nNo matching data found"
+
+    monkeypatch.setattr(extract, "extract_csv", fake_extract_csv)
+    cache = ResultCache(tmp_path / "c")
+    for n in range(2):
+        extract.extract_pdf_to_excel(str(pdf), "Taxes", str(tmp_path / f"out{n}.xlsx"), api_key="k", cache=cache)
+    assert calls == ["Taxes", "Taxes"]
+    assert cache.stats()["entries"] == 0
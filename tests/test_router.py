@@ -0,0 +1,139 @@
+"""Tests for router.py (hedging and failover between providers) with scripted fake providers."""
+
+import threading
+import time
+
+import pytest
+from openpyxl import load_workbook
+
+import extract
+import extract_gemini
+from router import ProviderRouter, extract_pdf_to_excel
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code=503):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+
+
+class FakeProvider:
+    """fn(cancel) for ProviderRouter.race: answers after `delay` seconds unless cancelled first."""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name, self.delay, self.error = name, delay, error
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def __call__(self, cancel):
+        self.calls += 1
+        end = time.monotonic() + self.delay
+        while time.monotonic() < end:
+            if cancel.wait(0.005):
+                self.cancelled.set()
+                raise RuntimeError("cancelled")
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+
+def _race(router, *providers):
+    return router.race({(p.name, "m"): p for p in providers})
+
+
+def test_fast_primary_is_not_hedged():
+    a, b = FakeProvider("a", 0.01), FakeProvider("b")
+    assert _race(ProviderRouter(default_delay=1.0), a, b) == (("a", "m"), "a")
+    assert b.calls == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    a, b = FakeProvider("a", 2.0), FakeProvider("b", 0.05)
+    t0 = time.monotonic()
+    assert _race(ProviderRouter(default_delay=0.1), a, b)[1] == "b"
+    assert time.monotonic() - t0 < 0.5
+    assert a.cancelled.wait(1)
+
+
+def test_without_hedging_only_errors_fail_over():
+    a, b = FakeProvider("a", 0.3), FakeProvider("b")
+    router = ProviderRouter(default_delay=0.01)
+    assert router.race({("a", "m"): a, ("b", "m"): b}, hedge=False)[1] == "a"
+    assert b.calls == 0
+
+
+def test_hedge_delay_follows_p95():
+    router = ProviderRouter(default_delay=5.0, min_delay=0.0, min_samples=5)
+    assert router.hedge_delay("a", "m") == 5.0
+    for seconds in (0.1, 0.1, 0.1, 0.1, 0.2, 0.3):
+        router.stats("a", "m").record(seconds, ok=True)
+    assert router.hedge_delay("a", "m") == 0.3
+    assert router.stats("a", "m").quantile(0.5) == 0.1
+
+
+def test_overload_fails_over_at_once_and_demotes_provider():
+    router = ProviderRouter(default_delay=10.0)
+    a, b = FakeProvider("a", error=Overloaded(503)), FakeProvider("b", 0.01)
+    t0 = time.monotonic()
+    assert _race(router, a, b)[1] == "b"
+    assert time.monotonic() - t0 < 1
+    # "a" is cooling down: "b" goes first now
+    a.error = None
+    assert _race(router, a, b)[1] == "b"
+    assert a.calls == 1
+    assert router.rank([("a", "m"), ("b", "m")]) == [("b", "m"), ("a", "m")]
+
+
+def test_all_failing_raises_first_error():
+    a, b = FakeProvider("a", error=ValueError("no CSV")), FakeProvider("b", error=Overloaded(429))
+    with pytest.raises(ValueError, match="no CSV"):
+        _race(ProviderRouter(), a, b)
+
+
+def _fake_stream(delay, rows, closed):
+    def stream_text(pdf_path, queries, api_key, model, page_budget=None, sessions=None, client=None):
+        try:
+            time.sleep(delay)
+            yield "---BEGIN CSV---\nname,amount\n"
+            for row in rows:
+                time.sleep(0.01)
+                yield row + "\n"
+            yield "---END CSV---"
+        finally:
+            closed.set()
+
+    return stream_text
+
+
+def test_auto_converter_keeps_first_valid_csv(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "g")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "a")
+    gemini_closed, anthropic_closed = threading.Event(), threading.Event()
+    slow_rows = [f"gemini,{i}" for i in range(200)]
+    monkeypatch.setattr(extract_gemini, "stream_text", _fake_stream(0.3, slow_rows, gemini_closed))
+    monkeypatch.setattr(extract, "stream_text", _fake_stream(0.0, ["anthropic,1", "anthropic,2"], anthropic_closed))
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    seen = []
+
+    out = extract_pdf_to_excel(str(pdf), "amounts", str(tmp_path / "o.xlsx"), on_rows=seen.append, router=ProviderRouter(default_delay=0.05))
+    rows = list(load_workbook(out).active.iter_rows(values_only=True))
+    assert rows == [("name", "amount"), ("anthropic", 1), ("anthropic", 2)]
+    assert seen == [1, 2]
+    # The slow stream is closed once it next yields, long before its 200 rows
+    assert gemini_closed.wait(1)
+
+
+def test_auto_converter_with_one_key_uses_that_provider(tmp_path, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "a")
+    calls = []
+    monkeypatch.setattr(extract, "extract_pdf_to_excel", lambda *a, **kw: calls.append(a) or a[2])
+    assert extract_pdf_to_excel("doc.pdf", "q", "o.xlsx") == "o.xlsx"
+    assert len(calls) == 1
+
+
+def test_auto_converter_rejects_a_model(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "a")
+    with pytest.raises(ValueError, match="default model"):
+        extract_pdf_to_excel("doc.pdf", "q", "o.xlsx", model="claude-opus-4-20250514")
@@ -0,0 +1,57 @@
+"""Startup budget: run.py and app.py must not load backends they don't use."""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ("anthropic", "google.genai", "pdfplumber", "openpyxl", "pypdfium2")
+
+# Import time run.py may add on top of a bare interpreter for --version
+VERSION_BUDGET_S = 0.1
+
+
+def _loaded_after(code: str) -> list[str]:
+    """Heavy modules present in sys.modules after running code in a fresh interpreter."""
+    probe = f"{code}\nimport sys\nprint(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().splitlines()[-1].split(",") if m] if out.stdout.strip() else []
+
+
+def _best_wall(cmd: list[str], runs: int = 3) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def test_version_loads_no_backend():
+    assert _loaded_after("import run") == []
+
+
+def test_version_within_budget():
+    overhead = _best_wall([sys.executable, "run.py", "--version"]) - _best_wall([sys.executable, "-c", "pass"])
+    assert overhead < VERSION_BUDGET_S, f"run.py --version adds {overhead * 1000:.0f} ms over a bare interpreter"
+
+
+def test_tables_does_not_import_ai_sdks(tmp_path):
+    pdf = ROOT / "sample_report.pdf"
+    if not pdf.exists():
+        pytest.skip("sample_report.pdf not present")
+    loaded = _loaded_after(
+        "import sys, run\n"
+        f"sys.argv = ['run.py', 'tables', {str(pdf)!r}, '-o', {str(tmp_path / 'out.xlsx')!r}]\n"
+        "assert run.main() == 0"
+    )
+    assert "pdfplumber" in loaded
+    assert "anthropic" not in loaded and "google.genai" not in loaded
+
+
+def test_app_import_loads_no_backend():
+    assert _loaded_after("import app") == []
@@ -0,0 +1,123 @@
+"""Tests for tables_to_excel.py (offline table extraction)."""
+
+import io
+import json
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from tables_to_excel import _page_chunks, pdf_tables_to_excel
+
+
+def _sheets(path):
+    wb = load_workbook(path)
+    return [(ws.title, list(ws.iter_rows(values_only=True))) for ws in wb.worksheets]
+
+
+class TestPageChunks:
+    def test_covers_all_pages_in_order(self):
+        chunks = _page_chunks(list(range(10)), 2)
+        assert [p for chunk in chunks for p in chunk] == list(range(10))
+        assert len(chunks) > 1
+
+    def test_more_workers_than_pages(self):
+        assert _page_chunks([0, 1], 8) == [[0], [1]]
+
+    def test_selected_pages(self):
+        assert _page_chunks([2, 5, 9], 1) == [[2], [5], [9]]
+
+
+class TestPdfTablesToExcel:
+    def test_one_sheet_per_page_table(self, tables_pdf, tmp_path):
+        out = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "out.xlsx"))
+        sheets = _sheets(out)
+        assert [title for title, _ in sheets] == ["Page1", "Page2", "Page3"]
+        assert sheets[1][1][1] == ("Row 2a", 2)
+
+    def test_workers_match_serial_output(self, tables_pdf, tmp_path):
+        serial = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "serial.xlsx"))
+        parallel = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "parallel.xlsx"), workers=2)
+        assert _sheets(parallel) == _sheets(serial)
+
+    def test_in_memory_input_and_output(self, tables_pdf, tmp_path):
+        expected = _sheets(pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "out.xlsx")))
+        for source in (tables_pdf.read_bytes(), io.BytesIO(tables_pdf.read_bytes())):
+            out = io.BytesIO()
+            assert pdf_tables_to_excel(source, out, workers=2) is out
+            assert _sheets(io.BytesIO(out.getvalue())) == expected
+
+    def test_low_memory_matches_default_output(self, tables_pdf, tmp_path):
+        default = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "default.xlsx"))
+        low = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "low.xlsx"), low_memory=True)
+        assert _sheets(low) == _sheets(default)
+
+
+class TestIncremental:
+    def test_unchanged_pages_reuse_cache(self, tables_pdf, tmp_path, monkeypatch):
+        from page_cache import PageTableCache
+        cache = PageTableCache(tmp_path / "pages")
+        first = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "a.xlsx"), page_cache=cache)
+        assert cache.stats()["entries"] == 3
+
+        def fail(*args, **kwargs):
+            raise AssertionError("extract_tables should not run for cached pages")
+
+        monkeypatch.setattr("pdfplumber.page.Page.extract_tables", fail)
+        second = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "b.xlsx"), page_cache=cache)
+        assert _sheets(second) == _sheets(first)
+
+    def test_changed_page_is_re_extracted(self, make_tables_pdf, tmp_path):
+        from page_cache import PageTableCache
+        cache = PageTableCache(tmp_path / "pages")
+        pdf_tables_to_excel(str(make_tables_pdf("v1.pdf", pages=2)), str(tmp_path / "a.xlsx"), page_cache=cache)
+        out = pdf_tables_to_excel(str(make_tables_pdf("v2.pdf", pages=3)), str(tmp_path / "b.xlsx"), page_cache=cache)
+        assert cache.hits == 2
+        assert [title for title, _ in _sheets(out)] == ["Page1", "Page2", "Page3"]
+
+    def test_table_settings_are_part_of_fingerprint(self, tables_pdf):
+        import pdfplumber
+        from page_cache import page_fingerprint
+        with pdfplumber.open(tables_pdf) as pdf:
+            page = pdf.pages[0]
+            assert page_fingerprint(page) != page_fingerprint(page, {"vertical_strategy": "text"})
+            assert page_fingerprint(page) != page_fingerprint(pdf.pages[1])
+
+    def test_fingerprint_follows_form_xobjects(self, tmp_path):
+        import pdfplumber
+        from reportlab.pdfgen import canvas
+        from page_cache import page_fingerprint
+
+        def fingerprint(label):
+            # The page itself only draws "/table Do"; the edit is inside the form
+            path = tmp_path / f"{label}.pdf"
+            c = canvas.Canvas(str(path))
+            c.beginForm("table")
+            c.drawString(100, 700, label)
+            c.endForm()
+            c.doForm("table")
+            c.save()
+            with pdfplumber.open(path) as pdf:
+                return page_fingerprint(pdf.pages[0])
+
+        assert fingerprint("Qty 1") != fingerprint("Qty 2")
+
+
+def test_csv_format_writes_one_file_per_table(tables_pdf, tmp_path):
+    out = pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "out"), fmt="csv")
+    manifest = json.loads((Path(out) / "manifest.json").read_text())
+    assert [t["file"] for t in manifest["tables"]] == ["Page1.csv", "Page2.csv", "Page3.csv"]
+    assert (Path(out) / "Page2.csv").read_text().splitlines()[1] == "Row 2a,2"
+
+
+def test_unreadable_pdf_is_closed_and_writes_nothing(tables_pdf, tmp_path, monkeypatch):
+    import pdfplumber
+    import pytest
+
+    closed = []
+    close = pdfplumber.PDF.close
+    monkeypatch.setattr(pdfplumber.PDF, "close", lambda self: closed.append(self) or close(self))
+    monkeypatch.setattr(pdfplumber.PDF, "pages", property(lambda self: 1 / 0))  # a corrupt page tree
+    with pytest.raises(ZeroDivisionError):
+        pdf_tables_to_excel(str(tables_pdf), str(tmp_path / "out.xlsx"))
+    assert len(closed) == 1
+    assert not (tmp_path / "out.xlsx").exists()
@@ -0,0 +1,96 @@
+"""Tests for watch.py (hot folder and its SQLite manifest)."""
+
+import os
+import shutil
+
+from openpyxl import load_workbook
+
+from watch import HotFolder, Manifest
+
+
+def _folder(directory, **kwargs) -> HotFolder:
+    kwargs.setdefault("options", {"fmt": "xlsx"})
+    return HotFolder(directory, processes=False, settle=0, poll=True, **kwargs)
+
+
+def test_converts_new_and_changed_files_only(make_tables_pdf, tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    shutil.copy(make_tables_pdf("a.pdf", pages=2), inbox / "a.pdf")
+    shutil.copy(make_tables_pdf("b.pdf", pages=1), inbox / "b.pdf")
+    (inbox / "notes.txt").write_text("not a pdf")
+
+    assert _folder(inbox).run(once=True) == {"converted": 2, "failed": 0, "unchanged": 0}
+    assert load_workbook(inbox / "a.xlsx").sheetnames == ["Page1", "Page2"]
+    # Restart: nothing changed, nothing is read
+    assert _folder(inbox).run(once=True) == {"converted": 0, "failed": 0, "unchanged": 0}
+
+    # Touched but same content: hashed once, not converted
+    st = os.stat(inbox / "b.pdf")
+    os.utime(inbox / "b.pdf", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert _folder(inbox).run(once=True) == {"converted": 0, "failed": 0, "unchanged": 1}
+    assert _folder(inbox).run(once=True)["unchanged"] == 0
+
+    # New content
+    shutil.copy(make_tables_pdf("b2.pdf", pages=3), inbox / "b.pdf")
+    assert _folder(inbox).run(once=True)["converted"] == 1
+    assert load_workbook(inbox / "b.xlsx").sheetnames == ["Page1", "Page2", "Page3"]
+
+    # Different settings convert everything again
+    assert _folder(inbox, options={"fmt": "xlsx", "infer_types": False}).run(once=True)["converted"] == 2
+
+
+def test_output_dir_mirrors_layout_and_failures_are_not_retried(make_tables_pdf, tmp_path):
+    inbox = tmp_path / "inbox"
+    (inbox / "sub").mkdir(parents=True)
+    shutil.copy(make_tables_pdf("a.pdf", pages=1), inbox / "sub" / "a.pdf")
+    (inbox / "broken.pdf").write_bytes(b"not really a pdf")
+    out = tmp_path / "out"
+
+    counts = _folder(inbox, output_dir=out, recursive=True).run(once=True)
+    assert counts == {"converted": 1, "failed": 1, "unchanged": 0}
+    assert (out / "sub" / "a.xlsx").exists()
+    assert _folder(inbox, output_dir=out, recursive=True).run(once=True) == {"converted": 0, "failed": 0, "unchanged": 0}
+
+    manifest = Manifest(inbox / ".pdf-excel-manifest.sqlite")
+    assert manifest.get(str(inbox / "broken.pdf"))["status"] == "failed"
+    (inbox / "broken.pdf").unlink()
+    manifest.close()
+    _folder(inbox, output_dir=out, recursive=True).run(once=True)
+    manifest = Manifest(inbox / ".pdf-excel-manifest.sqlite")
+    assert manifest.get(str(inbox / "broken.pdf")) is None
+    manifest.close()
+
+
+def test_unreadable_file_is_skipped_not_fatal(make_tables_pdf, tmp_path, monkeypatch):
+    import watch
+
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    shutil.copy(make_tables_pdf("a.pdf", pages=1), inbox / "a.pdf")
+    (inbox / "gone.pdf").write_bytes(b"%PDF-1.4")
+    real_sha256 = watch.file_sha256
+
+    def file_sha256(path):
+        if path.name == "gone.pdf":
+            raise FileNotFoundError(path)  # removed between settling and hashing
+        return real_sha256(path)
+
+    monkeypatch.setattr(watch, "file_sha256", file_sha256)
+    assert _folder(inbox).run(once=True) == {"converted": 1, "failed": 0, "unchanged": 0}
+
+
+def test_waits_for_file_to_settle(tmp_path):
+    folder = _folder(tmp_path)
+    folder.settle = 2.0
+    pdf = tmp_path / "incoming.pdf"
+    pdf.write_bytes(b"%PDF-1.4 partial")
+    now = os.stat(pdf).st_mtime
+    folder.note(pdf, now)
+    assert not folder._settled(str(pdf), now + 1)
+    with open(pdf, "ab") as f:
+        f.write(b" more")
+    assert not folder._settled(str(pdf), now + 2.5)  # grew: the clock restarts
+    assert not folder._settled(str(pdf), now + 4)
+    assert folder._settled(str(pdf), now + 4.5)
+    folder.manifest.close()
@@ -0,0 +1,199 @@
+"""Tests for writers.py (streaming table writers)."""
+
+import csv
+import io
+import json
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+import writers
+from writers import XlsxWriter, open_writer, safe_sheet_title
+
+
+def test_repeated_sheet_titles_stay_within_the_limit(tmp_path):
+    from openpyxl import load_workbook
+
+    title = "Total revenue for the fiscal year 2026"
+    with XlsxWriter(tmp_path / "t.xlsx") as w:
+        for t in (title, title, title.upper()):
+            w.write_sheet(t, [["a"]])
+    names = load_workbook(tmp_path / "t.xlsx").sheetnames
+    assert names == [title[:31], title[:29] + "_2", title.upper()[:29] + "_3"]
+
+
+def test_safe_sheet_title():
+    assert safe_sheet_title("a/b[c]*?") == "abc"
+    assert len(safe_sheet_title("x" * 40)) == 31
+    assert safe_sheet_title("[]", "Sheet3") == "Sheet3"
+
+
+def test_xlsx_writer_streams_sheets(tmp_path):
+    out = tmp_path / "sub" / "out.xlsx"
+    with XlsxWriter(out) as w:
+        assert w.write_sheet("One", ([i, str(i)] for i in range(3))) == 3
+        sheet = w.new_sheet("Two")
+        sheet.append(["x"])
+    wb = load_workbook(out)
+    assert wb.sheetnames == ["One", "Two"]
+    assert list(wb["One"].iter_rows(values_only=True))[2] == (2, "2")
+
+
+def test_xlsx_writer_not_saved_on_error(tmp_path):
+    out = tmp_path / "out.xlsx"
+    with pytest.raises(RuntimeError):
+        with XlsxWriter(out) as w:
+            w.write_sheet("One", [["a"]])
+            raise RuntimeError("boom")
+    assert not out.exists()
+
+
+def test_csv_writer_directory_with_manifest(tmp_path):
+    out = tmp_path / "export"
+    with open_writer(out, "csv") as w:
+        w.write_sheet("Page1", [["Item", "Qty"], ["a", 1], ["b", None]])
+        w.write_sheet("Page/1", [["x"]])
+    manifest = json.loads((out / "manifest.json").read_text())
+    assert manifest["format"] == "csv"
+    assert [t["file"] for t in manifest["tables"]] == ["Page1.csv", "Page_1.csv"]
+    assert manifest["tables"][0] | {"file": None} == {"name": "Page1", "file": None, "rows": 2, "columns": ["Item", "Qty"]}
+    with open(out / "Page1.csv", newline="") as f:
+        assert list(csv.reader(f)) == [["Item", "Qty"], ["a", "1"], ["b", ""]]
+
+
+def test_ndjson_rows_keyed_by_header(tmp_path):
+    with open_writer(tmp_path / "nd", "ndjson") as w:
+        w.write_sheet("T", [["Name", "", "Name"], ["a", "b", "c", "extra"]])
+    line = (tmp_path / "nd" / "T.ndjson").read_text().splitlines()[0]
+    assert json.loads(line) == {"Name": "a", "col2": "b", "Name_2": "c", "col4": "extra"}
+
+
+def test_parquet_zip(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(writers, "PARQUET_BATCH_ROWS", 2)
+    out = tmp_path / "out.zip"
+    with writers.open_writer(out, "parquet") as w:
+        w.write_sheet("Sales", [["Month", "Total"]] + [[f"m{i}", str(i)] for i in range(5)] + [["short"]])
+    with zipfile.ZipFile(out) as zf:
+        assert sorted(zf.namelist()) == ["Sales.parquet", "manifest.json"]
+        table = pq.read_table(io.BytesIO(zf.read("Sales.parquet")))
+    assert table.num_rows == 6
+    assert table.column("Total").to_pylist()[-2:] == ["4", None]
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".export-")]
+
+
+def test_parquet_widens_for_extra_cells(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    with open_writer(tmp_path / "pq", "parquet") as w:
+        w.write_sheet("T", [["a", "b"], ["1", "2", "3"], ["4"]])
+    table = pq.read_table(tmp_path / "pq" / "T.parquet")
+    assert table.to_pydict() == {"a": ["1", "4"], "b": ["2", None], "col3": ["3", None]}
+    assert json.loads((tmp_path / "pq" / "manifest.json").read_text())["tables"][0]["columns"] == ["a", "b", "col3"]
+
+    monkeypatch.setattr(writers, "PARQUET_BATCH_ROWS", 1)
+    with pytest.raises(ValueError, match="3 cells"), open_writer(tmp_path / "pq2", "parquet") as w:
+        w.write_sheet("T", [["a", "b"], ["1", "2"], ["1", "2", "3"]])
+
+
+def test_directory_output_is_only_replaced_if_an_export(tmp_path):
+    other = tmp_path / "mine"
+    other.mkdir()
+    (other / "notes.txt").write_text("keep")
+    with pytest.raises(FileExistsError):
+        open_writer(other, "csv")
+    assert (other / "notes.txt").exists()
+
+    out = tmp_path / "export"
+    for _ in range(2):
+        with open_writer(out, "csv") as w:
+            w.write_sheet("T", [["a"]])
+    assert sorted(p.name for p in out.iterdir()) == ["T.csv", "manifest.json"]
+
+    with pytest.raises(RuntimeError), open_writer(out, "csv") as w:
+        w.write_sheet("U", [["b"]])
+        raise RuntimeError("conversion failed")
+    assert sorted(p.name for p in out.iterdir()) == ["T.csv", "manifest.json"]  # the last good export
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["export", "mine"]
+
+    with pytest.raises(ValueError):
+        open_writer(tmp_path / "x", "xml")
+
+
+def _typed_table():
+    from columns import ColumnTable
+
+    return ColumnTable.from_rows([
+        ["Date", "Amount", "Share", "Note"],
+        ["2026-01-31", "1,234.50", "12.5%", "a"],
+        ["2026-02-28", "(20.00)", "—", ""],
+    ])
+
+
+def test_xlsx_write_table_typed_cells(tmp_path):
+    import datetime
+
+    out = tmp_path / "out.xlsx"
+    with XlsxWriter(out) as w:
+        assert w.write_table("T", _typed_table()) == 3
+    ws = load_workbook(out)["T"]
+    rows = list(ws.iter_rows(min_row=2, values_only=True))
+    assert rows[0] == (datetime.datetime(2026, 1, 31), 1234.5, 0.125, "a")
+    assert rows[1][1:3] == (-20.0, None)
+    assert (ws["A2"].number_format, ws["B2"].number_format, ws["C2"].number_format) == ("yyyy-mm-dd", "#,##0.00", "0.0%")
+
+
+def test_parquet_and_ndjson_write_table_typed(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    with open_writer(tmp_path / "pq", "parquet") as w:
+        w.write_table("T", _typed_table())
+    table = pq.read_table(tmp_path / "pq" / "T.parquet")
+    assert [str(f.type) for f in table.schema] == ["date32[day]", "double", "double", "string"]
+    assert table.column("Share").to_pylist() == [0.125, None]
+    manifest = json.loads((tmp_path / "pq" / "manifest.json").read_text())
+    assert manifest["tables"][0]["types"] == ["date", "float", "percent", "text"]
+
+    with open_writer(tmp_path / "nd", "ndjson") as w:
+        w.write_table("T", _typed_table())
+    first, second = map(json.loads, (tmp_path / "nd" / "T.ndjson").read_text().splitlines())
+    assert first == {"Date": "2026-01-31", "Amount": 1234.5, "Share": 0.125, "Note": "a"}
+    assert second["Share"] is None
+
+
+def test_percents_are_written_without_float_noise(tmp_path):
+    from columns import ColumnTable
+
+    table = ColumnTable.from_rows([["Rate"], ["1.1%"], ["17.6%"], ["0.07%"]])
+    with open_writer(tmp_path / "csv", "csv") as w:
+        w.write_table("T", table)
+    assert (tmp_path / "csv" / "T.csv").read_text().splitlines() == ["Rate", "0.011", "0.176", "0.0007"]
+    with open_writer(tmp_path / "nd", "ndjson") as w:
+        w.write_table("T", table)
+    assert (tmp_path / "nd" / "T.ndjson").read_text().splitlines() == ['{"Rate": 0.011}', '{"Rate": 0.176}', '{"Rate": 0.0007}']
+
+
+def test_writers_accept_file_objects(tmp_path):
+    buf = io.BytesIO()
+    with open_writer(buf, "xlsx") as w:
+        w.write_sheet("One", [["a", "b"], [1, 2]])
+    assert w.path is None
+    assert load_workbook(io.BytesIO(buf.getvalue())).sheetnames == ["One"]
+
+    buf = io.BytesIO()
+    with open_writer(buf, "csv") as w:
+        w.write_sheet("T", [["x", "y"], ["1", "2"]])
+    with zipfile.ZipFile(buf) as zf:
+        assert sorted(zf.namelist()) == ["T.csv", "manifest.json"]
+        assert zf.read("T.csv").decode().splitlines() == ["x,y", "1,2"]
+        assert json.loads(zf.read("manifest.json"))["tables"][0]["rows"] == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_aborted_zip_leaves_file_object_unchanged():
+    buf = io.BytesIO(b"keep")
+    buf.seek(0, io.SEEK_END)
+    with pytest.raises(RuntimeError):
+        with open_writer(buf, "ndjson") as w:
+            w.write_sheet("T", [["a"], ["1"]])
+            raise RuntimeError("boom")
+    assert buf.getvalue() == b"keep"
@@ -0,0 +1,308 @@
+"""
+Hot folder: convert PDFs as they appear or change in a directory.
+
+HotFolder watches a directory with filesystem events (watchdog, if installed) or by polling,
+and converts new or changed PDFs with pdf_tables_to_excel on a bounded worker pool. A file is
+picked up once its size and mtime have been still for `settle` seconds, so half-copied files
+are not read.
+
+What was converted is kept in a SQLite manifest (path, size, mtime, SHA-256, settings, output,
+status). A file whose size, mtime, settings and output path match a finished entry is skipped
+without being read, so a restart does not re-hash the folder; a file whose mtime changed is
+hashed and only converted if its content differs. Failed files are retried only after their
+content or the settings change.
+"""
+
+import json
+import logging
+import os
+import queue
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from ingest import file_sha256
+from writers import default_output
+
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".pdf-excel-manifest.sqlite"
+
+DONE, FAILED = "done", "failed"
+
+
+class Manifest:
+    """SQLite record of converted files, keyed by absolute path."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT,"
+            " settings TEXT, output TEXT, status TEXT, error TEXT, updated REAL)"
+        )
+        self._db.commit()
+
+    def get(self, path: str) -> dict | None:
+        row = self._db.execute(
+            "SELECT size, mtime_ns, sha256, settings, output, status, error FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("size", "mtime_ns", "sha256", "settings", "output", "status", "error"), row))
+
+    def record(self, path: str, size: int, mtime_ns: int, sha256: str, settings: str, output: str, status: str, error: str | None = None) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, sha256, settings, output, status, error, time.time()),
+        )
+        self._db.commit()
+
+    def forget(self, path: str) -> None:
+        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self._db.commit()
+
+    def paths(self) -> list[str]:
+        return [r[0] for r in self._db.execute("SELECT path FROM files")]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _convert(pdf_path: str, out_path: str, options: dict) -> str:
+    """Worker: one conversion (module-level so process pools can pickle it)."""
+    from providers import get_converter
+
+    pdf_tables_to_excel = get_converter("tables")
+    logging.getLogger("tables_to_excel").setLevel(logging.WARNING)  # no per-page lines in the daemon log
+    return pdf_tables_to_excel(pdf_path, out_path, overwrite=True, **options)
+
+
+def _init_worker() -> None:
+    """Worker processes leave Ctrl+C to the daemon, which finishes running conversions and exits."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+@dataclass
+class _Pending:
+    size: int
+    mtime_ns: int
+    changed: float  # when size/mtime were last seen to change
+
+
+class HotFolder:
+    """
+    Convert PDFs in directory (and subdirectories with recursive) as they arrive or change.
+    options are passed to pdf_tables_to_excel (fmt, infer_types, table_settings, prescreen, ...).
+    Outputs go next to each PDF, or mirror the folder layout under output_dir.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        options: dict | None = None,
+        output_dir: str | Path | None = None,
+        manifest: str | Path | None = None,
+        workers: int = 2,
+        settle: float = 2.0,
+        interval: float = 5.0,
+        recursive: bool = False,
+        processes: bool = True,
+        poll: bool = False,
+    ):
+        self.directory = Path(directory).resolve()
+        if not self.directory.is_dir():
+            raise FileNotFoundError(f"Not a directory: {directory}")
+        self.options = dict(options or {})
+        self.output_dir = Path(output_dir).resolve() if output_dir else None
+        self.manifest = Manifest(manifest or self.directory / MANIFEST_NAME)
+        self.workers = max(1, workers)
+        self.settle = settle
+        self.interval = interval
+        self.recursive = recursive
+        self.processes = processes
+        self.poll = poll
+        self._settings = json.dumps(self.options, sort_keys=True, default=str)
+        self._pending: dict[str, _Pending] = {}
+        self._running: set[str] = set()
+        self._events: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self.counts = {"converted": 0, "failed": 0, "unchanged": 0}
+
+    def output_for(self, pdf: Path) -> Path:
+        fmt = self.options.get("fmt", "xlsx")
+        if self.output_dir is None:
+            return default_output(pdf, fmt)
+        return default_output(self.output_dir / pdf.relative_to(self.directory), fmt)
+
+    def _is_candidate(self, path: Path) -> bool:
+        return path.suffix.lower() == ".pdf" and not path.name.startswith((".", "~$"))
+
+    def scan(self) -> list[Path]:
+        """PDFs currently in the folder."""
+        pattern = "**/*" if self.recursive else "*"
+        return [p for p in self.directory.glob(pattern) if self._is_candidate(p) and p.is_file()]
+
+    def note(self, path: Path, now: float | None = None) -> None:
+        """Look at one path (from a scan or an event); queue it if new or changed."""
+        now = time.time() if now is None else now
+        key = str(path)
+        if key in self._running:
+            return  # looked at again after it finishes
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._pending.pop(key, None)
+            return
+        entry = self._pending.get(key)
+        if entry is not None:
+            if (entry.size, entry.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                self._pending[key] = _Pending(st.st_size, st.st_mtime_ns, now)
+            return
+        row = self.manifest.get(key)
+        if (
+            row is not None
+            and (row["size"], row["mtime_ns"], row["settings"]) == (st.st_size, st.st_mtime_ns, self._settings)
+            and row["output"] == str(self.output_for(path))
+            and (row["status"] == FAILED or Path(row["output"]).exists())
+        ):
+            return
+        # A file is settled once it has been unchanged for `settle` seconds; an old mtime counts
+        self._pending[key] = _Pending(st.st_size, st.st_mtime_ns, min(now, st.st_mtime_ns / 1e9))
+
+    def _settled(self, key: str, now: float) -> bool:
+        entry = self._pending[key]
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            del self._pending[key]
+            return False
+        if (entry.size, entry.mtime_ns) != (st.st_size, st.st_mtime_ns):
+            self._pending[key] = _Pending(st.st_size, st.st_mtime_ns, now)
+            return False
+        return now - entry.changed >= self.settle
+
+    def _start(self, key: str, pool, running: dict) -> None:
+        """Hash a settled file; submit it unless the manifest already has this content and settings."""
+        entry = self._pending.pop(key)
+        path = Path(key)
+        out = str(self.output_for(path))
+        try:
+            sha = file_sha256(path)
+        except OSError as e:
+            # Deleted, moved or locked since it settled: the next scan picks it up again if it is back
+            log.warning("Skipping %s for now: %s", path.relative_to(self.directory), e)
+            return
+        row = self.manifest.get(key)
+        if row is not None and (row["sha256"], row["settings"], row["output"]) == (sha, self._settings, out):
+            if row["status"] == FAILED or Path(out).exists():
+                # Touched but not changed: remember the new mtime so it isn't hashed again
+                self.manifest.record(key, entry.size, entry.mtime_ns, sha, self._settings, out, row["status"], row["error"])
+                self.counts["unchanged"] += 1
+                return
+        log.info("Converting %s", path.relative_to(self.directory))
+        future = pool.submit(_convert, key, out, self.options)
+        running[future] = (key, entry, sha, out)
+        self._running.add(key)
+
+    def _finish(self, future, running: dict) -> None:
+        key, entry, sha, out = running.pop(future)
+        self._running.discard(key)
+        name = Path(key).relative_to(self.directory)
+        try:
+            future.result()
+        except Exception as e:
+            log.warning("Failed: %s: %s", name, e)
+            self.manifest.record(key, entry.size, entry.mtime_ns, sha, self._settings, out, FAILED, str(e))
+            self.counts["failed"] += 1
+            return
+        log.info("Saved: %s", out)
+        self.manifest.record(key, entry.size, entry.mtime_ns, sha, self._settings, out, DONE)
+        self.counts["converted"] += 1
+
+    def _forget_missing(self) -> None:
+        for key in self.manifest.paths():
+            if not os.path.exists(key):
+                self.manifest.forget(key)
+
+    def _watch_events(self):
+        """Start a watchdog observer feeding self._events, or return None to poll."""
+        if self.poll:
+            return None
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            log.info("watchdog not installed; polling every %.0f s", self.interval)
+            return None
+
+        events = self._events
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    events.put(Path(getattr(event, "dest_path", "") or event.src_path))
+
+        observer = Observer()
+        observer.schedule(Handler(), str(self.directory), recursive=self.recursive)
+        observer.start()
+        return observer
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self, once: bool = False) -> dict:
+        """
+        Watch until stop() (or Ctrl+C). With once, convert what is new or changed now and return.
+        Returns counts of converted, failed and unchanged files.
+        """
+        observer = None if once else self._watch_events()
+        pool = ProcessPoolExecutor(self.workers, initializer=_init_worker) if self.processes else ThreadPoolExecutor(self.workers)
+        running: dict = {}
+        next_scan = 0.0
+        self._forget_missing()
+        try:
+            while not self._stop.is_set():
+                now = time.time()
+                # With events, a periodic full scan still catches anything the observer missed
+                if now >= next_scan:
+                    for path in self.scan():
+                        self.note(path, now)
+                    next_scan = now + (self.interval if observer is None else max(self.interval, 60.0))
+                while True:
+                    try:
+                        path = self._events.get_nowait()
+                    except queue.Empty:
+                        break
+                    if self._is_candidate(path):
+                        self.note(path, now)
+                for key in list(self._pending):
+                    if len(running) >= self.workers:
+                        break
+                    if self._settled(key, now):
+                        self._start(key, pool, running)
+                if once and not running and not self._pending:
+                    break
+                if running:
+                    done, _ = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._finish(future, running)
+                else:
+                    self._stop.wait(0.2 if (once or self._pending) else min(self.interval, 1.0))
+        except KeyboardInterrupt:
+            log.info("Stopping…")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            for future in wait(running).done:
+                self._finish(future, running)
+            pool.shutdown()
+            self.manifest.close()
+        return dict(self.counts)
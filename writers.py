@@ -0,0 +1,499 @@
+"""
+Table writers shared by the offline (tables_to_excel.py) and AI (extract.py) paths.
+
+Both paths produce "sheets of rows". A writer takes those rows as they are produced and
+streams them to disk, so memory stays flat however many sheets or rows the export has.
+write_table() takes a typed ColumnTable (columns.py) instead: numbers and dates are written as
+real values, with Excel number formats, JSON numbers and typed Parquet columns.
+
+xlsx goes to one workbook. csv, ndjson and parquet write one file per table into a directory,
+or a .zip when the output path ends in .zip, with a manifest.json listing the tables; they
+never build Excel cell objects, and downstream loaders can read them without parsing xlsx.
+
+Instead of a path, a writer takes any writable binary file object (a BytesIO, a spooled temp
+file, a response buffer): xlsx is saved into it and the other formats are written into it
+as that zip, each table going straight into its zip entry.
+"""
+
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import uuid
+import zipfile
+from pathlib import Path
+
+import metrics
+
+FORMATS = ("xlsx", "csv", "ndjson", "parquet")
+
+MANIFEST = "manifest.json"
+
+# Rows buffered per Parquet row group
+PARQUET_BATCH_ROWS = 10_000
+
+# Characters Excel does not allow in sheet titles
+_INVALID_TITLE_CHARS = "\\/*?[]:"
+
+
+def safe_sheet_title(name: str, fallback: str = "Sheet") -> str:
+    """Strip characters Excel rejects and cut to Excel's 31-char limit."""
+    for ch in _INVALID_TITLE_CHARS:
+        name = name.replace(ch, "")
+    return name[:31] or fallback
+
+
+class TableWriter:
+    """
+    Interface for writing sheets of rows. Use as a context manager: rows are written as
+    they are appended and the output is finalized on a clean exit.
+
+        with XlsxWriter("out.xlsx") as w:
+            w.write_sheet("Page1", rows)
+
+    path may be a writable binary file object instead; then self.path is None, self.stream is
+    the file, and the output is written to it from its current position (it is left open).
+    """
+
+    def __init__(self, path):
+        if isinstance(path, (str, os.PathLike)):
+            self.path, self.stream = Path(path), None
+        else:
+            self.path, self.stream = None, path
+        self.sheet_count = 0
+
+    def new_sheet(self, title: str):
+        """Start a new sheet; returns an object with append(row)."""
+        raise NotImplementedError
+
+    def write_sheet(self, title: str, rows) -> int:
+        """Write all rows to a new sheet. Returns the number of rows written."""
+        with metrics.timer("write_sheet"):
+            sheet = self.new_sheet(title)
+            n = 0
+            for row in rows:
+                sheet.append(row)
+                n += 1
+        return n
+
+    def write_table(self, title: str, table) -> int:
+        """Write a ColumnTable (header + typed rows) to a new sheet. Returns the number of rows written."""
+        return self.write_sheet(title, itertools.chain([table.header], table.rows()))
+
+    def start_table(self, title: str, table):
+        """
+        Write a ColumnTable to a new sheet and return the sheet, so later rows (Python values,
+        e.g. from table.typed_rows()) can be appended as they arrive. Parquet stores such a
+        table as strings: its schema can't change when a later cell stays text.
+        """
+        with metrics.timer("write_sheet"):
+            sheet = self.new_sheet(title)
+            for row in itertools.chain([table.header], table.rows()):
+                sheet.append(row)
+        return sheet
+
+    def close(self) -> None:
+        """Finalize the output file."""
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        """Drop anything written so far without producing output."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only finalize on success; a half-written export is not saved
+        if exc_type is None:
+            with metrics.timer("save"):
+                self.close()
+        else:
+            self.abort()
+        return False
+
+
+class XlsxWriter(TableWriter):
+    """Excel writer using openpyxl write-only mode (rows go to temp files, not cell objects)."""
+
+    def __init__(self, path):
+        from openpyxl import Workbook
+
+        super().__init__(path)
+        self._wb = Workbook(write_only=True)
+        self._titles = set()
+
+    def new_sheet(self, title: str):
+        self.sheet_count += 1
+        base = title = safe_sheet_title(title, f"Sheet{self.sheet_count}")
+        n = 1
+        # Excel compares titles case-insensitively; number repeats within the 31-char limit
+        while title.lower() in self._titles:
+            n += 1
+            suffix = f"_{n}"
+            title = base[: 31 - len(suffix)] + suffix
+        self._titles.add(title.lower())
+        return self._wb.create_sheet(title=title)
+
+    def write_table(self, title: str, table) -> int:
+        self.start_table(title, table)
+        return table.nrows + 1
+
+    def start_table(self, title: str, table):
+        with metrics.timer("write_sheet"):
+            ws = self.new_sheet(title)
+            ws.append(table.header)
+            sheet = _FormattedSheet(ws, {i: col.number_format for i, col in enumerate(table.columns) if col.number_format})
+            for row in table.rows():
+                sheet.append(row)
+        return sheet
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self._wb.save(self.stream)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._wb.save(self.path)
+
+    def abort(self) -> None:
+        # Write-only sheets buffer rows in temp files that are normally removed by save()
+        for ws in self._wb.worksheets:
+            if not ws.closed:
+                ws.close()
+            if ws._writer is not None:
+                ws._writer.cleanup()
+
+
+class _FormattedSheet:
+    """Write-only worksheet whose appended rows get their columns' number formats."""
+
+    def __init__(self, ws, formats: dict):
+        from openpyxl.cell import WriteOnlyCell
+
+        self.ws = ws
+        # One styled cell per formatted column, reused for every row: append() writes the
+        # row out before returning, and building a styled cell per value is the slow part
+        self._styled = {}
+        for i, number_format in formats.items():
+            self._styled[i] = WriteOnlyCell(ws)
+            self._styled[i].number_format = number_format
+
+    def append(self, row) -> None:
+        if self._styled:
+            row = list(row)
+            for i, cell in self._styled.items():
+                if i < len(row) and row[i] is not None:
+                    cell.value = row[i]
+                    row[i] = cell
+        self.ws.append(row)
+
+
+def _file_stem(title: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", title).strip("._")[:80]
+
+
+def _column_names(header: list) -> list[str]:
+    """Header cells as unique, non-empty column names (col<N> for blanks, name_2 for repeats)."""
+    names, seen = [], set()
+    for i, cell in enumerate(header, start=1):
+        base = str(cell).strip() if cell not in (None, "") else f"col{i}"
+        name, n = base, 1
+        while name in seen:
+            n += 1
+            name = f"{base}_{n}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+class _FileSheet:
+    """
+    One table file. The first appended row is the header; rows counts the data rows.
+    types lists the column types when the sheet was written from a ColumnTable. With fileobj
+    (a zip entry), the table is written there and path only names it.
+    """
+
+    def __init__(self, path: Path, fileobj=None):
+        self.path = path
+        self.fileobj = fileobj
+        self.columns = None
+        self.types = None
+        self.rows = 0
+
+    def append(self, row) -> None:
+        row = ["" if c is None else c for c in row]
+        if self.columns is None:
+            self.columns = _column_names(row)
+            self._header(row)
+        else:
+            self._row(row)
+            self.rows += 1
+
+    def write_table(self, table) -> None:
+        """Write a whole ColumnTable; blank cells of typed columns stay None."""
+        self.append(table.header)
+        self.types = table.kinds
+        for row in table.rows():
+            self._row(list(row))
+            self.rows += 1
+
+    def _header(self, row: list) -> None:
+        pass
+
+    def _row(self, row: list) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+def _text_file(sheet: _FileSheet, newline: str | None = None):
+    if sheet.fileobj is not None:
+        return io.TextIOWrapper(sheet.fileobj, encoding="utf-8", newline=newline)
+    return sheet.path.open("w", encoding="utf-8", newline=newline)
+
+
+class _CsvSheet(_FileSheet):
+    def __init__(self, path: Path, fileobj=None):
+        super().__init__(path, fileobj)
+        self._f = _text_file(self, newline="")
+        self._csv = csv.writer(self._f)
+
+    def _header(self, row):
+        self._csv.writerow(row)
+
+    def _row(self, row):
+        self._csv.writerow(row)
+
+    def close(self):
+        self._f.close()
+
+
+class _NdjsonSheet(_FileSheet):
+    """One JSON object per data row, keyed by the header (extra cells get col<N> keys)."""
+
+    def __init__(self, path: Path, fileobj=None):
+        super().__init__(path, fileobj)
+        self._f = _text_file(self)
+
+    def _row(self, row):
+        keys = self.columns + [f"col{i}" for i in range(len(self.columns) + 1, len(row) + 1)]
+        self._f.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=str) + "\n")
+
+    def close(self):
+        self._f.close()
+
+
+class _ParquetSheet(_FileSheet):
+    """
+    Columnar file written in row groups of PARQUET_BATCH_ROWS. Appended rows give string
+    columns; write_table() keeps a ColumnTable's int64, float64 and date columns. Extra cells
+    get col<N> columns like NDJSON, as long as no row group has been written yet (the schema is
+    fixed from then on, and a wider row raises ValueError rather than losing cells).
+    """
+
+    def __init__(self, path: Path, fileobj=None):
+        super().__init__(path, fileobj)
+        self._header_cells = []
+        self._batch = []
+        self._writer = None
+
+    def _header(self, row):
+        self._header_cells = row
+
+    def _row(self, row):
+        if len(row) > len(self.columns):
+            self._widen(len(row))
+        width = len(self.columns)
+        self._batch.append([None if c == "" else str(c) for c in row] + [None] * (width - len(row)))
+        if len(self._batch) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _widen(self, width: int) -> None:
+        if self._writer is not None:
+            raise ValueError(f"{self.path.name}: row {self.rows + 1} has {width} cells, but {len(self.columns)} columns are already written")
+        self.columns = _column_names(self._header_cells + [""] * (width - len(self._header_cells)))
+        for r in self._batch:
+            r.extend([None] * (width - len(r)))
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = self.columns or []
+        table = pa.table({name: pa.array([r[i] for r in self._batch], pa.string()) for i, name in enumerate(columns)})
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._where(), table.schema)
+        self._writer.write_table(table)
+        self._batch = []
+
+    def _where(self):
+        return self.fileobj if self.fileobj is not None else str(self.path)
+
+    def write_table(self, table) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        from columns import TEXT
+
+        self.columns = _column_names(table.header)
+        self.types = table.kinds
+        self.rows = table.nrows
+        arrays = []
+        for col in table.columns:
+            if col.kind == TEXT:
+                arrays.append(pa.array(col.values.tolist(), pa.string(), mask=col.missing))
+            else:
+                arrays.append(pa.array(col.values, mask=col.missing))
+        data = pa.table(dict(zip(self.columns, arrays)))
+        self._writer = pq.ParquetWriter(self._where(), data.schema)
+        self._writer.write_table(data, row_group_size=PARQUET_BATCH_ROWS)
+
+    def close(self):
+        if self._batch or self._writer is None:
+            self._flush()
+        self._writer.close()
+        if self.fileobj is not None:
+            self.fileobj.close()
+
+
+class TableSetWriter(TableWriter):
+    """
+    One file per table in a directory, or in a zip when path ends in .zip, plus a manifest.json
+    of {"format", "tables": [{"name", "file", "rows", "columns", "types"}]} ("types" only for tables
+    written with write_table). Files are staged in a sibling temp directory and moved into place by
+    close(), so a failed export leaves the previous one intact. An existing directory is only
+    replaced if it is empty or an earlier export (has a manifest). A file object gets the zip,
+    with no staging directory.
+    """
+
+    format = ""
+    suffix = ""
+    sheet_class = _FileSheet
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._tables = []
+        self._stems = set()
+        self._current = None
+        self._archive = None
+        if self.stream is not None:
+            self._dir = None
+            self._start = self.stream.tell()
+            self._archive = zipfile.ZipFile(self.stream, "w", zipfile.ZIP_DEFLATED)
+            return
+        self._zip = self.path.suffix.lower() == ".zip"
+        if not self._zip and self.path.exists():
+            if not self.path.is_dir() or (any(self.path.iterdir()) and not (self.path / MANIFEST).exists()):
+                raise FileExistsError(f"Output exists and is not an earlier export: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # mkdir rather than mkdtemp: the staged directory becomes the output, with the usual permissions
+        self._dir = self.path.parent / f".export-{uuid.uuid4().hex}"
+        self._dir.mkdir()
+
+    def new_sheet(self, title: str):
+        self._finish_sheet()
+        self.sheet_count += 1
+        stem = _file_stem(title) or f"table{self.sheet_count}"
+        if stem.lower() in self._stems:
+            stem = f"{stem}_{self.sheet_count}"
+        self._stems.add(stem.lower())
+        name = f"{stem}{self.suffix}"
+        if self._archive is not None:
+            self._current = self.sheet_class(Path(name), self._archive.open(name, "w"))
+        else:
+            self._current = self.sheet_class(self._dir / name)
+        self._tables.append({"name": title, "file": self._current.path.name})
+        return self._current
+
+    def write_table(self, title: str, table) -> int:
+        with metrics.timer("write_sheet"):
+            self.new_sheet(title).write_table(table)
+        return table.nrows + 1
+
+    def _finish_sheet(self) -> None:
+        if self._current is not None:
+            self._current.close()
+            self._tables[-1].update(rows=self._current.rows, columns=self._current.columns or [])
+            if self._current.types is not None:
+                self._tables[-1]["types"] = self._current.types
+            self._current = None
+
+    def close(self) -> None:
+        self._finish_sheet()
+        manifest = {"format": self.format, "tables": self._tables}
+        text = json.dumps(manifest, indent=2, ensure_ascii=False) + "\n"
+        if self._archive is not None:
+            self._archive.writestr(MANIFEST, text)
+            self._archive.close()
+            return
+        (self._dir / MANIFEST).write_text(text, encoding="utf-8")
+        if self._zip:
+            with zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED) as zf:
+                for entry in self._tables:
+                    zf.write(self._dir / entry["file"], entry["file"])
+                zf.write(self._dir / MANIFEST, MANIFEST)
+            shutil.rmtree(self._dir, ignore_errors=True)
+            return
+        old = None
+        if self.path.exists():
+            # Move the previous export aside rather than deleting it before the new one is in place
+            old = self.path.parent / f".old-{uuid.uuid4().hex}"
+            self.path.rename(old)
+        try:
+            self._dir.rename(self.path)
+        except OSError:
+            if old is not None:
+                old.rename(self.path)
+            raise
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def abort(self) -> None:
+        if self._current is not None:
+            self._current.close()
+        if self._archive is not None:
+            # Leave the file as it was, so a retry can write into it again
+            self._archive.close()
+            self.stream.seek(self._start)
+            self.stream.truncate()
+            return
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class CsvTablesWriter(TableSetWriter):
+    format, suffix, sheet_class = "csv", ".csv", _CsvSheet
+
+
+class NdjsonTablesWriter(TableSetWriter):
+    format, suffix, sheet_class = "ndjson", ".ndjson", _NdjsonSheet
+
+
+class ParquetTablesWriter(TableSetWriter):
+    format, suffix, sheet_class = "parquet", ".parquet", _ParquetSheet
+
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from None
+        super().__init__(path)
+
+
+_WRITERS = {"xlsx": XlsxWriter, "csv": CsvTablesWriter, "ndjson": NdjsonTablesWriter, "parquet": ParquetTablesWriter}
+
+
+def open_writer(path, fmt: str = "xlsx") -> TableWriter:
+    """Writer for an output format (see FORMATS), to a path or a binary file object."""
+    try:
+        return _WRITERS[fmt](path)
+    except KeyError:
+        raise ValueError(f"Unknown format: {fmt} (choose from {', '.join(FORMATS)})") from None
+
+
+def default_output(pdf_path: str | Path, fmt: str = "xlsx") -> Path:
+    """report.pdf -> report.xlsx, or a report_<fmt>/ directory for the other formats."""
+    pdf_path = Path(pdf_path)
+    return pdf_path.with_suffix(".xlsx") if fmt == "xlsx" else pdf_path.with_name(f"{pdf_path.stem}_{fmt}")